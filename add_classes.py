@@ -0,0 +1,133 @@
+"""
+Add new disease classes to the served model without retraining the backbone.
+
+    # 1. put the new class folders next to the existing ones in Plantdisease/train
+    # 2. train a new head on cached features (seconds once features are cached)
+    python add_classes.py --data Plantdisease/train --output model/final_model_v2.pth
+    # optionally also fine-tune layer4 for a couple of epochs
+    python add_classes.py --unfreeze-layer4 2
+
+The backbone's pooled features are computed once for every training image
+(old and new classes) and cached in a memory-mapped file; re-runs with the
+same images and checkpoint reuse it. Only a new fc head is trained: old
+classes keep their indices and start from their trained weights, new
+classes are appended after them.
+
+The output checkpoint embeds its class list, and a label manifest is written
+to LABELS_PATH. Point MODEL_PATH at the checkpoint (or copy it there) and
+ModelManager picks up both, including on hot reload.
+"""
+import argparse
+import json
+import os
+
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+
+from app.config import MODEL_PATH, LABELS_PATH, DATASET_PATH
+from app.logging_config import setup_logging
+from src.datasets.plant_disease import PlantDataset, get_class_to_idx, get_image_transforms, get_eval_transforms
+from src.distill import cache_outputs
+from src.evaluate import load_checkpoint
+from src.finetune import RemappedDataset, FrozenBackboneTrain, extend_head, train_head, freeze_except
+from src.Models.resnet import ResNet50
+
+device = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+BATCH_SIZE = 128
+NUM_WORKER = 4
+
+
+def existing_classes(checkpoint, num_outputs, manifests):
+    """Class order of the current model (same precedence as ModelManager).
+
+    The classes stored in the checkpoint win, then the first label manifest
+    in ``manifests`` listing ``num_outputs`` classes. Without either, the
+    DATASET_PATH folders are used only if there are exactly ``num_outputs``
+    of them: guessing the order of a model's outputs would silently
+    mislabel every prediction.
+    """
+    if checkpoint.get('classes'):
+        return list(checkpoint['classes'])
+    for path in manifests:
+        if path and os.path.exists(path):
+            with open(path) as f:
+                classes = json.load(f)["classes"]
+            if len(classes) == num_outputs:
+                return classes
+            print(f"Ignoring {path}: it lists {len(classes)} classes but the model has {num_outputs}")
+    class_to_idx = get_class_to_idx(DATASET_PATH)
+    if len(class_to_idx) != num_outputs:
+        raise SystemExit(f"The checkpoint has {num_outputs} outputs but no class list, and {DATASET_PATH} has "
+                         f"{len(class_to_idx)} class folders; pass the old label manifest with --old-classes")
+    print(f"No class list in the checkpoint, assuming the {num_outputs} class folders of {DATASET_PATH}")
+    return sorted(class_to_idx, key=class_to_idx.get)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached-backbone fine-tuning for new classes")
+    parser.add_argument("--checkpoint", default=MODEL_PATH)
+    parser.add_argument("--data", default=DATASET_PATH, help="class folders with the old and the new classes")
+    parser.add_argument("--output", default="model/final_model_v2.pth")
+    parser.add_argument("--labels", default=LABELS_PATH)
+    parser.add_argument("--old-classes", metavar="MANIFEST",
+                        help="label manifest of the checkpoint's classes, if the checkpoint doesn't embed them")
+    parser.add_argument("--feature-cache", default="checkpoints/backbone_features.f16")
+    parser.add_argument("--head-epochs", type=int, default=100)
+    parser.add_argument("--lr", type=float, default=0.001)
+    parser.add_argument("--unfreeze-layer4", type=int, default=0, metavar="EPOCHS",
+                        help="after the head, fine-tune layer4 + fc on images for this many epochs")
+    args = parser.parse_args()
+    setup_logging()
+
+    state_dict, checkpoint = load_checkpoint(args.checkpoint, device)
+    num_old = state_dict['fc.weight'].shape[0]
+    old_classes = existing_classes(checkpoint, num_old, [args.old_classes, args.labels])
+
+    dataset = PlantDataset(args.data, transform=get_eval_transforms())
+    missing = [c for c in old_classes if c not in dataset.class_to_idx]
+    if missing:
+        print(f"Warning: no training images for {len(missing)} existing classes: {missing}")
+    new_classes = [c for c in sorted(dataset.class_to_idx) if c not in old_classes]
+    if not new_classes:
+        raise SystemExit(f"No new class folders in {args.data}")
+    classes = old_classes + new_classes
+    mapping = {folder_idx: classes.index(name) for name, folder_idx in dataset.class_to_idx.items()}
+    print(f"{len(old_classes)} existing classes, adding {len(new_classes)}: {new_classes}")
+
+    model = ResNet50(num_old).to(device)
+    model.load_state_dict(state_dict)
+    model.eval()
+
+    features = cache_outputs(model.features, dataset, args.feature_cache, args.checkpoint, model.fc.in_features,
+                             batch_size=BATCH_SIZE, num_workers=NUM_WORKER, device=device)
+    labels = torch.tensor([mapping[y] for y in dataset.labels])
+
+    model.fc = extend_head(model.fc, len(classes))
+    train_acc = train_head(model.fc, torch.from_numpy(features[:]).float(), labels,
+                           epochs=args.head_epochs, lr=args.lr, device=device)
+    print(f"Head training accuracy: {train_acc:.2f}%")
+
+    if args.unfreeze_layer4:
+        train_data = RemappedDataset(PlantDataset(args.data, transform=get_image_transforms()), mapping)
+        trainer = FrozenBackboneTrain(
+            model=model,
+            train_loader=DataLoader(train_data, batch_size=BATCH_SIZE, shuffle=True, num_workers=NUM_WORKER),
+            test_loader=DataLoader(RemappedDataset(dataset, mapping), batch_size=BATCH_SIZE, shuffle=False,
+                                   num_workers=NUM_WORKER),
+            loss_fn=nn.CrossEntropyLoss(),
+            optimizer=torch.optim.Adam(params=freeze_except(model), lr=args.lr / 10),
+            device=device,
+        )
+        trainer.train(args.unfreeze_layer4)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    torch.save({'model_state_dict': model.state_dict(), 'classes': classes}, args.output)
+    with open(args.labels, "w") as f:
+        json.dump({"classes": classes, "checkpoint": args.output}, f, indent=2)
+    print(f"Checkpoint saved at {args.output}, label manifest at {args.labels}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# app/chat_sessions.py
+import asyncio
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import (
+    CHAT_SESSION_BACKEND, CHAT_SESSION_DB_PATH, CHAT_SESSION_MAX, CHAT_SESSION_TTL,
+    CHAT_SESSION_TOKEN_BUDGET, CHAT_SESSION_KEEP_TURNS,
+)
+from app.genai_client import stream_text
+from app.logging_config import logger
+
+# Turns use the frontend's message shape, {"from": "user" | "bot", "text": ...},
+# so a session can be handed to build_report_prompt as is.
+SUMMARY_SPEAKER = "summary of the earlier conversation"
+
+
+def new_session(language="en"):
+    return {"summary": "", "turns": [], "language": language}
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token), enough to decide when to compact."""
+    return (len(text) + 3) // 4
+
+
+def history_tokens(session):
+    return estimate_tokens(session["summary"]) + sum(estimate_tokens(turn["text"]) for turn in session["turns"])
+
+
+def transcript(session):
+    """The session as a message list: the running summary (if any) followed by the kept turns."""
+    messages = [{"from": SUMMARY_SPEAKER, "text": session["summary"]}] if session["summary"] else []
+    return messages + session["turns"]
+
+
+class MemorySessionStore:
+    """Sessions in this process, evicted least-recently-used and after ``ttl`` seconds idle.
+
+    Each worker process has its own; use the SQLite backend when several
+    workers serve the same clients.
+    """
+
+    def __init__(self, max_sessions=CHAT_SESSION_MAX, ttl=CHAT_SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()  # session id -> (last used, session)
+
+    def get(self, session_id):
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > self.ttl:
+            del self._sessions[session_id]
+            return None
+        self._sessions.move_to_end(session_id)
+        return json.loads(json.dumps(entry[1]))  # Callers modify a copy, then put() it back
+
+    def put(self, session_id, session):
+        self._sessions[session_id] = (time.time(), session)
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def delete(self, session_id):
+        self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore:
+    """Sessions in a SQLite file shared by every worker, with the same LRU/TTL eviction."""
+
+    def __init__(self, path=CHAT_SESSION_DB_PATH, max_sessions=CHAT_SESSION_MAX, ttl=CHAT_SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions (id TEXT PRIMARY KEY, data TEXT, last_used REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS chat_sessions_last_used ON chat_sessions (last_used)")
+
+    def get(self, session_id):
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT data FROM chat_sessions WHERE id = ? AND last_used >= ?", (session_id, now - self.ttl)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE chat_sessions SET last_used = ? WHERE id = ?", (now, session_id))
+        return json.loads(row[0]) if row else None
+
+    def put(self, session_id, session):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions VALUES (?, ?, ?)",
+                (session_id, json.dumps(session, ensure_ascii=False), now),
+            )
+            self._conn.execute("DELETE FROM chat_sessions WHERE last_used < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM chat_sessions WHERE id IN (SELECT id FROM chat_sessions"
+                " ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,),
+            )
+
+    def delete(self, session_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,))
+
+
+def create_store(backend=CHAT_SESSION_BACKEND):
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend != "memory":
+        raise ValueError(f"Unknown CHAT_SESSION_BACKEND: {backend!r}")
+    return MemorySessionStore()
+
+
+session_store = create_store()
+_compacting = set()  # Session ids with a summary request in flight
+_background = set()
+# The stores are synchronous, so a get/modify/put between two awaits is
+# atomic on the event loop; no per-session lock is needed.
+
+
+def create_session(language="en", context=None):
+    """Start a session, optionally seeded with the diagnosis the chat is about."""
+    session_id = secrets.token_urlsafe(16)
+    session = new_session(language)
+    if context:
+        session["turns"].append({"from": "bot", "text": context})
+    session_store.put(session_id, session)
+    return session_id, session
+
+
+async def summarize(summary, turns):
+    """Fold ``turns`` into the running ``summary`` with a short, low-temperature Gemini call."""
+    from google.genai import types
+
+    previous = f"Summary so far:\n{summary}\n\n" if summary else ""
+    prompt = (
+        "You maintain the memory of a conversation between a farmer and a plant health assistant. "
+        "Update the summary with the new messages below. Keep the diagnosis, confidence, symptoms, "
+        "treatments and preventive measures discussed, and any facts the user gave about their crop, "
+        "location or conditions. Drop greetings and repetition. Reply with the summary only.\n\n"
+        f"{previous}New messages:\n" + "\n\n".join(f"{t['from'].upper()}: {t['text']}" for t in turns)
+    )
+    config = types.GenerateContentConfig(temperature=0.2, top_p=0.9, max_output_tokens=2048,
+                                         response_modalities=["TEXT"])
+    contents = [types.Content(role="user", parts=[types.Part(text=prompt)])]
+    return "".join([chunk async for chunk in stream_text(contents, config)]).strip()
+
+
+async def compact_session(session_id):
+    """Summarize all but the last CHAT_SESSION_KEEP_TURNS turns once the history exceeds its budget.
+
+    Turns are only ever appended, so replies recorded while Gemini is
+    summarizing simply stay after the summarized prefix.
+    """
+    session = session_store.get(session_id)
+    if session_id in _compacting or session is None or history_tokens(session) <= CHAT_SESSION_TOKEN_BUDGET:
+        return
+    old = session["turns"][:-CHAT_SESSION_KEEP_TURNS]
+    if not old:
+        return
+    _compacting.add(session_id)
+    try:
+        before = history_tokens(session)
+        summary = await summarize(session["summary"], old)
+        if not summary:
+            return
+        session = session_store.get(session_id)
+        if session is None:
+            return
+        session["summary"] = summary
+        session["turns"] = session["turns"][len(old):]
+        session_store.put(session_id, session)
+        logger.info(f"Compacted chat session {session_id[:8]}: {len(old)} turns, "
+                    f"~{before} -> ~{history_tokens(session)} tokens")
+    except Exception as e:
+        # Keep the full history; the next reply retries
+        logger.warning(f"Compacting chat session {session_id[:8]} failed: {e}")
+    finally:
+        _compacting.discard(session_id)
+
+
+async def record_reply(session_id, question, chunks):
+    """Pass ``chunks`` through, then store the question and the full reply in the session.
+
+    Nothing is recorded if the stream is cancelled or fails part-way. When
+    the history is now over its token budget, compaction runs in the
+    background so the response isn't held open for it.
+    """
+    reply = []
+    async for chunk in chunks:
+        reply.append(chunk)
+        yield chunk
+
+    session = session_store.get(session_id)
+    if session is None:
+        return
+    session["turns"].append({"from": "user", "text": question})
+    session["turns"].append({"from": "bot", "text": "".join(reply)})
+    session_store.put(session_id, session)
+    if history_tokens(session) > CHAT_SESSION_TOKEN_BUDGET:
+        task = asyncio.create_task(compact_session(session_id))
+        _background.add(task)  # The event loop only keeps weak references to tasks
+        task.add_done_callback(_background.discard)
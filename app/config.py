@@ -1,5 +1,10 @@
 # app/config.py
-MODEL_PATH = "model/final_model.pth"
+import os
+
+# Torch checkpoint or flat weight file from export_weights.py; serve.py sets it from --checkpoint
+MODEL_PATH = os.environ.get("PLANT_MODEL_PATH", "model/final_model.pth")
+LABELS_PATH = "model/labels.json"  # Class manifest from add_classes.py; class folders of DATASET_PATH if absent
+VERIFY_WEIGHTS = True  # Check the SHA-256 of flat weight files when loading them
 DATASET_PATH = "Plantdisease/train"
 GEMINI_MODEL = "gemini-2.5-pro-preview-05-06"
 PROJECT_ID = "hexel-studio-admin"
@@ -10,3 +15,99 @@ ORIGINS = ["*"]
 
 # Prediction threshold
 PREDICTION_THRESHOLD = 0.7
+PREDICT_MAX_FILES = 32  # Uploads per /predict/ request (all go through one forward pass); more get 413
+
+# Streaming settings
+STREAM_TIMEOUT = 300  # Hard cap (seconds) on a single /generate-stream response
+STREAM_HEARTBEAT_INTERVAL = 15  # Seconds between SSE keep-alive comments
+
+# Number of ranked classes included in /analyze-stream/ prediction events
+ANALYZE_TOP_K = 5
+
+# PDF rendering
+PDF_RENDER_WORKERS = 2  # Size of the reportlab process pool
+PDF_FONT_DIR = "fonts"
+# TrueType families used for non-Latin reports, loaded from
+# PDF_FONT_DIR/<family>-Regular.ttf and <family>-Bold.ttf when present.
+PDF_FONTS = {
+    "hi": "NotoSansDevanagari",
+    "kn": "NotoSansKannada",
+    "ta": "NotoSansTamil",
+    "ml": "NotoSansMalayalam",
+    "bn": "NotoSansBengali",
+    "gu": "NotoSansGujarati",
+    "pa": "NotoSansGurmukhi",
+    "te": "NotoSansTelugu",
+}
+
+# Background PDF report jobs
+REPORT_QUEUE_SIZE = 64  # Pending jobs beyond this are rejected with 503
+REPORT_QUEUE_WORKERS = 4  # Jobs processed concurrently
+REPORT_STORE_DIR = "report_cache"
+REPORT_STORE_MAX_BYTES = 512 * 1024 * 1024
+REPORT_STORE_TTL = 24 * 60 * 60  # Seconds a rendered PDF is kept on disk
+REPORT_LONG_POLL_MAX = 30  # Upper bound for GET /reports/{id}?wait=
+REPORT_JOB_STALE_AFTER = 15 * 60  # A queued/running job not updated for this long is treated as failed (its worker died)
+
+# Data visualization cache
+VIZ_CACHE_PATH = "viz_cache.sqlite3"
+VIZ_PROMPT_VERSION = 1  # Bump when the visualization prompts change to invalidate the cache
+VIZ_PREWARM_CONCURRENCY = 4
+
+# Model hot-reload
+MODEL_WATCH_INTERVAL = 10  # Seconds between checks of MODEL_PATH for a new checkpoint (0 disables)
+MODEL_DRAIN_TIMEOUT = 60  # Max seconds to wait for in-flight requests on a replaced model
+ADMIN_TOKEN = os.environ.get("PLANT_ADMIN_TOKEN")  # Required in X-Admin-Token for /admin/ endpoints; they are disabled when unset
+
+# Multi-worker serving (see serve.py)
+# Directory (normally /dev/shm) where MODEL_PATH is exported as a flat weight
+# file mapped read-only by every worker, also on hot reload; set by serve.py
+SHARED_WEIGHTS_DIR = os.environ.get("PLANT_SHARED_WEIGHTS_DIR")
+# Number of worker processes sharing this machine's cores
+WORKER_COUNT = int(os.environ.get("WEB_CONCURRENCY", "1"))
+
+# Heavy optional modules imported in the background once the API is ready,
+# so the first request to their endpoints doesn't pay the import (set to [] to disable)
+PRELOAD_MODULES = ["google.genai"]
+
+# Cascaded inference: a small first-stage model answers confident cases and
+# only escalates to the full ResNet50 below the calibrated threshold
+CASCADE_ENABLED = False
+CASCADE_MODEL_PATH = "model/cascade_lite.pth"  # Written by train_cascade.py train
+CASCADE_CONFIG_PATH = "model/cascade.json"  # Calibrated threshold, written by train_cascade.py calibrate
+CASCADE_THRESHOLD = 0.9  # Used when no calibration file exists
+
+# Similar-case retrieval (index built by build_embedding_index.py)
+EMBEDDING_INDEX_DIR = "embedding_index"
+SIMILAR_CASES_K = 5  # Similar training images returned by /analyze/ (0 disables)
+SIMILAR_CASES_NPROBE = 8  # Inverted lists scanned per query when the index has an IVF layout
+
+# Near-duplicate upload cache: re-uploads of the same photo (recompressed,
+# resized) within PHASH_MAX_DISTANCE bits of dHash reuse the earlier result
+PHASH_CACHE_ENABLED = True
+PHASH_CACHE_SIZE = 10000  # Recent predictions kept
+PHASH_MAX_DISTANCE = 6  # Hamming distance (of 64 bits) still treated as the same photo
+
+# Tiled inference for high-resolution field photos (/predict/ with tiled=true):
+# overlapping TILE_SIZE crops at each scale instead of one squashed 224x224 view
+TILE_SIZE = 224
+TILE_SCALES = (448, 896)  # Short side (px) the photo is resized to for each scale, coarse to fine
+TILE_OVERLAP = 0.25  # Minimum fraction of a tile shared with its neighbour
+TILE_MAX = 48  # Tiles per image across all scales; finer scales shrink or drop to stay within it
+TILE_REQUEST_MAX = 256  # Tiles per /predict/ request, split evenly between its images (at most TILE_MAX each)
+TILE_TOP_FRACTION = 0.25  # Each class is scored by the mean of its best tiles (this fraction of them)
+
+# Server-side chat sessions for /generate-stream and /generate-pdf/
+# "memory" (per worker) or "sqlite" (shared by all workers); several workers default to sqlite
+CHAT_SESSION_BACKEND = os.environ.get("PLANT_CHAT_SESSION_BACKEND", "sqlite" if WORKER_COUNT > 1 else "memory")
+CHAT_SESSION_DB_PATH = os.environ.get("PLANT_CHAT_SESSION_DB", "chat_sessions.sqlite3")
+CHAT_SESSION_MAX = 10000  # Least recently used sessions beyond this are evicted
+CHAT_SESSION_TTL = 6 * 60 * 60  # Seconds a session is kept after its last use
+CHAT_SESSION_TOKEN_BUDGET = 3000  # Estimated history tokens before older turns are summarized
+CHAT_SESSION_KEEP_TURNS = 4  # Most recent turns always sent verbatim (must be >= 1)
+
+# Logging (configured once in app/logging_config.py; handlers run on a background thread)
+LOG_LEVEL = os.environ.get("PLANT_LOG_LEVEL", "INFO")
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Fraction of requests whose per-image/per-request INFO logs are kept (warnings and errors always are)
+LOG_REQUEST_SAMPLE_RATE = float(os.environ.get("PLANT_LOG_SAMPLE_RATE", "1.0"))
@@ -0,0 +1,34 @@
+# app/duplicate_cache.py
+from src.perceptual_hash import NearDuplicateCache, dhash_bytes
+from app.logging_config import logger, request_logger
+from app.config import PHASH_CACHE_ENABLED, PHASH_CACHE_SIZE, PHASH_MAX_DISTANCE
+
+# Shared by /predict/ and /analyze/; entries are keyed by model version and
+# request options, so a reload or a different TTA setting never reuses them
+duplicate_cache = NearDuplicateCache(max_entries=PHASH_CACHE_SIZE, max_distance=PHASH_MAX_DISTANCE)
+
+
+def upload_hash(image_bytes):
+    """dHash of an upload, or None if the cache is disabled or the bytes don't decode."""
+    if not PHASH_CACHE_ENABLED:
+        return None
+    try:
+        return dhash_bytes(image_bytes)
+    except Exception as e:
+        logger.debug("Could not hash upload: %s", e)
+        return None
+
+
+def lookup(upload_hash, key):
+    """Cached result for a near-duplicate upload, or None."""
+    if upload_hash is None:
+        return None
+    result, distance = duplicate_cache.get(upload_hash, key)
+    if result is not None:
+        request_logger.info("Near-duplicate upload (distance %d), reusing cached result", distance)
+    return result
+
+
+def store(upload_hash, key, result):
+    if upload_hash is not None:
+        duplicate_cache.put(upload_hash, key, result)
@@ -0,0 +1,36 @@
+# app/genai_client.py
+from functools import lru_cache
+from app.config import PROJECT_ID, LOCATION, GEMINI_MODEL
+
+
+@lru_cache(maxsize=1)
+def get_client():
+    """Return the process-wide Gemini client.
+
+    Creating a client per request throws away its connection pool, so every
+    router shares this one instance. google.genai is imported here, on first
+    use, to keep it out of API start-up.
+    """
+    from google import genai
+
+    return genai.Client(
+        vertexai=True,
+        project=PROJECT_ID,
+        location=LOCATION,
+    )
+
+
+async def stream_text(contents, config, model=GEMINI_MODEL):
+    """Async generator yielding text chunks from Gemini's async streaming API.
+
+    Nothing here blocks the event loop, and closing (or cancelling) the
+    generator closes the upstream HTTP stream, which stops generation.
+    """
+    stream = await get_client().aio.models.generate_content_stream(
+        model=model,
+        contents=contents,
+        config=config,
+    )
+    async for chunk in stream:
+        if chunk.text:
+            yield chunk.text
@@ -1,11 +1,87 @@
 # app/logging_config.py
+import atexit
+import contextvars
 import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
 
-def setup_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+from app.config import LOG_LEVEL, LOG_FORMAT, LOG_REQUEST_SAMPLE_RATE
+
+# Whether the current request's routine logs are kept; set per request by the
+# middleware in app/main.py (contextvars follow it into run_in_threadpool)
+request_sampled = contextvars.ContextVar("request_sampled", default=True)
+
+_listener = None
+
+
+class LocalQueueHandler(QueueHandler):
+    """QueueHandler for a listener in the same process.
+
+    The stock ``prepare`` formats every record (message interpolation and
+    traceback rendering) in the logging thread so it can be pickled; here
+    the record is handed over as is and all formatting happens on the
+    listener thread. Arguments are therefore formatted when the listener
+    gets to them: don't log objects that are mutated right afterwards.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class SampledLogger(logging.LoggerAdapter):
+    """Logger for per-request messages that skips routine ones of unsampled requests.
+
+    The check happens before a record is created, so a dropped message
+    costs one context variable lookup. Warnings and errors are always kept.
+    """
+
+    def isEnabledFor(self, level):
+        return (level >= logging.WARNING or request_sampled.get()) and self.logger.isEnabledFor(level)
+
+
+def sample_request(rate=LOG_REQUEST_SAMPLE_RATE):
+    """Decide whether the current request's per-request logs are kept."""
+    request_sampled.set(rate >= 1 or random.random() < rate)
+
+
+def _direct_in_child():
+    """After fork, log straight to the handlers: the listener thread wasn't copied."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, LocalQueueHandler):
+            root.removeHandler(handler)
+            for target in _listener.handlers:
+                root.addHandler(target)
+
+
+def setup_logging(level=LOG_LEVEL):
+    """Configure the root logger once for the API and the command-line scripts.
+
+    Handlers run on a background QueueListener thread, so a log call on a
+    request path only creates a record and puts it on a queue; formatting
+    and the console write never block the caller. Calling it again is a
+    no-op.
+    """
+    global _listener
+    if _listener is None:
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter(LOG_FORMAT))
+        log_queue = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, console, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)  # Drains the queue before exit
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_direct_in_child)
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(LocalQueueHandler(log_queue))
+        root.setLevel(level)
     return logging.getLogger(__name__)
 
 logger = setup_logging()
+# Per-image and per-request messages: sampled by LOG_REQUEST_SAMPLE_RATE
+request_logger = SampledLogger(logging.getLogger("app.requests"), {})
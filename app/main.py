@@ -1,15 +1,24 @@
 # app/main.py
-from fastapi import FastAPI
+import asyncio
+import importlib
+import os
+import threading
+
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from app.router import analyse, pdf_report, prediction, generation
+from app.router import analyse, pdf_report, prediction, generation, data_viz, admin
 from app.models.model_loader import model_manager
-from app.logging_config import logger
-from app.config import ORIGINS
+from app.pdf_pool import shutdown_pool
+from app.logging_config import logger, sample_request
+from app.config import ORIGINS, MODEL_PATH, MODEL_WATCH_INTERVAL, PRELOAD_MODULES
+from app.responses import FastJSONResponse
 
 # Initialize FastAPI app
 app = FastAPI(title="Plant Disease API", 
               description="API for plant disease prediction and AI assistance",
-              version="1.0.0")
+              version="1.0.0",
+              default_response_class=FastJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -18,13 +27,50 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Session-Id"],  # Read by the frontend after /generate-stream
 )
 
+@app.middleware("http")
+async def sample_request_logs(request: Request, call_next):
+    """Decide once per request whether its routine logs are kept (LOG_REQUEST_SAMPLE_RATE)."""
+    sample_request()
+    return await call_next(request)
+
 # Include routers
 app.include_router(prediction.router, tags=["prediction"])
 app.include_router(generation.router, tags=["generation"])
 app.include_router(analyse.router, tags=["Analysis"])
 app.include_router(pdf_report.router, tags=["Analysis"])
+app.include_router(data_viz.router, tags=["Visualization"])
+app.include_router(admin.router, tags=["Admin"])
+
+
+async def watch_model_checkpoint():
+    """Hot-reload the model whenever the checkpoint file at MODEL_PATH changes"""
+    last_mtime = pending_mtime = os.path.getmtime(MODEL_PATH)
+    while True:
+        await asyncio.sleep(MODEL_WATCH_INTERVAL)
+        try:
+            mtime = os.path.getmtime(MODEL_PATH)
+            if mtime != last_mtime:
+                if mtime != pending_mtime:
+                    # Wait one more interval so a checkpoint still being written settles
+                    pending_mtime = mtime
+                    continue
+                last_mtime = mtime
+                logger.info(f"Detected new checkpoint at {MODEL_PATH}")
+                await run_in_threadpool(model_manager.reload)
+        except Exception as e:
+            logger.error(f"Model hot-reload failed: {e}", exc_info=True)
+
+def preload_modules():
+    """Import rarely-used heavy modules after startup (routers import them lazily)"""
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.warning(f"Could not preload {name}: {e}")
+    logger.info(f"Preloaded modules: {', '.join(PRELOAD_MODULES)}")
 
 @app.on_event("startup")
 async def startup_event():
@@ -32,8 +78,21 @@ async def startup_event():
     logger.info("Starting up the application...")
     # Load the model at startup
     model_manager.load_model()
+    if MODEL_WATCH_INTERVAL:
+        app.state.model_watcher = asyncio.create_task(watch_model_checkpoint())
+    await pdf_report.report_queue.start()
+    if PRELOAD_MODULES:
+        threading.Thread(target=preload_modules, name="preload", daemon=True).start()
     logger.info("Application started successfully")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the checkpoint watcher, report workers and PDF renderer processes"""
+    if MODEL_WATCH_INTERVAL:
+        app.state.model_watcher.cancel()
+    await pdf_report.report_queue.stop()
+    shutdown_pool()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,227 @@
+# app/markdown_compiler.py
+"""
+Single-pass markdown -> reportlab compiler for PDF reports.
+
+Two layers:
+- MarkdownBlockParser is fed text in arbitrary chunks (e.g. straight from
+  the Gemini stream) and turns it into small picklable blocks. Only the
+  current unfinished line and the block being assembled are buffered, so
+  the raw report text never has to be held, split or re-joined, and it is
+  cheap enough to run in the event loop while the LLM is still generating.
+- MarkdownCompiler turns the finished list of blocks into reportlab
+  flowables; this is what the renderer processes run once generation is
+  done. reportlab is imported there, so the parser alone never loads it.
+"""
+import re
+from collections import namedtuple
+
+Heading = namedtuple("Heading", "level text")
+Para = namedtuple("Para", "text")
+ListBlock = namedtuple("ListBlock", "items")  # items: [(depth, ordered, text), ...]
+TableBlock = namedtuple("TableBlock", "rows")
+Gap = namedtuple("Gap", "")
+
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*$')
+LIST_ITEM_RE = re.compile(r'^(\s*)([-*+]|\d+[.)])\s+(.*)$')
+TABLE_SEPARATOR_RE = re.compile(r'^\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?$')
+RULE_RE = re.compile(r'^(\*{3,}|-{3,}|_{3,})$')
+
+HTML_TAG_RE = re.compile(r'<[^>]*>')
+INLINE_RE = re.compile(r'\*\*(.+?)\*\*|__(.+?)__|\*(?!\s)(.+?)\*|`([^`]+)`')
+
+
+def escape(text):
+    """Escape XML entities for reportlab's paragraph markup."""
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _inline(match):
+    bold, bold_alt, italic, code = match.groups()
+    if bold is not None or bold_alt is not None:
+        return f"<b>{INLINE_RE.sub(_inline, bold or bold_alt)}</b>"
+    if italic is not None:
+        return f"<i>{INLINE_RE.sub(_inline, italic)}</i>"
+    return f'<font face="Courier">{code}</font>'
+
+
+def inline_markup(text):
+    """Convert inline markdown (bold, italic, code) to reportlab markup."""
+    return INLINE_RE.sub(_inline, escape(HTML_TAG_RE.sub('', text)))
+
+
+class MarkdownBlockParser:
+    """Incremental line-based markdown parser emitting blocks."""
+
+    def __init__(self):
+        self._partial = ""
+        self._paragraph = []
+        self._list_items = []
+        self._table_rows = []
+
+    def feed(self, chunk):
+        """Consume a chunk of text and return the blocks it completed."""
+        blocks = []
+        start = 0
+        text = self._partial + chunk if self._partial else chunk
+        while True:
+            end = text.find('\n', start)
+            if end < 0:
+                break
+            self._line(text[start:end], blocks)
+            start = end + 1
+        self._partial = text[start:]
+        return blocks
+
+    def close(self):
+        """Flush the trailing line and any open block."""
+        blocks = []
+        if self._partial:
+            self._line(self._partial, blocks)
+            self._partial = ""
+        self._flush(blocks)
+        return blocks
+
+    def _flush(self, blocks):
+        if self._paragraph:
+            blocks.append(Para(" ".join(self._paragraph)))
+            self._paragraph = []
+        if self._list_items:
+            blocks.append(ListBlock(self._list_items))
+            self._list_items = []
+        if self._table_rows:
+            blocks.append(TableBlock(self._table_rows))
+            self._table_rows = []
+
+    def _line(self, raw, blocks):
+        line = raw.strip()
+
+        if not line:
+            had_paragraph = bool(self._paragraph)
+            self._flush(blocks)
+            if had_paragraph:
+                blocks.append(Gap())
+            return
+
+        if RULE_RE.match(line):
+            self._flush(blocks)
+            return
+
+        heading = HEADING_RE.match(line)
+        if heading:
+            self._flush(blocks)
+            if heading.group(2):
+                blocks.append(Heading(len(heading.group(1)), heading.group(2)))
+            return
+
+        if line.startswith('|'):
+            if self._paragraph or self._list_items:
+                self._flush(blocks)
+            if not TABLE_SEPARATOR_RE.match(line):
+                self._table_rows.append([cell.strip() for cell in line.strip('|').split('|')])
+            return
+
+        item = LIST_ITEM_RE.match(raw.expandtabs(4))
+        if item:
+            depth = len(item.group(1)) // 2
+            ordered = item.group(2)[0].isdigit()
+            # A top-level switch between bullets and numbers starts a new list
+            switched = self._list_items and depth == 0 and ordered != self._list_items[0][1]
+            if self._paragraph or self._table_rows or switched:
+                self._flush(blocks)
+            self._list_items.append((depth, ordered, item.group(3).strip()))
+            return
+
+        if self._list_items and raw[:1].isspace():
+            # Indented continuation of the previous list item
+            depth, ordered, text = self._list_items[-1]
+            self._list_items[-1] = (depth, ordered, f"{text} {line}")
+            return
+
+        if self._list_items or self._table_rows:
+            self._flush(blocks)
+        self._paragraph.append(line)
+
+
+class MarkdownCompiler:
+    """Parsed markdown blocks -> flowables compiler.
+
+    ``styles`` is a stylesheet with Heading2, Heading3 and BodyText (see
+    app.pdf_renderer.get_styles); ``width`` is the frame width used to size
+    table columns.
+    """
+
+    def __init__(self, styles, width):
+        self.styles = styles
+        self.width = width
+
+    def flowables(self, blocks):
+        """Convert parsed blocks to flowables."""
+        from reportlab.platypus import Paragraph, Spacer
+
+        elements = []
+        for block in blocks:
+            if isinstance(block, Heading):
+                if block.level <= 2:
+                    elements.append(Paragraph(inline_markup(block.text), self.styles['Heading2']))
+                    elements.append(Spacer(1, 5)) # Small space after header
+                else:
+                    elements.append(Paragraph(inline_markup(block.text), self.styles['Heading3']))
+                    elements.append(Spacer(1, 3)) # Small space after subheading
+            elif isinstance(block, Para):
+                elements.append(Paragraph(inline_markup(block.text), self.styles['BodyText']))
+            elif isinstance(block, ListBlock):
+                elements.append(self._list(block.items))
+            elif isinstance(block, TableBlock):
+                elements.append(self._table(block.rows))
+            elif isinstance(block, Gap):
+                elements.append(Spacer(1, 6)) # Space between paragraphs
+        return elements
+
+    def _list(self, items):
+        """Build nested ListFlowables from (depth, ordered, text) items."""
+        from reportlab.platypus import Paragraph, ListFlowable, ListItem
+
+        body = self.styles['BodyText']
+
+        def build(index, depth):
+            children = []
+            ordered = items[index][1]
+            while index < len(items) and items[index][0] >= depth:
+                item_depth, _, text = items[index]
+                if item_depth > depth:
+                    nested, index = build(index, item_depth)
+                    children.append(nested)
+                    continue
+                children.append(ListItem(Paragraph(inline_markup(text), body)))
+                index += 1
+            flowable = ListFlowable(
+                children,
+                bulletType='1' if ordered else 'bullet',
+                start=None if ordered else '•',
+                leftIndent=14 + 12 * depth,
+                bulletFontName=body.fontName,
+                bulletFontSize=body.fontSize,
+            )
+            return flowable, index
+
+        # Items that start deeper than zero still belong to one list
+        flowable, _ = build(0, min(depth for depth, _, _ in items))
+        return flowable
+
+    def _table(self, rows):
+        from reportlab.lib import colors
+        from reportlab.platypus import Paragraph, Table, TableStyle
+
+        num_cols = max(len(row) for row in rows)
+        body = self.styles['BodyText']
+        data = [
+            [Paragraph(inline_markup(cell), body) for cell in row] + [""] * (num_cols - len(row))
+            for row in rows
+        ]
+        table = Table(data, colWidths=[self.width / num_cols] * num_cols, repeatRows=1)
+        table.setStyle(TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e8f5e9')),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]))
+        return table
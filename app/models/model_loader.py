@@ -1,68 +1,352 @@
 # app/models/model_loader.py
+import fcntl
+import gc
+import glob
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
 import torch
-from src.Models.resnet import ResNet50
-from src.datasets.plant_disease import PlantDataset
+from src.Models.resnet import ResNet50, ResNetLite
+from src.datasets.plant_disease import get_class_to_idx
+from src.prune import resize_blocks
+from src.weights import export_checkpoint, file_sha256, is_flat_weights, load_flat_weights, read_header
 from app.logging_config import logger
-from app.config import MODEL_PATH, DATASET_PATH
+from app.config import (
+    MODEL_PATH, DATASET_PATH, MODEL_DRAIN_TIMEOUT, SHARED_WEIGHTS_DIR, WORKER_COUNT, VERIFY_WEIGHTS,
+    CASCADE_ENABLED, CASCADE_MODEL_PATH, CASCADE_CONFIG_PATH, CASCADE_THRESHOLD, LABELS_PATH,
+)
+
+
+def configure_torch_threads():
+    """Split the machine's cores between worker processes so they don't oversubscribe."""
+    threads = max(1, (os.cpu_count() or 1) // WORKER_COUNT)
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1 if WORKER_COUNT > 1 else threads)
+    except RuntimeError:
+        pass  # Can only be set before the first parallel op
+    logger.info(f"Using {threads} torch threads ({WORKER_COUNT} workers)")
+
+
+def checkpoint_version(path):
+    """Short content hash identifying a checkpoint file.
+
+    A flat export reports the hash of the .pth it was exported from, so the
+    same weights have the same version whether a worker loads the checkpoint
+    or the shared export (serve.py). Flat files written without a source
+    checkpoint fall back to the hash of their tensor data.
+    """
+    if is_flat_weights(path):
+        header = read_header(path)[0]
+        return header["metadata"].get("source_sha256", header["sha256"])[:12]
+    return file_sha256(path)[:12]
+
+
+SHARED_WEIGHTS_PREFIX = "plant_disease_"
+
+
+def shared_weights_dir():
+    """Shared memory directory for flat exports: /dev/shm when available."""
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def export_shared_weights(checkpoint_path, directory):
+    """Export a checkpoint's model weights to a flat file in shared memory, returning its path.
+
+    The file is named after the checkpoint version, so every worker of
+    serve.py reloading the same checkpoint maps the same export: an
+    exclusive lock lets the first one write it while the others wait and
+    reuse it. Exports of other versions are then removed; workers still
+    mapping one keep their mapping until they have reloaded.
+    """
+    if is_flat_weights(checkpoint_path):
+        return checkpoint_path  # Already mappable, workers share it through the page cache
+    version = checkpoint_version(checkpoint_path)
+    path = os.path.join(directory, f"{SHARED_WEIGHTS_PREFIX}{version}.weights")
+    with open(os.path.join(directory, f"{SHARED_WEIGHTS_PREFIX}export.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        # Exports from before the header recorded their source hash are redone
+        if not os.path.exists(path) or checkpoint_version(path) != version:
+            export_checkpoint(checkpoint_path, path)
+            logger.info(f"Exported {checkpoint_path} to shared weights {path}")
+        for stale in glob.glob(os.path.join(directory, f"{SHARED_WEIGHTS_PREFIX}*.weights")):
+            if stale != path:
+                os.remove(stale)
+    return path
+
+
+def serving_path(checkpoint_path):
+    """The file to load for ``checkpoint_path``: its shared export when serve.py runs the workers."""
+    if SHARED_WEIGHTS_DIR:
+        return export_shared_weights(checkpoint_path, SHARED_WEIGHTS_DIR)
+    return checkpoint_path
+
+
+class LoadedModel:
+    """A warmed-up model together with its version, labels and in-flight request count."""
+
+    def __init__(self, model, version, idx_to_class):
+        self.model = model
+        self.version = version
+        self.idx_to_class = idx_to_class
+        self.in_flight = 0
+
 
 class ModelManager:
     _instance = None
-    
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(ModelManager, cls).__new__(cls)
             cls._instance._initialized = False
         return cls._instance
-    
+
     def __init__(self):
         if self._initialized:
             return
-            
+
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.model = None
-        self.dataset = None
         self.class_to_idx = None
         self.idx_to_class = None
+        self._current = None
+        # Guards _current and the in-flight counters; notified when a request finishes
+        self._lock = threading.Condition()
+        # Held for a whole reload, so at most two models are ever in memory
+        self._reload_lock = threading.Lock()
+        # Optional cascade first stage (not hot-reloaded)
+        self.first_stage = None
+        self.cascade_threshold = None
+        self._cascade_counts = {"requests": 0, "escalated": 0}
         self._initialized = True
-        
+
+    def _load_classes(self, num_outputs, embedded=None):
+        """Class names in output order for a model with ``num_outputs`` logits.
+
+        Labels stored with the checkpoint win (add_classes.py writes them),
+        then the LABELS_PATH manifest, then the dataset's class folders. A
+        manifest whose size doesn't match the checkpoint is ignored; class
+        folders that don't match it are an error, since the labels would be
+        shifted.
+        """
+        if embedded:
+            return list(embedded)
+        if os.path.exists(LABELS_PATH):
+            with open(LABELS_PATH) as f:
+                classes = json.load(f)["classes"]
+            if len(classes) == num_outputs:
+                return classes
+            logger.warning(f"{LABELS_PATH} lists {len(classes)} classes but the model has {num_outputs}; ignoring it")
+        # No per-image dataset is kept, only the folder names
+        class_to_idx = get_class_to_idx(DATASET_PATH)
+        if len(class_to_idx) != num_outputs:
+            raise ValueError(f"Model has {num_outputs} outputs but {DATASET_PATH} has {len(class_to_idx)} class "
+                             f"folders; embed the classes in the checkpoint or write them to {LABELS_PATH}")
+        return sorted(class_to_idx, key=class_to_idx.get)
+
+    def _build_model(self, path):
+        """Load a checkpoint into a fresh model and warm it up with one forward pass."""
+        if is_flat_weights(path):
+            # Parameters alias the read-only mapping on CPU, so all workers
+            # mapping this file share one physical copy of the weights
+            # (fp16/bf16 files are upcast into the fp32 model instead)
+            state_dict, metadata = load_flat_weights(path, verify=VERIFY_WEIGHTS)
+            classes = self._load_classes(state_dict['fc.weight'].shape[0], metadata.get("classes"))
+            model = ResNet50(num_classes=len(classes)).to(self.device)
+            if 'block_widths' in metadata:
+                resize_blocks(model, metadata['block_widths'])
+            zero_copy = self.device == 'cpu' and metadata.get("dtype", "float32") == "float32"
+            model.load_state_dict(state_dict, assign=zero_copy)
+            version = checkpoint_version(path)
+        else:
+            checkpoint = torch.load(path, map_location=self.device)
+            state_dict = checkpoint.get('model_state_dict', checkpoint)
+            classes = self._load_classes(state_dict['fc.weight'].shape[0], checkpoint.get('classes'))
+            model = ResNet50(num_classes=len(classes)).to(self.device)
+            if 'block_widths' in checkpoint:
+                # Checkpoint written by prune_model.py: narrower residual blocks
+                resize_blocks(model, checkpoint['block_widths'])
+            model.load_state_dict(state_dict)
+            version = checkpoint_version(path)
+        model.eval()  # Set model to evaluation mode
+
+        with torch.no_grad():
+            model(torch.zeros(1, 3, 224, 224, device=self.device))
+        return LoadedModel(model, version, dict(enumerate(classes)))
+
     def load_model(self):
-        """Load the model and dataset info"""
+        """Load the model and class mapping"""
         logger.info(f"Loading model on device: {self.device}")
-        
-        # Load dataset for class mappings
-        self.dataset = PlantDataset(root=DATASET_PATH)
-        num_classes = len(self.dataset.class_to_idx)
-        self.class_to_idx = self.dataset.class_to_idx
-        self.idx_to_class = {idx: class_name for class_name, idx in self.class_to_idx.items()}
-        
-        # Initialize and load model
-        self.model = ResNet50(num_classes=num_classes).to(self.device)
-        
+        configure_torch_threads()
+
         try:
-            checkpoint = torch.load(MODEL_PATH, map_location=self.device)
-            if 'model_state_dict' in checkpoint:
-                self.model.load_state_dict(checkpoint['model_state_dict'])
-            else:
-                self.model.load_state_dict(checkpoint)
-            self.model.eval()  # Set model to evaluation mode
-            logger.info("Model loaded successfully.")
+            loaded = self._build_model(serving_path(MODEL_PATH))
+            with self._lock:
+                self._set_current(loaded)
+            logger.info(f"Model loaded successfully (version {loaded.version}, {len(loaded.idx_to_class)} classes).")
         except Exception as e:
             logger.error(f"Error loading model: {e}")
             raise RuntimeError(f"Error loading model: {e}")
-        
-        return self.model
-    
+
+        if CASCADE_ENABLED:
+            self._load_first_stage()
+
+        return loaded.model
+
+    def _set_current(self, loaded):
+        """Make ``loaded`` current; call with self._lock held."""
+        self._current = loaded
+        self.idx_to_class = loaded.idx_to_class
+        self.class_to_idx = {class_name: idx for idx, class_name in loaded.idx_to_class.items()}
+
+    def _load_first_stage(self):
+        """Load the small cascade model and its calibrated threshold."""
+        checkpoint = torch.load(CASCADE_MODEL_PATH, map_location=self.device)
+        num_classes = checkpoint['model_state_dict']['fc.weight'].shape[0]
+        model = ResNetLite(num_classes, layers=checkpoint['layers'], widths=checkpoint['widths'])
+        model.load_state_dict(checkpoint['model_state_dict'])
+        self.first_stage = model.to(self.device).eval()
+
+        self.cascade_threshold = CASCADE_THRESHOLD
+        if os.path.exists(CASCADE_CONFIG_PATH):
+            with open(CASCADE_CONFIG_PATH) as f:
+                self.cascade_threshold = json.load(f)["threshold"]
+        logger.info(f"Cascade enabled: first stage {CASCADE_MODEL_PATH}, threshold {self.cascade_threshold:.4f}")
+
+    def predict_proba(self, loaded, batch, views=1):
+        """Class probabilities for a preprocessed batch, using the cascade if enabled.
+
+        The first stage scores the whole batch; only rows whose top-1
+        confidence is below the calibrated threshold go through the full model.
+
+        With ``views`` > 1 the batch holds ``views`` consecutive TTA views per
+        image: all of them go through the full model in one forward pass and
+        their logits are averaged per image. TTA is the accuracy-first mode,
+        so it skips the cascade.
+        """
+        with torch.no_grad():
+            if views > 1:
+                logits = loaded.model(batch)
+                return torch.softmax(logits.view(-1, views, logits.shape[1]).mean(dim=1), dim=1)
+            # A model with new classes (add_classes.py) outgrows the first stage
+            if self.first_stage is None or self.first_stage.fc.out_features != len(loaded.idx_to_class):
+                return torch.softmax(loaded.model(batch), dim=1)
+
+            scores = torch.softmax(self.first_stage(batch), dim=1)
+            escalate = scores.max(dim=1).values < self.cascade_threshold
+            num_escalated = int(escalate.sum())
+            if num_escalated:
+                scores[escalate] = torch.softmax(loaded.model(batch[escalate]), dim=1)
+
+        with self._lock:
+            self._cascade_counts["requests"] += batch.shape[0]
+            self._cascade_counts["escalated"] += num_escalated
+        return scores
+
+    def predict_with_features(self, loaded, batch, views=1):
+        """Class probabilities and pooled backbone features from one full-model pass.
+
+        The logits are ``fc`` applied to the returned features, so a caller
+        that needs both (similar cases) runs the backbone once. Skips the
+        cascade, since the full backbone runs anyway.
+
+        Returns:
+            tuple: ((N, C) probabilities averaged over ``views``, (N * views, D) features).
+        """
+        with torch.no_grad():
+            features = loaded.model.features(batch)
+            logits = loaded.model.fc(features)
+            scores = torch.softmax(logits.view(-1, views, logits.shape[1]).mean(dim=1), dim=1)
+        return scores, features
+
+    def cascade_stats(self):
+        """Images served by the cascade and the fraction escalated to the full model."""
+        with self._lock:
+            counts = dict(self._cascade_counts)
+        counts["enabled"] = self.first_stage is not None
+        counts["threshold"] = self.cascade_threshold
+        counts["escalation_rate"] = counts["escalated"] / counts["requests"] if counts["requests"] else None
+        return counts
+
+    def reload(self, path=MODEL_PATH):
+        """Load ``path`` in the background and atomically swap it in.
+
+        Under serve.py the new checkpoint is exported to shared memory first
+        (see export_shared_weights), so the workers keep sharing one copy
+        of the weights across reloads. Requests already holding the old model (see ``lease``) finish on it;
+        the old model is released once they have drained. Returns the new
+        version, or None if the checkpoint is unchanged or a reload is
+        already running.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            logger.warning("Model reload already in progress, skipping")
+            return None
+        try:
+            if self._current is None:
+                self.load_model()
+                return self.model_version
+
+            if checkpoint_version(path) == self._current.version:
+                logger.info("Model checkpoint unchanged, not reloading")
+                return None
+
+            logger.info(f"Reloading model from {path}")
+            candidate = self._build_model(serving_path(path))
+            with self._lock:
+                old = self._current
+                self._set_current(candidate)
+            logger.info(f"Swapped model {old.version} -> {candidate.version}, draining old model")
+
+            with self._lock:
+                drained = self._lock.wait_for(lambda: old.in_flight == 0, timeout=MODEL_DRAIN_TIMEOUT)
+            if not drained:
+                logger.warning(f"Old model {old.version} still has {old.in_flight} requests after {MODEL_DRAIN_TIMEOUT}s")
+
+            # Drop our reference; stragglers keep theirs until they finish
+            del old
+            gc.collect()
+            if self.device == 'cuda':
+                torch.cuda.empty_cache()
+            return candidate.version
+        finally:
+            self._reload_lock.release()
+
+    @contextmanager
+    def lease(self):
+        """Pin the current model for the duration of one batch.
+
+        A reload swaps models only between leases, so a batch never sees two
+        different models and every result can carry a single version.
+        """
+        if self._current is None:
+            self.load_model()
+        with self._lock:
+            loaded = self._current
+            loaded.in_flight += 1
+        try:
+            yield loaded
+        finally:
+            with self._lock:
+                loaded.in_flight -= 1
+                self._lock.notify_all()
+
+    @property
+    def model_version(self):
+        return self._current.version if self._current is not None else None
+
     def get_model(self):
         """Return the loaded model, loading it if necessary"""
-        if self.model is None:
+        if self._current is None:
             self.load_model()
-        return self.model
-    
+        return self._current.model
+
     def get_idx_to_class(self):
-        """Return the idx_to_class mapping"""
-        if self.idx_to_class is None:
+        """Return the idx_to_class mapping of the current model"""
+        if self._current is None:
             self.load_model()
-        return self.idx_to_class
+        return self._current.idx_to_class
 
 # Create a singleton instance
 model_manager = ModelManager()
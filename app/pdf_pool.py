@@ -0,0 +1,51 @@
+# app/pdf_pool.py
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from app.config import PDF_RENDER_WORKERS
+
+# The pool runs module-level trampolines so that only the worker processes
+# import app.pdf_renderer (and with it reportlab).
+
+
+def _init_worker():
+    from app.pdf_renderer import init_worker
+    init_worker()
+
+
+def _render(blocks, language):
+    from app.pdf_renderer import render_blocks
+    return render_blocks(blocks, language)
+
+
+_pool = None
+
+
+def get_pool():
+    """Return the shared renderer pool, creating it on first use.
+
+    Workers are spawned rather than forked so they never inherit torch's
+    thread pools or the event loop from the API process.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=PDF_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return _pool
+
+
+async def render_pdf(blocks, language="en"):
+    """Render parsed blocks in the process pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), _render, blocks, language)
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,98 @@
+# app/pdf_renderer.py
+# Runs inside the renderer pool processes (see app/pdf_pool.py); the API
+# process itself never imports reportlab.
+import os
+from functools import lru_cache
+from io import BytesIO
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, Spacer, SimpleDocTemplate
+
+from app.markdown_compiler import MarkdownBlockParser, MarkdownCompiler
+from app.config import PDF_FONT_DIR, PDF_FONTS
+from app.logging_config import logger
+
+REPORT_TITLE = "PlantAI Detailed Assessment Report"
+FRAME_WIDTH = letter[0] - 2 * 72
+
+
+@lru_cache(maxsize=None)
+def register_font_family(language):
+    """Register the TrueType fonts for ``language`` once per process.
+
+    Returns (regular, bold) font names, falling back to Helvetica when the
+    language needs no special font or the .ttf files are not installed.
+    Note that reportlab does not shape complex scripts, so conjuncts in
+    Indic text may render in their decomposed form.
+    """
+    family = PDF_FONTS.get(language)
+    if family is None:
+        return 'Helvetica', 'Helvetica-Bold'
+
+    regular_path = os.path.join(PDF_FONT_DIR, f"{family}-Regular.ttf")
+    bold_path = os.path.join(PDF_FONT_DIR, f"{family}-Bold.ttf")
+    try:
+        pdfmetrics.registerFont(TTFont(family, regular_path))
+        bold = f"{family}-Bold"
+        if os.path.exists(bold_path):
+            pdfmetrics.registerFont(TTFont(bold, bold_path))
+        else:
+            bold = family
+        logger.info(f"Registered PDF font {family} for language '{language}'")
+        return family, bold
+    except Exception as e:
+        logger.warning(f"Could not register font {family} for PDF: {e}. Non-Latin characters may not render.")
+        return 'Helvetica', 'Helvetica-Bold'
+
+
+@lru_cache(maxsize=None)
+def get_styles(language="en"):
+    """Build the report stylesheet for ``language`` once per process."""
+    regular, bold = register_font_family(language)
+    styles = getSampleStyleSheet()
+
+    def add_or_update_style(name, **kwargs):
+        if name in styles:
+            for key, value in kwargs.items():
+                setattr(styles[name], key, value)
+        else:
+            styles.add(ParagraphStyle(name=name, **kwargs))
+
+    add_or_update_style('Title', fontName=bold, fontSize=18, spaceAfter=16, alignment=1) # Center align title
+    add_or_update_style('Heading2', fontName=bold, fontSize=14, spaceAfter=10, leading=16)
+    add_or_update_style('Heading3', fontName=bold, fontSize=12, spaceAfter=8, leading=14)
+    add_or_update_style('BodyText', fontName=regular, fontSize=11, leading=14, spaceAfter=6)
+    return styles
+
+
+def build_elements(blocks, styles):
+    """Convert parsed markdown blocks into a list of reportlab flowables."""
+    # Add title - this is static text, potentially needs translation
+    elements = [Paragraph(REPORT_TITLE, styles['Title']), Spacer(1, 12)]
+    elements.extend(MarkdownCompiler(styles, FRAME_WIDTH).flowables(blocks))
+    return elements
+
+
+def render_blocks(blocks, language="en"):
+    """Render parsed markdown blocks to PDF bytes (CPU-bound; runs in the pool)."""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter,
+                            rightMargin=72, leftMargin=72,
+                            topMargin=72, bottomMargin=72)
+    doc.build(build_elements(blocks, get_styles(language)))
+    return buffer.getvalue()
+
+
+def render_report(report_text, language="en"):
+    """Render a markdown report given as one string."""
+    parser = MarkdownBlockParser()
+    return render_blocks(parser.feed(report_text) + parser.close(), language)
+
+
+def init_worker():
+    """Warm the per-process caches so the first request pays nothing extra."""
+    for language in ["en", *PDF_FONTS]:
+        get_styles(language)
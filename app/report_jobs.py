@@ -0,0 +1,271 @@
+# app/report_jobs.py
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from app.config import (
+    REPORT_QUEUE_SIZE, REPORT_QUEUE_WORKERS,
+    REPORT_STORE_DIR, REPORT_STORE_MAX_BYTES, REPORT_STORE_TTL, REPORT_JOB_STALE_AFTER,
+)
+from app.logging_config import logger
+
+
+def report_key(messages, language):
+    """Content hash identifying a report; identical transcripts share it."""
+    payload = json.dumps({"messages": messages, "language": language},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ReportStore:
+    """Rendered PDFs on local disk, evicted by age (TTL) and total size.
+
+    File mtimes double as the creation time, so the store survives restarts
+    without any index file. Job status is kept next to the PDFs as small
+    JSON files, so every worker process (serve.py) sees every job.
+    """
+
+    def __init__(self, directory=REPORT_STORE_DIR, max_bytes=REPORT_STORE_MAX_BYTES, ttl=REPORT_STORE_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def status_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def put_status(self, key, status, error=None):
+        """Atomically record a job's status for the other workers."""
+        tmp_path = f"{self.status_path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"status": status, "error": error}, f)
+        os.replace(tmp_path, self.status_path(key))
+
+    def get_status(self, key):
+        """A job's recorded status, or None.
+
+        A job still queued or running after REPORT_JOB_STALE_AFTER seconds
+        belonged to a worker that stopped; it is reported as failed so a
+        resubmission starts it again.
+        """
+        path = self.status_path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            with open(path) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if status["status"] in (ReportJob.QUEUED, ReportJob.RUNNING) and age > REPORT_JOB_STALE_AFTER:
+            return {"status": ReportJob.FAILED, "error": "Report job was interrupted"}
+        return status
+
+    def get(self, key):
+        """Return the path of a stored, unexpired PDF, or None."""
+        path = self.path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+        except OSError:
+            return None
+        return path
+
+    def put(self, key, pdf_bytes):
+        """Atomically store a PDF, then evict to stay within TTL and size limits."""
+        tmp_path = f"{self.path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, self.path(key))
+        self.evict()
+
+    def evict(self):
+        """Remove expired files, then the oldest PDFs until the store fits in max_bytes.
+
+        Other threads and worker processes evict the same directory
+        concurrently, so a file that disappears mid-scan is simply skipped.
+        """
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith((".pdf", ".json")):
+                continue
+            try:
+                stat = entry.stat()
+                if now - stat.st_mtime > self.ttl:
+                    os.remove(entry.path)
+                elif entry.name.endswith(".pdf"):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            except FileNotFoundError:
+                pass
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):  # oldest first
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                logger.info(f"Evicted report {os.path.basename(path)} from store")
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class ReportJob:
+    QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+    def __init__(self, job_id, messages=None, language="en", status=QUEUED):
+        self.id = job_id
+        self.messages = messages
+        self.language = language
+        self.status = status
+        self.error = None
+        self.created = time.time()
+        self.finished = self.created if status == self.DONE else None
+        self.done_event = asyncio.Event()
+        if status == self.DONE:
+            self.done_event.set()
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def to_dict(self):
+        result = {"job_id": self.id, "status": self.status}
+        if self.status == self.DONE:
+            result["pdf_url"] = f"/reports/{self.id}/pdf"
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+class ReportJobQueue:
+    """Bounded local queue of report jobs processed by a few asyncio workers.
+
+    Each worker process runs its own queue; job status goes through the
+    shared store, so a job can be polled from any process.
+
+    ``produce(messages, language)`` is an async callable returning PDF bytes;
+    the workers only orchestrate, the heavy lifting happens in Gemini and the
+    renderer process pool.
+    """
+
+    POLL_INTERVAL = 0.5  # Seconds between status checks for another worker's job
+
+    def __init__(self, produce, store, workers=REPORT_QUEUE_WORKERS, maxsize=REPORT_QUEUE_SIZE):
+        self.produce = produce
+        self.store = store
+        self.num_workers = workers
+        self.maxsize = maxsize
+        self.jobs = {}
+        self._queue = None
+        self._workers = []
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.num_workers)]
+        logger.info(f"Started {self.num_workers} report workers")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def get(self, job_id):
+        """Look up a job.
+
+        Jobs of this process are kept in memory; jobs queued by another
+        worker, and finished reports after a restart, are found in the store.
+        """
+        job = self.jobs.get(job_id)
+        if job is not None and job.status == ReportJob.DONE and self.store.get(job_id) is None:
+            # The PDF expired or was evicted, forget the job
+            del self.jobs[job_id]
+            job = None
+        if job is None:
+            if self.store.get(job_id) is not None:
+                job = ReportJob(job_id, status=ReportJob.DONE)
+            else:
+                status = self.store.get_status(job_id)
+                if status is not None and status["status"] != ReportJob.DONE:
+                    job = ReportJob(job_id, status=status["status"])
+                    job.error = status["error"]
+        return job
+
+    def submit(self, messages, language):
+        """Queue a report, reusing any stored or in-flight job for the same content.
+
+        Raises asyncio.QueueFull when the queue is at capacity.
+        """
+        job_id = report_key(messages, language)
+        job = self.get(job_id)
+        if job is not None and job.status != ReportJob.FAILED:
+            logger.info(f"Report job {job_id[:12]} deduplicated ({job.status})")
+            return job
+
+        job = ReportJob(job_id, messages, language)
+        self._queue.put_nowait(job)
+        self.jobs[job_id] = job
+        self.store.put_status(job_id, job.status)
+        self._prune()
+        return job
+
+    async def wait(self, job_id, timeout):
+        """Return the job after it finishes or ``timeout`` seconds pass.
+
+        A job running in another worker has no event to wait on; its status
+        in the store is polled instead.
+        """
+        job = self.get(job_id)
+        if job is None or job.is_finished or timeout <= 0:
+            return job
+        if job_id in self.jobs:
+            try:
+                await asyncio.wait_for(job.done_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return job
+
+        deadline = time.monotonic() + timeout
+        while not job.is_finished and time.monotonic() < deadline:
+            await asyncio.sleep(min(self.POLL_INTERVAL, deadline - time.monotonic()))
+            job = self.get(job_id) or job
+        return job
+
+    def _prune(self):
+        """Drop records of jobs that finished more than a TTL ago."""
+        cutoff = time.time() - self.store.ttl
+        for job_id in [j.id for j in self.jobs.values() if j.is_finished and j.finished < cutoff]:
+            del self.jobs[job_id]
+
+    async def _worker(self, worker_id):
+        while True:
+            job = await self._queue.get()
+            job.status = ReportJob.RUNNING
+            started = time.perf_counter()
+            try:
+                self.store.put_status(job.id, job.status)
+                pdf_bytes = await self.produce(job.messages, job.language)
+                await asyncio.to_thread(self.store.put, job.id, pdf_bytes)
+                job.status = ReportJob.DONE
+                self.store.put_status(job.id, job.status)
+                logger.info(f"Report job {job.id[:12]} done in {time.perf_counter() - started:.1f}s (worker {worker_id})")
+            except Exception as e:
+                job.status = ReportJob.FAILED
+                job.error = str(e)
+                try:
+                    self.store.put_status(job.id, job.status, job.error)
+                except OSError:
+                    pass
+                logger.error(f"Report job {job.id[:12]} failed: {e}", exc_info=True)
+            finally:
+                # The transcript is no longer needed once the job has run
+                job.messages = None
+                job.finished = time.time()
+                job.done_event.set()
+                self._queue.task_done()
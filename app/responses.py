@@ -0,0 +1,37 @@
+# app/responses.py
+import numpy as np
+import orjson
+import torch
+from fastapi.responses import JSONResponse
+
+
+def _default(obj):
+    """Serialize the types orjson does not handle natively."""
+    if isinstance(obj, torch.Tensor):
+        obj = obj.detach().cpu()
+        if obj.dtype in (torch.float16, torch.bfloat16):
+            obj = obj.float()
+        return obj.item() if obj.ndim == 0 else obj.numpy()
+    if isinstance(obj, np.ndarray):
+        # orjson only takes C-contiguous arrays of its supported dtypes
+        if obj.dtype == np.float16:
+            obj = obj.astype(np.float32)
+        return np.ascontiguousarray(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson.
+
+    NumPy arrays/scalars and torch tensors can be returned as-is, without
+    converting each element with float(...) or .item() first.
+    """
+
+    def render(self, content):
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
@@ -0,0 +1,48 @@
+# app/router/admin.py
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from app.models.model_loader import model_manager
+from app.logging_config import logger
+from app.config import ADMIN_TOKEN, MODEL_PATH
+
+
+def require_admin(x_admin_token: str = Header(default=None)):
+    """Reject the request unless it carries ADMIN_TOKEN.
+
+    Fails closed: without PLANT_ADMIN_TOKEN set, the admin endpoints are disabled.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (PLANT_ADMIN_TOKEN is not set)")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.get("/model")
+async def model_info():
+    """Currently served model version."""
+    return {"model_version": model_manager.model_version, "model_path": MODEL_PATH}
+
+
+@router.post("/reload-model")
+async def reload_model():
+    """Load MODEL_PATH in the background and swap it in without downtime."""
+    previous = model_manager.model_version
+    new_version = await run_in_threadpool(model_manager.reload)
+    logger.info(f"Admin reload: {previous} -> {new_version or previous}")
+    return {
+        "reloaded": new_version is not None,
+        "previous_version": previous,
+        "model_version": model_manager.model_version,
+    }
+
+
+@router.get("/cascade")
+async def cascade_stats():
+    """Cascade threshold and the fraction of images escalated to the full model."""
+    return model_manager.cascade_stats()
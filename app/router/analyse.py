@@ -1,19 +1,24 @@
 # app/routers/analysis.py
 
-from fastapi import APIRouter, File, UploadFile, Form, Body # Import Form and Body
-from fastapi.responses import JSONResponse, StreamingResponse # StreamingResponse for generate-stream
+from fastapi import APIRouter, File, UploadFile, Form, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, FileResponse
 from PIL import Image
 import torch
 import io
-import json # Import json for streaming
+import os
+import time
 
 from app.models.model_loader import model_manager
-from app.utils import preprocess_image # Assuming preprocess_image is in app.utils
-from app.logging_config import logger
-from app.config import PREDICTION_THRESHOLD, PROJECT_ID, LOCATION, GEMINI_MODEL
+from app.responses import FastJSONResponse
+from app.utils import tta_views, TTA_VIEWS
+from app.logging_config import logger, request_logger
+from app.config import PREDICTION_THRESHOLD, GEMINI_MODEL, ANALYZE_TOP_K, SIMILAR_CASES_K
+from app.genai_client import get_client, stream_text
+from app.similar_cases import usable_index, find_similar_cases, case_image_path
+from app.duplicate_cache import upload_hash, lookup, store
+from app.streaming import guarded_stream, sse_event, SSE_MEDIA_TYPE
 
-from google import genai
-from google.genai import types
 
 # --- Language Mapping ---
 # Map language codes (from frontend) to names suitable for Gemini prompt
@@ -32,95 +37,137 @@ LANGUAGE_MAP = {
 
 router = APIRouter()
 
+SYSTEM_INSTRUCTION = """
+You are a knowledgeable plant pathology assistant designed to provide detailed, accurate, and practical information about plant diseases.
+Your goal is to educate users about plant health by explaining:
+1. Disease Overview
+2. Causes
+3. Symptoms
+4. Prevention
+5. Treatment & Control
+6. Impact
+
+Always be factual, up-to-date with agricultural practices, and provide advice that is relevant for field application. Avoid speculation.
+"""
+
+
+def classify_image(image_bytes, top_k=ANALYZE_TOP_K, tta=1, similar_k=SIMILAR_CASES_K):
+    """Run the CNN on one uploaded image (blocking; call via run_in_threadpool).
+
+    With ``tta`` > 1, that many augmented views are scored in one batch and
+    averaged. Returns the prediction dict sent to clients: thresholded class,
+    confidence, the top-k classes and the ``similar_k`` most similar
+    labelled training images. Near-duplicates of a recent upload reuse its
+    cached prediction without a forward pass.
+    """
+    device = model_manager.device
+
+    image_hash = upload_hash(image_bytes)
+    cached = lookup(image_hash, ("analyze", model_manager.model_version, top_k, tta, similar_k))
+    if cached is not None:
+        return dict(cached, cached=True)
+
+    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    image_tensor = tta_views(image, tta).to(device)
+
+    with model_manager.lease() as loaded:
+        idx_to_class = loaded.idx_to_class
+        index = usable_index(loaded) if similar_k > 0 else None
+        if index is None:
+            scores = model_manager.predict_proba(loaded, image_tensor, views=tta)
+            similar_cases = []
+        else:
+            # One backbone pass gives the prediction and the embedding of the first (identity) view
+            scores, features = model_manager.predict_with_features(loaded, image_tensor, views=tta)
+            similar_cases = find_similar_cases(index, features[0], idx_to_class, similar_k)
+
+    topk_scores, topk_indices = torch.topk(scores, k=min(top_k, scores.shape[1]), dim=1)
+    max_score = topk_scores[0, 0].item()
+
+    if max_score > PREDICTION_THRESHOLD:
+        class_index = topk_indices[0, 0].item()
+        class_name = idx_to_class[class_index]
+    else:
+        class_index = None
+        class_name = "Healthy image" # Keep this key name consistent internally
+
+    request_logger.info("Predicted: %s with confidence %s", class_name, max_score)
+
+    prediction = {
+        "class_index": class_index,
+        "class_name": class_name, # Keep the English class name for consistency/internal use
+        "confidence": max_score,
+        "top_predictions": [
+            {"class_index": idx, "class_name": idx_to_class[idx], "confidence": score}
+            for idx, score in zip(topk_indices[0].tolist(), topk_scores[0].tolist())
+        ],
+        "model_version": loaded.version,
+        "tta_views": tta,
+        "similar_cases": similar_cases,
+        "cached": False,
+    }
+    store(image_hash, ("analyze", loaded.version, top_k, tta, similar_k), prediction)
+    return prediction
+
+
+def build_query(class_name, lang_name):
+    """Construct the Gemini query including the language instruction."""
+    # The disease name (class_name) is in English from the model's labels.
+    # We instruct Gemini to explain *about* this disease in the target language.
+    if class_name == "Healthy image":
+        return (
+            f"Provide detailed tips on maintaining plant health and preventing common diseases. "
+            f"Respond in {lang_name}."
+        )
+    return (
+        f"Give me detailed information about the plant disease '{class_name}', "
+        f"including causes, symptoms, preventive measures, and treatments. "
+        f"Respond in {lang_name}." # Add language instruction here
+    )
+
+
+def analysis_request(query_text):
+    """Return (contents, config) for the explanation call."""
+    from google.genai import types
+
+    contents = [types.Content(role="user", parts=[types.Part(text=query_text)])]
+    config = types.GenerateContentConfig(
+        temperature=0.7,
+        top_p=0.9,
+        max_output_tokens=65535,
+        response_modalities=["TEXT"],
+        # System instruction remains language-agnostic, user query specifies language
+        system_instruction=[types.Part.from_text(text=SYSTEM_INSTRUCTION)]
+    )
+    return contents, config
+
+
 @router.post("/analyze/")
 async def analyze_image(
     file: UploadFile = File(...),
-    language: str = Form(default="en") # Accept language as form data
+    language: str = Form(default="en"), # Accept language as form data
+    tta: int = Form(default=1, ge=1, le=len(TTA_VIEWS)),  # Test-time augmentation views
 ):
     """
     Analyzes an uploaded plant image and generates a diagnosis in the specified language.
     """
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
-    model = model_manager.get_model()
-    idx_to_class = model_manager.get_idx_to_class()
-
     # Validate and get language name, default to English if invalid
     lang_name = LANGUAGE_MAP.get(language, "English")
-    logger.info(f"Processing analysis request in language: {lang_name} ({language})")
-
+    request_logger.info("Processing analysis request in language: %s (%s)", lang_name, language)
 
     try:
         # Step 1: Prediction
         image_bytes = await file.read() # Read the file bytes once
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        image_tensor = preprocess_image(image).to(device)
-
-        with torch.no_grad():
-            output = model(image_tensor)
-
-        scores = torch.softmax(output, dim=1)
-        max_score, predicted = torch.max(scores, 1)
-
-        if max_score.item() > PREDICTION_THRESHOLD:
-            class_index = predicted.item()
-            class_name = idx_to_class[class_index]
-        else:
-            class_index = None
-            class_name = "Healthy image" # Keep this key name consistent internally
-
-        logger.info(f"Predicted: {class_name} with confidence {max_score.item()}")
+        prediction = await run_in_threadpool(classify_image, image_bytes, tta=tta)
+        class_name = prediction["class_name"]
 
         # Step 2: Construct Gemini Query including language instruction
-        # The disease name (class_name) is in English from the model's labels.
-        # We instruct Gemini to explain *about* this disease in the target language.
-        if class_name == "Healthy image":
-             query_text = (
-                 f"Provide detailed tips on maintaining plant health and preventing common diseases. "
-                 f"Respond in {lang_name}."
-             )
-        else:
-            query_text = (
-                f"Give me detailed information about the plant disease '{class_name}', "
-                f"including causes, symptoms, preventive measures, and treatments. "
-                f"Respond in {lang_name}." # Add language instruction here
-            )
-        logger.info(f"Gemini Query: {query_text[:100]}...") # Log truncated query
-
+        query_text = build_query(class_name, lang_name)
+        request_logger.info("Gemini Query: %.100s...", query_text) # Log truncated query
 
         # Step 3: Gemini Generation
-        # Configure Gemini client - ensure this is correctly initialized
-        # (Your existing initialization seems fine, assuming project_id and location are set in config)
-        client = genai.Client(
-            vertexai=True,
-            project=PROJECT_ID,
-            location=LOCATION,
-        )
-
-        contents = [types.Content(role="user", parts=[types.Part(text=query_text)])]
-
-        generate_content_config = types.GenerateContentConfig(
-            temperature=0.7,
-            top_p=0.9,
-            max_output_tokens=65535,
-            response_modalities=["TEXT"],
-            # System instruction remains language-agnostic, user query specifies language
-            system_instruction=[
-                types.Part.from_text(text="""
-You are a knowledgeable plant pathology assistant designed to provide detailed, accurate, and practical information about plant diseases.
-Your goal is to educate users about plant health by explaining:
-1. Disease Overview
-2. Causes
-3. Symptoms
-4. Prevention
-5. Treatment & Control
-6. Impact
-
-Always be factual, up-to-date with agricultural practices, and provide advice that is relevant for field application. Avoid speculation.
-""")
-            ]
-        )
-
-        gemini_response = client.models.generate_content(
+        contents, generate_content_config = analysis_request(query_text)
+        gemini_response = await get_client().aio.models.generate_content(
             model=GEMINI_MODEL,
             contents=contents,
             config=generate_content_config,
@@ -139,112 +186,90 @@ Always be factual, up-to-date with agricultural practices, and provide advice th
              logger.warning("Gemini generated no text response.")
              generated_text = f"Could not generate response for {class_name}. Please try again or ask a follow-up question." # Fallback
 
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "prediction": {
-                "class_index": class_index,
-                "class_name": class_name, # Keep the English class name for consistency/internal use
-                "confidence": float(max_score.item())
+                "class_index": prediction["class_index"],
+                "class_name": class_name,
+                "confidence": prediction["confidence"],
+                "model_version": prediction["model_version"],
+                "tta_views": prediction["tta_views"]
             },
+            "similar_cases": prediction["similar_cases"],
             "gemini_response": generated_text # This text should now be in the target language
         })
 
     except Exception as e:
-        logger.error(f"Error in analysis endpoint: {e}", exc_info=True) # Log traceback
-        return JSONResponse(status_code=500, content={"error": f"Internal server error during analysis: {e}"})
+        logger.error("Error in analysis endpoint: %s", e, exc_info=True) # Log traceback
+        return FastJSONResponse(status_code=500, content={"error": f"Internal server error during analysis: {e}"})
 
 
-# Define a Pydantic model for the streaming request body
-# Assuming your backend might use Pydantic models, create one if you don't have it
-# If not using Pydantic, you can accept the body as a dict like body: dict = Body(...)
-from pydantic import BaseModel
-
-class StreamRequest(BaseModel):
-    input: str # This will be the combined prompt from frontend
-    language: str = "en" # Add language parameter
-
-@router.post("/generate-stream")
-async def generate_stream(request: StreamRequest): # Use the Pydantic model
+@router.post("/analyze-stream/")
+async def analyze_image_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    language: str = Form(default="en"),
+    tta: int = Form(default=1, ge=1, le=len(TTA_VIEWS)),
+):
     """
-    Streams generated text from Gemini based on user input and diagnosis context
-    in the specified language.
+    Streaming variant of /analyze/ (Server-Sent Events).
+
+    Events, in order:
+    - ``prediction``: the CNN verdict (class, confidence, top-k), sent as soon
+      as inference finishes, before Gemini is even called
+    - ``message`` (default event): explanation text, chunk by chunk
+    - ``summary``: prediction plus the full explanation length and timings
+    - ``done``
     """
-    user_input = request.input # This already includes context + user question from frontend
-    language = request.language
-
-    # Validate and get language name
     lang_name = LANGUAGE_MAP.get(language, "English")
-    logger.info(f"Processing stream request in language: {lang_name} ({language})")
-
-    # --- Construct Gemini Query including language instruction ---
-    # Modify the input sent to Gemini to explicitly request the response language.
-    # The frontend sends input like "Based on this plant diagnosis: [English context]. The user now asks: [User's question]"
-    # We append the language instruction to this.
-    query_text = f"{user_input}\n\nRespond in {lang_name}."
-    logger.info(f"Gemini Stream Query: {query_text[:100]}...") # Log truncated query
-
+    request_logger.info("Processing streaming analysis request in language: %s (%s)", lang_name, language)
 
+    started = time.perf_counter()
     try:
-        client = genai.Client(
-            vertexai=True,
-            project=PROJECT_ID,
-            location=LOCATION,
-        )
-
-        contents = [types.Content(role="user", parts=[types.Part(text=query_text)])]
-
-        generate_content_config = types.GenerateContentConfig(
-            temperature=0.7,
-            top_p=0.9,
-            max_output_tokens=65535,
-            response_modalities=["TEXT"],
-            # System instruction remains language-agnostic
-            system_instruction=[
-                 types.Part.from_text(text="""
-You are a helpful AI assistant providing information about plant health.
-Answer the user's question based on the provided context about the plant diagnosis.
-Be concise and relevant to the user's query.
-""")
-            ]
-        )
-
-        # Use generate_content with stream=True
-        # Note: Vertex AI's Python client streaming works differently than the public API.
-        # You get a generator object that yields Response objects.
-        # We need to iterate through these and extract text parts.
-        # The stream=True parameter is part of the generate_content call for Vertex AI.
-        stream_response = client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=contents,
-            config=generate_content_config,
-            stream=True # Enable streaming
-        )
-
-        async def generate_text_chunks():
-            """Generator function to yield text chunks from the streaming response."""
-            try:
-                for response in stream_response:
-                    if response.candidates:
-                         # Concatenate text from all parts in the candidate's content
-                         chunk = "".join(part.text for part in response.candidates[0].content.parts if hasattr(part, 'text'))
-                         if chunk:
-                            #logger.debug(f"Streaming chunk: {chunk[:50]}...") # Optional: log chunks
-                            yield chunk
-            except Exception as e:
-                 logger.error(f"Error during streaming response: {e}", exc_info=True)
-                 yield f"Error: Failed to stream response. {str(e)}" # Yield error to frontend
-
-
-        # Return StreamingResponse
-        # media_type="text/plain" is suitable for simple text streaming
-        # For more complex interactions (like SSE), you might need "text/event-stream"
-        return StreamingResponse(generate_text_chunks(), media_type="text/plain")
-
-
+        image_bytes = await file.read()
+        prediction = await run_in_threadpool(classify_image, image_bytes, tta=tta)
     except Exception as e:
-        logger.error(f"Error in generate-stream endpoint: {e}", exc_info=True)
-        # For streaming, a single error response isn't ideal after the stream starts.
-        # If the error occurs before the first chunk, returning JSON is okay.
-        # If it occurs mid-stream, the generator needs to yield the error.
-        # The generator handles mid-stream errors, so this outer catch is for errors
-        # occurring before the generator starts (e.g., client connection failed).
-        return JSONResponse(status_code=500, content={"error": f"Internal server error during streaming setup: {e}"})
+        logger.error("Error in streaming analysis endpoint: %s", e, exc_info=True)
+        return FastJSONResponse(status_code=500, content={"error": f"Internal server error during analysis: {e}"})
+    predicted_at = time.perf_counter()
+
+    query_text = build_query(prediction["class_name"], lang_name)
+    request_logger.info("Gemini Stream Query: %.100s...", query_text)
+    contents, generate_content_config = analysis_request(query_text)
+
+    explanation_chars = 0
+
+    async def counted_chunks():
+        nonlocal explanation_chars
+        async for chunk in stream_text(contents, generate_content_config):
+            explanation_chars += len(chunk)
+            yield chunk
+
+    def summary():
+        return {
+            "prediction": prediction,
+            "language": language,
+            "explanation_chars": explanation_chars,
+            "prediction_ms": round((predicted_at - started) * 1000, 1),
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    async def events():
+        yield sse_event(prediction, event="prediction")
+        async for frame in guarded_stream(request, counted_chunks(), sse=True, summary=summary):
+            yield frame
+
+    return StreamingResponse(events(), media_type=SSE_MEDIA_TYPE,
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/cases/{case_id}/image")
+async def similar_case_image(case_id: int):
+    """Serve a training image returned in ``similar_cases``."""
+    path = case_image_path(case_id)
+    if path is None or not os.path.exists(path):
+        return FastJSONResponse(status_code=404, content={"error": f"Unknown case {case_id}"})
+    return FileResponse(path)
+
+
+# /generate-stream lives in app/router/generation.py (async streaming, SSE,
+# disconnect cancellation); the copy that used to be here was shadowed by it.
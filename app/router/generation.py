@@ -1,11 +1,12 @@
 # Assuming this code is in app/routers/stream.py or similar
 
 from fastapi import APIRouter, Request
-from fastapi.responses import StreamingResponse, JSONResponse # Added JSONResponse for error handling
-from google import genai
-from google.genai import types
-from app.logging_config import logger
-from app.config import PROJECT_ID, LOCATION, GEMINI_MODEL
+from fastapi.responses import StreamingResponse
+from app.genai_client import stream_text
+from app.chat_sessions import session_store, create_session, record_reply, SUMMARY_SPEAKER
+from app.streaming import guarded_stream, wants_sse, SSE_MEDIA_TYPE
+from app.responses import FastJSONResponse
+from app.logging_config import logger, request_logger
 
 # Assuming LANGUAGE_MAP is defined elsewhere or add it here
 # It's better to have this mapping in a shared location like app/utils.py
@@ -25,80 +26,96 @@ LANGUAGE_MAP = {
 
 router = APIRouter()
 
+
+def session_contents(session, types):
+    """Gemini contents for a session's history: the running summary, then the kept turns."""
+    contents = []
+    if session["summary"]:
+        summary = f"{SUMMARY_SPEAKER.capitalize()}:\n{session['summary']}"
+        contents.append(types.Content(role="user", parts=[types.Part(text=summary)]))
+        contents.append(types.Content(role="model", parts=[types.Part(text="Understood.")]))
+    for turn in session["turns"]:
+        role = "user" if turn["from"] == "user" else "model"
+        contents.append(types.Content(role=role, parts=[types.Part(text=turn["text"])]))
+    return contents
+
+
 @router.post("/generate-stream")
 async def generate_stream(request: Request):
     """
     Streams generated text from Gemini based on user input, diagnosis context,
     and the specified language.
+
+    The conversation is kept server-side: send ``session_id`` with just the
+    new question in ``input``. Without a session id a new session is
+    started, seeded with the diagnosis in ``context`` if given; its id is
+    returned in the ``X-Session-Id`` header. Older turns are compacted into a
+    running summary once the history outgrows its token budget.
+
+    Plain text chunks by default; send ``Accept: text/event-stream`` to get
+    SSE frames with keep-alive heartbeats and a final ``done`` event.
     """
+    from google.genai import types
+
     try:
         body = await request.json()
-        user_input = body.get("input", "") # This contains context + user question
+        user_input = body.get("input", "") # The user's question
         language = body.get("language", "en") # Get language, default to 'en'
+        session_id = body.get("session_id")
+
+        if session_id:
+            session = session_store.get(session_id)
+            if session is None:
+                return FastJSONResponse(status_code=404, content={"error": f"Unknown or expired session: {session_id}"})
+        else:
+            session_id, session = create_session(language, body.get("context"))
 
         # Validate and get language name for prompt
         lang_name = LANGUAGE_MAP.get(language, "English")
 
-        # Append language instruction to the prompt
-        # The frontend sends "Previous diagnosis/response context: '...'. User asks: '...'"
-        # We add the language instruction to *that* combined string.
+        # Append language instruction to the new question only; the history
+        # is sent as earlier turns
         prompt_text = f"{user_input}\n\nRespond in {lang_name}."
 
-        logger.info(f"Generating stream response for language: {lang_name} ({language}). Prompt: {prompt_text[:100]}...")
-
-        async def stream_response_chunks():
-            """Async generator function to yield text chunks."""
-            try:
-                client = genai.Client(
-                    vertexai=True,
-                    project=PROJECT_ID,
-                    location=LOCATION,
-                )
-
-                contents = [
-                    types.Content(
-                        role="user",
-                        parts=[types.Part(text=prompt_text)] # Use the language-instructed prompt
-                    )
-                ]
-
-                # Use the same generate_content_config as before
-                generate_content_config = types.GenerateContentConfig(
-                    temperature=1, # Be mindful of high temperature for technical info
-                    top_p=0.95,
-                    max_output_tokens=65535,
-                    response_modalities=["TEXT"],
-                    system_instruction=[ # Keep system instruction language-agnostic
-                        types.Part.from_text(text="""
+        request_logger.info("Generating stream response for session %.8s (%d turns), language: %s (%s). Prompt: %.100s...",
+                            session_id, len(session['turns']), lang_name, language, prompt_text)
+
+        contents = session_contents(session, types) + [
+            types.Content(
+                role="user",
+                parts=[types.Part(text=prompt_text)] # Use the language-instructed prompt
+            )
+        ]
+
+        # Use the same generate_content_config as before
+        generate_content_config = types.GenerateContentConfig(
+            temperature=1, # Be mindful of high temperature for technical info
+            top_p=0.95,
+            max_output_tokens=65535,
+            response_modalities=["TEXT"],
+            system_instruction=[ # Keep system instruction language-agnostic
+                types.Part.from_text(text="""
 You are a helpful AI assistant providing information about plant health.
 Answer the user's question based on the provided context about the plant diagnosis.
 Be concise and relevant to the user's query.
 """)
-                    ]
-                )
-
-                # Use generate_content_stream for chunked response
-                stream = client.models.generate_content_stream(
-                    model=GEMINI_MODEL,
-                    contents=contents,
-                    config=generate_content_config,
-                )
-
-                for chunk in stream:
-                    if chunk.text:
-                        # logger.debug(f"Streaming chunk: {chunk.text[:50]}...") # Optional: log chunks
-                        yield chunk.text
-
-            except Exception as e:
-                # If an error occurs *during* streaming, yield an error chunk
-                error_msg = f"\n[ERROR] Failed to stream response: {str(e)}"
-                logger.error(f"Generation stream error: {e}", exc_info=True)
-                yield error_msg # Yield the error message as the last chunk
-
-        # Return the async generator as a StreamingResponse
-        return StreamingResponse(stream_response_chunks(), media_type="text/plain")
+            ]
+        )
+
+        # Async streaming API: waiting for a chunk never blocks the event loop,
+        # and guarded_stream cancels upstream on disconnect or timeout.
+        sse = wants_sse(request)
+        chunks = record_reply(session_id, user_input, stream_text(contents, generate_content_config))
+        headers = {"X-Session-Id": session_id}
+        if sse:
+            headers.update({"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        return StreamingResponse(
+            guarded_stream(request, chunks, sse=sse),
+            media_type=SSE_MEDIA_TYPE if sse else "text/plain",
+            headers=headers,
+        )
 
     except Exception as e:
         # If an error occurs *before* streaming starts (e.g., parsing JSON body)
-        logger.error(f"Error setting up stream: {e}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": f"Internal server error: {e}"})
\ No newline at end of file
+        logger.error("Error setting up stream: %s", e, exc_info=True)
+        return FastJSONResponse(status_code=500, content={"error": f"Internal server error: {e}"})
\ No newline at end of file
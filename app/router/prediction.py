@@ -1,16 +1,19 @@
 # app/routers/prediction.py
 
-from fastapi import APIRouter, File, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from typing import List
 from PIL import Image
 import torch
 import io
 
 from app.models.model_loader import model_manager
-from app.utils import preprocess_image
-from app.logging_config import logger
-from app.config import PREDICTION_THRESHOLD
+from app.utils import tta_views, TTA_VIEWS
+from app.tiling import tile_image, aggregate_tiles
+from app.duplicate_cache import upload_hash, lookup, store
+from app.responses import FastJSONResponse
+from app.logging_config import logger, request_logger
+from app.config import PREDICTION_THRESHOLD, PREDICT_MAX_FILES, TILE_MAX, TILE_REQUEST_MAX
 
 router = APIRouter()
 
@@ -18,72 +21,129 @@ router = APIRouter()
 async def index():
     return {"message": "Welcome to the Plant Disease Prediction API!"}
 
-@router.post("/predict/")
-async def predict_images(files: List[UploadFile] = File(...)):
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
-    predictions = []
-
-    # Load model and class mapping
-    model = model_manager.get_model().to(device)
-    model.eval()
-    idx_to_class = model_manager.get_idx_to_class()
-
-    logger.info(f"Prediction started for {len(files)} images")
 
-    for file in files:
+def error_result(filename, error):
+    return {
+        'filename': filename,
+        'top_predictions': [{
+            'class_index': None,
+            'class_name': f"Error processing file: {error}",
+            'confidence': 0.0
+        }]
+    }
+
+
+def predict_uploads(uploads, tta=1, tiled=False):
+    """Classify a batch of (filename, image_bytes) pairs (blocking; call via run_in_threadpool).
+
+    Near-duplicates of recent uploads reuse their cached result; all other
+    images (and all ``tta`` views of each) go through the model in a single
+    batched forward pass. The batch runs on one leased model, so a hot
+    reload never splits a request across two model versions.
+
+    With ``tiled`` each image is instead cut into overlapping tiles (see
+    app/tiling.py); the tiles of every image share the one forward pass, and
+    each result carries the aggregated diagnosis and a per-tile heatmap.
+    The request's TILE_REQUEST_MAX tiles are split evenly between its images.
+    """
+    device = model_manager.device
+    results = [None] * len(uploads)
+    hashes = [upload_hash(image_bytes) for _, image_bytes in uploads]
+    # Part of the cache key: a result depends on how many tiles its image got
+    tile_budget = min(TILE_MAX, max(1, TILE_REQUEST_MAX // len(uploads))) if tiled else 0
+
+    # Decode and preprocess; a broken file only fails its own slot
+    tensors, positions, grids = [], [], []
+    for i, (filename, image_bytes) in enumerate(uploads):
+        cached = lookup(hashes[i], ("predict", model_manager.model_version, tta, tile_budget))
+        if cached is not None:
+            results[i] = dict(cached, filename=filename, cached=True)
+            continue
         try:
-            # Read and preprocess image
-            image = Image.open(io.BytesIO(await file.read())).convert("RGB")
-            image_tensor = preprocess_image(image).to(device)
-
-            # Make prediction
-            with torch.no_grad():
-                output = model(image_tensor)
-
-            # Get top 10 predictions
-            scores = torch.softmax(output, dim=1)
-            topk_scores, topk_indices = torch.topk(scores, k=10, dim=1)
-
-            top_predictions = []
-            for idx, score in zip(topk_indices[0], topk_scores[0]):
-                class_index = idx.item()
-                class_name = idx_to_class[class_index]
-                top_predictions.append({
-                    'class_index': class_index,
-                    'class_name': class_name,
-                    'confidence': float(score.item())
-                })
-
-            # Determine if top-1 prediction is above threshold
-            if top_predictions[0]['confidence'] > PREDICTION_THRESHOLD:
-                result = {
-                    'filename': file.filename,
-                    'top_predictions': top_predictions
-                }
+            image = Image.open(io.BytesIO(image_bytes))
+            if tiled:
+                tiles, image_grids = tile_image(image, tile_budget)
+                tensors.append(tiles)
+                grids.append(image_grids)
             else:
-                result = {
-                    'filename': file.filename,
-                    'top_predictions': [{
-                        'class_index': None,
-                        'class_name': "Healthy image",
-                        'confidence': top_predictions[0]['confidence']
-                    }]
-                }
-
-            predictions.append(result)
-            logger.info(f"Processed file: {file.filename}, top-1: {top_predictions[0]['class_name']}")
-
+                tensors.append(tta_views(image.convert("RGB"), tta))
+            positions.append(i)
         except Exception as e:
-            logger.error(f"Error processing file {file.filename}: {e}")
-            predictions.append({
-                'filename': file.filename,
+            logger.error("Error processing file %s: %s", filename, e)
+            results[i] = error_result(filename, str(e))
+
+    with model_manager.lease() as loaded:
+        idx_to_class = loaded.idx_to_class
+        if tensors:
+            try:
+                scores = model_manager.predict_proba(loaded, torch.cat(tensors).to(device), views=1 if tiled else tta)
+                if tiled:
+                    per_image = [aggregate_tiles(tile_scores, image_grids, idx_to_class) for tile_scores, image_grids
+                                 in zip(scores.split([len(t) for t in tensors]), grids)]
+                    scores = torch.stack([aggregated for aggregated, _ in per_image])
+                    heatmaps = [heatmap for _, heatmap in per_image]
+                # Get top 10 predictions
+                topk_scores, topk_indices = torch.topk(scores, k=min(10, scores.shape[1]), dim=1)
+            except Exception as e:
+                logger.error("Error running inference on %d images: %s", len(tensors), e)
+                for i in positions:
+                    results[i] = error_result(uploads[i][0], str(e))
+                positions = []
+
+    for row, i in enumerate(positions):
+        filename = uploads[i][0]
+        top_predictions = []
+        for class_index, score in zip(topk_indices[row].tolist(), topk_scores[row].tolist()):
+            top_predictions.append({
+                'class_index': class_index,
+                'class_name': idx_to_class[class_index],
+                'confidence': score
+            })
+
+        # Determine if top-1 prediction is above threshold
+        if top_predictions[0]['confidence'] > PREDICTION_THRESHOLD:
+            result = {
+                'filename': filename,
+                'top_predictions': top_predictions
+            }
+        else:
+            result = {
+                'filename': filename,
                 'top_predictions': [{
                     'class_index': None,
-                    'class_name': f"Error processing file: {str(e)}",
-                    'confidence': 0.0
+                    'class_name': "Healthy image",
+                    'confidence': top_predictions[0]['confidence']
                 }]
-            })
+            }
+
+        if tiled:
+            result['tiles'] = heatmaps[row]
+        result['cached'] = False
+        results[i] = result
+        store(hashes[i], ("predict", loaded.version, tta, tile_budget), result)
+        request_logger.info("Processed file: %s, top-1: %s", filename, top_predictions[0]['class_name'])
 
-    logger.info("Prediction completed.")
+    return results, loaded.version
 
-    return JSONResponse(content={"predictions": predictions})
+
+@router.post("/predict/")
+async def predict_images(
+    files: List[UploadFile] = File(...),
+    tta: int = Form(default=1, ge=1, le=len(TTA_VIEWS)),  # Test-time augmentation views per image
+    tiled: bool = Form(default=False),  # Overlapping tiles for high-resolution, multi-leaf photos
+):
+    if tiled and tta > 1:
+        raise HTTPException(status_code=400, detail="tiled and tta cannot be combined")
+    if len(files) > PREDICT_MAX_FILES:
+        # Checked before reading: the batch (times its TTA views) is one forward pass
+        raise HTTPException(status_code=413, detail=f"At most {PREDICT_MAX_FILES} files per request")
+    request_logger.info("Prediction started for %d images (%s)", len(files), "tiled" if tiled else f"{tta} views each")
+
+    uploads = [(file.filename, await file.read()) for file in files]
+    # Inference runs off the event loop so streams and other requests keep flowing
+    predictions, model_version = await run_in_threadpool(predict_uploads, uploads, tta, tiled)
+
+    request_logger.info("Prediction completed.")
+
+    return FastJSONResponse(content={"predictions": predictions, "model_version": model_version, "tta_views": tta,
+                                     "tiled": tiled})
@@ -0,0 +1,77 @@
+# app/similar_cases.py
+import os
+import threading
+
+from src.embedding_index import EmbeddingIndex
+from app.logging_config import logger
+from app.config import EMBEDDING_INDEX_DIR, SIMILAR_CASES_K, SIMILAR_CASES_NPROBE
+
+_lock = threading.Lock()
+_index = None
+_index_mtime = None
+_warned_versions = set()
+
+
+def get_index():
+    """The embedding index, reopened whenever build_embedding_index.py has updated it.
+
+    Returns None if no index has been built.
+    """
+    global _index, _index_mtime
+    meta_path = os.path.join(EMBEDDING_INDEX_DIR, "meta.json")
+    try:
+        mtime = os.path.getmtime(meta_path)
+    except OSError:
+        return None
+    with _lock:
+        if mtime != _index_mtime:
+            _index = EmbeddingIndex(EMBEDDING_INDEX_DIR)
+            _index_mtime = mtime
+            logger.info(f"Opened embedding index with {len(_index)} images")
+        return _index
+
+
+def usable_index(loaded):
+    """The embedding index if its embeddings come from ``loaded``'s model, else None.
+
+    None when no index exists or it was built with a different model
+    version (embeddings from another checkpoint are not comparable).
+    """
+    index = get_index()
+    if index is None or not len(index):
+        return None
+    if index.model_version != loaded.version:
+        if loaded.version not in _warned_versions:
+            _warned_versions.add(loaded.version)
+            logger.warning(f"Embedding index was built for model {index.model_version}, serving {loaded.version}; "
+                           f"similar cases disabled until the index is rebuilt")
+        return None
+    return index
+
+
+def find_similar_cases(index, embedding, idx_to_class, k=SIMILAR_CASES_K):
+    """Most similar labelled training images to a pooled backbone ``embedding``.
+
+    The embedding comes from the prediction's own forward pass
+    (ModelManager.predict_with_features), so no extra backbone pass is needed.
+    """
+    if k <= 0:
+        return []
+    scores, ids = index.search(embedding.float().cpu().numpy(), k, nprobe=SIMILAR_CASES_NPROBE)
+    return [
+        {
+            "case_id": int(case_id),
+            "class_name": idx_to_class.get(int(index.labels[case_id])),
+            "similarity": float(score),
+            "image_url": f"/cases/{int(case_id)}/image",
+        }
+        for score, case_id in zip(scores, ids)
+    ]
+
+
+def case_image_path(case_id):
+    """Path of an indexed training image, or None for an unknown id."""
+    index = get_index()
+    if index is None or not 0 <= case_id < len(index):
+        return None
+    return index.paths[case_id]
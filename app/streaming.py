@@ -0,0 +1,96 @@
+# app/streaming.py
+import asyncio
+import json
+
+from fastapi import Request
+from app.logging_config import logger
+from app.config import STREAM_TIMEOUT, STREAM_HEARTBEAT_INTERVAL
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+def wants_sse(request: Request) -> bool:
+    """True when the client asked for Server-Sent Events via the Accept header."""
+    return SSE_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def sse_event(data, event=None):
+    """Format one SSE frame. Non-string payloads are sent as JSON."""
+    if not isinstance(data, str):
+        data = json.dumps(data)
+    lines = [f"event: {event}"] if event else []
+    # Every line of a multi-line payload needs its own "data:" prefix
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+async def guarded_stream(request: Request, chunks, sse=False, summary=None,
+                         timeout=STREAM_TIMEOUT, heartbeat=STREAM_HEARTBEAT_INTERVAL):
+    """Relay an async iterator of text chunks to the client.
+
+    - stops (and cancels upstream) as soon as the client disconnects
+    - enforces an overall per-stream deadline of ``timeout`` seconds
+    - in SSE mode, emits a keep-alive comment whenever upstream is silent
+      for ``heartbeat`` seconds, and finishes with a ``done`` event (preceded
+      by a ``summary`` event carrying ``summary()`` if a callable is given)
+
+    The upstream ``__anext__`` is awaited as a task so that a heartbeat never
+    cancels an in-flight read; only a disconnect or timeout does that.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    iterator = chunks.__aiter__()
+    pending = None
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+
+            wait_for = min(heartbeat, remaining) if sse else min(1.0, remaining)
+            done, _ = await asyncio.wait({pending}, timeout=wait_for)
+
+            if await request.is_disconnected():
+                logger.info("Client disconnected, cancelling upstream stream")
+                return
+
+            if not done:
+                if sse:
+                    yield ": keep-alive\n\n"
+                continue
+
+            task, pending = pending, None
+            try:
+                chunk = task.result()
+            except StopAsyncIteration:
+                break
+            yield sse_event(chunk) if sse else chunk
+
+        if sse:
+            if summary is not None:
+                yield sse_event(summary(), event="summary")
+            yield sse_event("", event="done")
+
+    except asyncio.TimeoutError:
+        logger.warning(f"Stream exceeded {timeout}s timeout, cancelling upstream")
+        if sse:
+            yield sse_event("Stream timed out", event="error")
+        else:
+            yield "\n[ERROR] Stream timed out"
+
+    except Exception as e:
+        logger.error(f"Generation stream error: {e}", exc_info=True)
+        if sse:
+            yield sse_event(f"Failed to stream response: {e}", event="error")
+        else:
+            yield f"\n[ERROR] Failed to stream response: {str(e)}"
+
+    finally:
+        if pending is not None:
+            # Cancelling the in-flight read unwinds the upstream generator,
+            # which closes its HTTP response and stops generation.
+            pending.cancel()
+        elif hasattr(iterator, "aclose"):
+            await iterator.aclose()
@@ -0,0 +1,153 @@
+# app/tiling.py
+import math
+
+import numpy as np
+import torch
+from PIL import Image
+
+from app.config import TILE_SIZE, TILE_OVERLAP, TILE_SCALES, TILE_MAX, TILE_TOP_FRACTION
+
+
+def grid_shape(width, height, stride):
+    """Tiles across and down an image of ``width`` x ``height`` at ``stride``."""
+    def count(length):
+        return 1 if length <= TILE_SIZE else math.ceil((length - TILE_SIZE) / stride) + 1
+    return count(width), count(height)
+
+
+def plan_scales(width, height, max_tiles=TILE_MAX):
+    """Pick the resized (width, height) of each tiling scale within a ``max_tiles`` budget.
+
+    Scales are given as short-side lengths and visited coarse to fine. A
+    photo is never upscaled beyond its own resolution (except to reach one
+    tile), and a scale that would overflow the remaining tile budget is
+    shrunk until it fits; once the budget is spent the finer scales are
+    dropped, as are scales less than 1.5x finer than the one before.
+    """
+    stride = max(1, round(TILE_SIZE * (1 - TILE_OVERLAP)))
+    short = min(width, height)
+    budget = max_tiles
+    sizes, previous = [], 0
+    for target in sorted(set(TILE_SCALES)):
+        side = max(TILE_SIZE, min(target, short))
+        while True:
+            size = (max(TILE_SIZE, round(width * side / short)), max(TILE_SIZE, round(height * side / short)))
+            cols, rows = grid_shape(*size, stride)
+            if cols * rows <= budget or side == TILE_SIZE:
+                break
+            side = max(TILE_SIZE, int(side * math.sqrt(budget / (cols * rows))))
+        if side < previous * 1.5:
+            continue  # Too close to the previous scale to see anything new
+        if cols * rows > budget:
+            break
+        sizes.append(size)
+        previous = side
+        budget -= cols * rows
+    return sizes
+
+
+def _tile_views(pixels, cols, rows):
+    """(rows, cols, 3, T, T) uint8 view of ``pixels`` (H, W, 3); no pixels are copied.
+
+    The step is the largest integer that fits ``cols`` x ``rows`` tiles; the
+    few leftover pixels are split evenly between the borders.
+    """
+    height, width = pixels.shape[:2]
+    step_x = (width - TILE_SIZE) // (cols - 1) if cols > 1 else 0
+    step_y = (height - TILE_SIZE) // (rows - 1) if rows > 1 else 0
+    left = (width - (step_x * (cols - 1) + TILE_SIZE)) // 2
+    top = (height - (step_y * (rows - 1) + TILE_SIZE)) // 2
+    h_stride, w_stride, c_stride = pixels.strides
+    return np.lib.stride_tricks.as_strided(
+        pixels[top:, left:],
+        shape=(rows, cols, 3, TILE_SIZE, TILE_SIZE),
+        strides=(step_y * h_stride, step_x * w_stride, c_stride, h_stride, w_stride),
+        writeable=False,
+    ), (left, top, step_x, step_y)
+
+
+def tile_image(image, max_tiles=TILE_MAX):
+    """Cut a PIL image into at most ``max_tiles`` overlapping TILE_SIZE tiles at each planned scale.
+
+    The photo is decoded once, at the finest scale (libjpeg's draft mode
+    skips most of the work on a large JPEG); coarser scales are resized from
+    that array. Tiles are strided views into the per-scale arrays, copied
+    (and converted to float) straight into their slot of the output batch.
+
+    Returns:
+        tuple: ((N, 3, T, T) float tensor in [0, 1], list of grids), where
+        each grid describes one scale: its ``rows`` and ``cols`` and the tile
+        geometry (``offset``, ``step``, ``tile``) in original-image pixels.
+    """
+    width, height = image.size
+    sizes = plan_scales(width, height, max_tiles)
+    if not sizes:
+        raise ValueError(f"{width}x{height} image needs more than {max_tiles} tiles at any scale")
+    finest = max(sizes)
+    image.draft("RGB", finest)
+    image = image.convert("RGB")
+
+    stride = max(1, round(TILE_SIZE * (1 - TILE_OVERLAP)))
+    shapes = [grid_shape(*size, stride) for size in sizes]
+    batch = np.empty((sum(cols * rows for cols, rows in shapes), 3, TILE_SIZE, TILE_SIZE), dtype=np.float32)
+    grids, start = [], 0
+    for size, (cols, rows) in zip(sizes, shapes):
+        resized = image if image.size == size else image.resize(size, Image.BILINEAR)
+        pixels = np.asarray(resized)
+        tiles, (left, top, step_x, step_y) = _tile_views(pixels, cols, rows)
+        # The slice is contiguous, so this reshape is a view and copyto writes the batch in place
+        np.copyto(batch[start:start + cols * rows].reshape(rows, cols, 3, TILE_SIZE, TILE_SIZE), tiles)
+        start += cols * rows
+        # Factor from this scale's pixels back to the uploaded image's
+        fx, fy = width / size[0], height / size[1]
+        grids.append({
+            "rows": rows,
+            "cols": cols,
+            "offset": [round(left * fx), round(top * fy)],
+            "step": [round(step_x * fx), round(step_y * fy)],
+            "tile": [round(TILE_SIZE * fx), round(TILE_SIZE * fy)],
+        })
+    return torch.from_numpy(batch).div_(255), grids
+
+
+def aggregate_tiles(scores, grids, idx_to_class):
+    """Combine per-tile class probabilities into one diagnosis and a heatmap.
+
+    A lesion on one leaf of many only shows up in a few tiles, so averaging
+    over every tile would drown it. Each class is instead scored by the mean
+    of its highest TILE_TOP_FRACTION of tile probabilities: a disease visible
+    in a handful of tiles ranks high, while a single noisy tile is diluted.
+
+    The heatmap gives, per tile of each scale, the probability mass outside
+    the healthy classes (or the top-1 probability when the model has no
+    healthy class) and the top-1 class index.
+
+    Args:
+        scores (torch.Tensor): (N, C) tile probabilities, grids in order.
+        grids (list): Grid descriptions from tile_image.
+        idx_to_class (dict): Model output index -> class name.
+
+    Returns:
+        tuple: ((C,) aggregated scores, list of grids with heatmaps added).
+    """
+    top_n = max(1, math.ceil(scores.shape[0] * TILE_TOP_FRACTION))
+    aggregated = scores.topk(top_n, dim=0).values.mean(dim=0)
+
+    healthy = [i for i, name in idx_to_class.items() if "healthy" in name.lower()]
+    if healthy:
+        disease = 1 - scores[:, healthy].sum(dim=1)
+    else:
+        disease = scores.max(dim=1).values
+    top_class = scores.argmax(dim=1)
+
+    heatmaps, start = [], 0
+    for grid in grids:
+        end = start + grid["rows"] * grid["cols"]
+        heatmaps.append(dict(
+            grid,
+            disease_probability=[[round(p, 3) for p in row]
+                                 for row in disease[start:end].view(grid["rows"], grid["cols"]).tolist()],
+            top_class=top_class[start:end].view(grid["rows"], grid["cols"]).tolist(),
+        ))
+        start = end
+    return aggregated, heatmaps
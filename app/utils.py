@@ -1,10 +1,45 @@
 # app/utils/preprocessing.py
-from src.datasets.plant_disease import get_image_transforms
+import torch
+import torchvision.transforms.functional as TF
 
-# Get the transformations from your dataset module
-transform = get_image_transforms()
+from src.datasets.plant_disease import get_eval_transforms
+
+# Deterministic preprocessing: the training pipeline's random flips and
+# crops would make the same upload score differently on every request
+transform = get_eval_transforms()
+
+IMAGE_SIZE = 224
+# Test-time augmentation views, in the order they are used: asking for K
+# views takes the first K. Crops come from a slightly larger resize, which
+# matches the scale range of the training RandomResizedCrop.
+TTA_VIEWS = ("identity", "hflip", "vflip", "center", "top_left", "top_right", "bottom_left", "bottom_right")
+TTA_CROP_RESIZE = 248
 
 def preprocess_image(image):
     """Preprocess an image for model inference"""
     image = transform(image).unsqueeze(0)  # Apply transformations and add batch dimension
     return image
+
+
+def tta_views(image, num_views):
+    """Return the first ``num_views`` deterministic TTA views of an image as a (K, 3, 224, 224) batch."""
+    views = []
+    base = transform(image)
+    large = None
+    for name in TTA_VIEWS[:num_views]:
+        if name == "identity":
+            views.append(base)
+        elif name == "hflip":
+            views.append(base.flip(-1))
+        elif name == "vflip":
+            views.append(base.flip(-2))
+        else:
+            if large is None:
+                large = TF.to_tensor(TF.resize(image, [TTA_CROP_RESIZE, TTA_CROP_RESIZE]))
+            if name == "center":
+                views.append(TF.center_crop(large, [IMAGE_SIZE, IMAGE_SIZE]))
+            else:
+                top = 0 if name.startswith("top") else TTA_CROP_RESIZE - IMAGE_SIZE
+                left = 0 if name.endswith("left") else TTA_CROP_RESIZE - IMAGE_SIZE
+                views.append(large[:, top:top + IMAGE_SIZE, left:left + IMAGE_SIZE])
+    return torch.stack(views)
@@ -0,0 +1,45 @@
+# app/viz_cache.py
+import json
+import re
+import sqlite3
+import threading
+
+from app.config import VIZ_CACHE_PATH
+
+
+def normalize_disease(disease):
+    """Cache key form of a disease name: 'Apple___Cedar_apple_rust' == 'apple cedar apple rust'."""
+    return re.sub(r'[\s_]+', ' ', disease).strip().lower()
+
+
+class VizDatasetCache:
+    """Persistent cache of parsed visualization datasets.
+
+    Keyed by (disease, visualization_type, prompt version) so that changing
+    a prompt never serves data generated for the old one.
+    """
+
+    def __init__(self, path=VIZ_CACHE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS viz_datasets ("
+                " disease TEXT, viz_type TEXT, prompt_version INTEGER, data TEXT,"
+                " PRIMARY KEY (disease, viz_type, prompt_version))"
+            )
+
+    def get(self, disease, viz_type, prompt_version):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM viz_datasets WHERE disease = ? AND viz_type = ? AND prompt_version = ?",
+                (normalize_disease(disease), viz_type, prompt_version),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, disease, viz_type, prompt_version, data):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO viz_datasets VALUES (?, ?, ?, ?)",
+                (normalize_disease(disease), viz_type, prompt_version, json.dumps(data)),
+            )
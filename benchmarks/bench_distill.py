@@ -0,0 +1,97 @@
+"""Compare the ResNet50 teacher with a distilled student: CPU latency and accuracy.
+
+CPU latency is the median of --repeat timed forward passes (after warmup)
+for a few batch sizes, using torch's default thread count. Accuracy on the validation
+split is reported only when --student is given and the dataset exists.
+Without --student, a randomly initialised student of the given shape is
+timed, which is enough to choose layers/widths before training.
+
+Usage: python -m benchmarks.bench_distill [--student model/student.pth] [--layers 2 2 2 2 --widths 48 96 192 384]
+"""
+import argparse
+import os
+import statistics
+import time
+
+import torch
+from torch.utils.data import DataLoader
+
+from app.config import MODEL_PATH
+from src.datasets.plant_disease import PlantDataset, get_eval_transforms
+from src.evaluate import load_checkpoint
+from src.Models.resnet import ResNet50, ResNet
+
+NUM_CLASSES = 38
+ROOT_DIR = "Plantdisease"
+
+
+def latency_ms(model, batch_size, repeat):
+    x = torch.randn(batch_size, 3, 224, 224)
+    with torch.no_grad():
+        for _ in range(3):
+            model(x)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            model(x)
+            times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def accuracy(model, loader):
+    correct = total = 0
+    with torch.no_grad():
+        for X, y in loader:
+            correct += (model(X).argmax(dim=1) == y).sum().item()
+            total += len(y)
+    return correct / total * 100
+
+
+def load(model, path):
+    if path and os.path.exists(path):
+        model.load_state_dict(load_checkpoint(path)[0])
+        return True
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--teacher", default=MODEL_PATH)
+    parser.add_argument("--student")
+    parser.add_argument("--layers", type=int, nargs=4, default=[2, 2, 2, 2])
+    parser.add_argument("--widths", type=int, nargs=4, default=[48, 96, 192, 384])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    layers, widths = args.layers, args.widths
+    if args.student:
+        _, checkpoint = load_checkpoint(args.student)
+        layers, widths = checkpoint["layers"], checkpoint["widths"]
+
+    teacher = ResNet50(NUM_CLASSES)
+    student = ResNet(NUM_CLASSES, layers=layers, widths=widths)
+    teacher_loaded = load(teacher, args.teacher)
+    student_loaded = load(student, args.student)
+    teacher.eval()
+    student.eval()
+
+    params = lambda m: sum(p.numel() for p in m.parameters()) / 1e6
+    print(f"teacher ResNet50: {params(teacher):.1f}M params")
+    print(f"student layers={tuple(layers)} widths={tuple(widths)}: {params(student):.1f}M params")
+    print(f"torch threads: {torch.get_num_threads()}\n")
+
+    print(f"{'batch':>5}  {'teacher ms':>11}  {'student ms':>11}  speedup")
+    for batch_size in args.batch_sizes:
+        t = latency_ms(teacher, batch_size, args.repeat)
+        s = latency_ms(student, batch_size, args.repeat)
+        print(f"{batch_size:>5}  {t:11.1f}  {s:11.1f}  {t / s:6.2f}x")
+
+    if teacher_loaded and student_loaded and os.path.isdir(os.path.join(ROOT_DIR, "valid")):
+        valid_data = PlantDataset(os.path.join(ROOT_DIR, "valid"), transform=get_eval_transforms())
+        loader = DataLoader(valid_data, batch_size=64, shuffle=False)
+        print(f"\nvalid accuracy: teacher {accuracy(teacher, loader):.2f}% | student {accuracy(student, loader):.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Similar-case search latency and recall: exact matmul top-k vs IVF.
+
+Builds a throwaway index of --count synthetic 512-d vectors (clustered like
+real class embeddings), then times single queries against it. Recall is
+the overlap of the IVF top-k with the exact top-k.
+
+Usage: python -m benchmarks.bench_embedding_search [--count 100000] [--ivf-lists 256] [--nprobe 4 8 16]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from src.embedding_index import EmbeddingIndex, normalize
+
+DIM = 512
+NUM_CLASSES = 38
+
+
+def synthetic(count, rng):
+    centers = normalize(rng.standard_normal((NUM_CLASSES, DIM)))
+    labels = rng.integers(NUM_CLASSES, size=count)
+    return normalize(centers[labels] + 0.05 * rng.standard_normal((count, DIM))), labels
+
+
+def time_queries(index, queries, k, nprobe):
+    times, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query, k, nprobe=nprobe)
+        times.append(time.perf_counter() - start)
+        results.append(set(ids.tolist()))
+    return statistics.median(times) * 1000, np.percentile(times, 99) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--ivf-lists", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors, labels = synthetic(args.count, rng)
+    queries, _ = synthetic(args.queries, rng)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = EmbeddingIndex(tmp)
+        start = time.perf_counter()
+        index.add(vectors, labels, [f"img{i}.jpg" for i in range(args.count)])
+        print(f"append {args.count} vectors: {time.perf_counter() - start:.2f} s")
+        start = time.perf_counter()
+        index.build_ivf(args.ivf_lists)
+        print(f"build IVF ({args.ivf_lists} lists): {time.perf_counter() - start:.2f} s")
+
+        index.search(queries[0], args.k)  # Upcast the exact-search matrix outside the timing
+        index.search(queries[0], args.k, nprobe=1)
+        print(f"\n{'mode':<14} {'p50 ms':>8} {'p99 ms':>8} {'recall@' + str(args.k):>10}")
+        p50, p99, exact = time_queries(index, queries, args.k, None)
+        print(f"{'exact':<14} {p50:8.2f} {p99:8.2f} {1.0:10.3f}")
+        for nprobe in args.nprobe:
+            p50, p99, found = time_queries(index, queries, args.k, nprobe)
+            recall = np.mean([len(a & b) / len(a) for a, b in zip(exact, found)])
+            print(f"{'ivf nprobe=' + str(nprobe):<14} {p50:8.2f} {p99:8.2f} {recall:10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Startup import-time budget check for the API.
+
+Runs ``python -X importtime -c "import app.main"`` in a fresh interpreter,
+prints the heaviest imports, and exits non-zero if the total exceeds the
+budget or if a module that must stay lazy (google.genai, reportlab, plotly,
+pandas) was imported at startup. Suitable for CI.
+
+Usage: python -m benchmarks.bench_import_time [--budget-ms 2500] [--top 15]
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+LAZY_MODULES = ("google.genai", "reportlab", "plotly", "pandas")
+LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def measure(target):
+    """Return [(module, self_us, cumulative_us, depth)] for importing ``target``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"Importing {target} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--target", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=2500)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = measure(args.target)
+    total_ms = sum(cumulative for _, _, cumulative, depth in rows if depth == 0) / 1000
+
+    print(f"Heaviest top-level imports for {args.target}:")
+    top_level = sorted((r for r in rows if r[3] == 0), key=lambda r: r[2], reverse=True)
+    for module, _, cumulative, _ in top_level[:args.top]:
+        print(f"  {cumulative / 1000:9.1f} ms  {module}")
+    print(f"Total: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    failures = []
+    eager = sorted({m for m, _, _, _ in rows
+                    if any(m == lazy or m.startswith(lazy + ".") for lazy in LAZY_MODULES)})
+    if eager:
+        failures.append(f"modules that should be lazy were imported at startup: {', '.join(eager[:10])}")
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.1f} ms exceeds budget of {args.budget_ms:.0f} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
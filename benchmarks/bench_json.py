@@ -0,0 +1,75 @@
+"""Compare encode time and size of stdlib JSONResponse vs FastJSONResponse.
+
+Usage: python -m benchmarks.bench_json [--batch 256] [--repeat 50]
+"""
+import argparse
+import random
+import timeit
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+from app.responses import FastJSONResponse
+
+
+def predict_payload(batch):
+    """A /predict/ response for ``batch`` images with top-10 lists."""
+    return {"predictions": [
+        {
+            "filename": f"leaf_{i:05d}.jpg",
+            "top_predictions": [
+                {"class_index": random.randrange(38), "class_name": "Tomato___Late_blight", "confidence": random.random()}
+                for _ in range(10)
+            ],
+        }
+        for i in range(batch)
+    ]}
+
+
+def predict_payload_numpy(batch):
+    """The same response with NumPy arrays, only encodable by FastJSONResponse."""
+    return {"predictions": [
+        {
+            "filename": f"leaf_{i:05d}.jpg",
+            "class_indices": np.random.randint(0, 38, size=10),
+            "confidences": np.random.rand(10).astype(np.float32),
+        }
+        for i in range(batch)
+    ]}
+
+
+def viz_payload(points):
+    """A /generate-visualization/ style payload with a few plot traces."""
+    return {
+        "plots": [
+            {"data": [{"x": list(range(points)), "y": [random.random() * 100 for _ in range(points)], "type": "scatter"}],
+             "layout": {"title": "Prevalence Trend", "xaxis": {"title": "Year"}}}
+            for _ in range(6)
+        ],
+    }
+
+
+def measure(name, response_cls, content, repeat):
+    response = response_cls(content)
+    seconds = timeit.timeit(lambda: response.render(content), number=repeat) / repeat
+    print(f"{name:<34} {response_cls.__name__:<18} {seconds * 1000:8.3f} ms  {len(response.body) / 1024:9.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(0)
+    predict = predict_payload(args.batch)
+    viz = viz_payload(args.points)
+    for name, content in [(f"predict (batch={args.batch})", predict), (f"visualization (points={args.points})", viz)]:
+        measure(name, JSONResponse, content, args.repeat)
+        measure(name, FastJSONResponse, content, args.repeat)
+    measure(f"predict numpy (batch={args.batch})", FastJSONResponse, predict_payload_numpy(args.batch), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Cost of logging one /predict/ request: synchronous f-string logging vs the queued, lazy, sampled pipeline.
+
+Each simulated request logs what the API does for a batch upload: a start
+and an end line, one line per image, and the two DEBUG lines the dataset
+used to build per sample (DEBUG disabled). Times are measured in the
+request thread, which is what latency sees; the queued variant's handler
+work happens on the listener thread. ``--sink-latency`` simulates a slow
+log destination (a full container log pipe, a network filesystem) by
+sleeping on every write.
+
+Usage: python -m benchmarks.bench_logging [--images 32] [--requests 2000] [--sample-rate 0.1] [--sink-latency 50]
+"""
+import argparse
+import logging
+import os
+import queue
+import tempfile
+import time
+from logging.handlers import QueueListener
+
+from app.config import LOG_FORMAT
+from app.logging_config import LocalQueueHandler, SampledLogger, sample_request
+
+
+class SlowStream:
+    """File stream that takes ``latency`` seconds per write."""
+
+    def __init__(self, stream, latency):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def make_logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.handlers[:] = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def request_eager(logger, images):
+    """The old hot path: f-strings everywhere, DEBUG messages built even when disabled."""
+    logger.info(f"Prediction started for {len(images)} images (1 views each)")
+    for filename, class_name in images:
+        logger.debug(f"Loading image: {filename}")
+        logger.debug(f"Applying transforms to image: {filename}")
+        logger.info(f"Processed file: {filename}, top-1: {class_name}")
+    logger.info("Prediction completed.")
+
+
+def request_lazy(logger, images):
+    logger.info("Prediction started for %d images (%s)", len(images), "1 views each")
+    for filename, class_name in images:
+        logger.debug("Loading image: %s", filename)
+        logger.debug("Applying transforms to image: %s", filename)
+        logger.info("Processed file: %s, top-1: %s", filename, class_name)
+    logger.info("Prediction completed.")
+
+
+def run(name, logger, request, images, requests, sample_rate=1.0):
+    started = time.perf_counter()
+    for _ in range(requests):
+        sample_request(sample_rate)
+        request(logger, images)
+    seconds = time.perf_counter() - started
+    print(f"{name:<40} {seconds / requests * 1e6:9.1f} us/request")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=int, default=32, help="images per request")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--sample-rate", type=float, default=0.1, help="request sampling rate for the last variant")
+    parser.add_argument("--sink-latency", type=float, default=0, help="microseconds added to every log write")
+    args = parser.parse_args()
+
+    images = [(f"leaf_{i:05d}.jpg", "Tomato___Late_blight") for i in range(args.images)]
+    formatter = logging.Formatter(LOG_FORMAT)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Before: basicConfig-style StreamHandler writing in the request thread
+        with open(os.path.join(tmp, "sync.log"), "w") as stream:
+            handler = logging.StreamHandler(SlowStream(stream, args.sink_latency / 1e6))
+            handler.setFormatter(formatter)
+            baseline = run("sync handler, f-strings", make_logger("bench.sync", handler),
+                           request_eager, images, args.requests)
+
+        # After: records go on a queue, one listener thread formats and writes them
+        for label, rate in (("queue, lazy %", 1.0), (f"queue, lazy %, {args.sample_rate:g} sampled", args.sample_rate)):
+            with open(os.path.join(tmp, "queued.log"), "w") as stream:
+                handler = logging.StreamHandler(SlowStream(stream, args.sink_latency / 1e6))
+                handler.setFormatter(formatter)
+                log_queue = queue.SimpleQueue()
+                listener = QueueListener(log_queue, handler, respect_handler_level=True)
+                listener.start()
+                logger = SampledLogger(make_logger(f"bench.queued.{rate}", LocalQueueHandler(log_queue)), {})
+                seconds = run(label, logger, request_lazy, images, args.requests, rate)
+                drain_started = time.perf_counter()
+                listener.stop()
+                drain = time.perf_counter() - drain_started
+            print(f"{'':<40} {baseline / seconds:9.2f}x faster in the request thread "
+                  f"(listener drained the backlog {drain * 1000:.0f} ms later)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Render N PDF reports serially and through the process pool.
+
+Usage: python -m benchmarks.bench_pdf_render [-n 16] [--language hi]
+"""
+import argparse
+import asyncio
+import time
+
+from app.config import PDF_RENDER_WORKERS
+from app.markdown_compiler import MarkdownBlockParser
+from app.pdf_pool import render_pdf, get_pool, shutdown_pool
+from app.pdf_renderer import render_report
+
+SECTION = """## {title}
+
+This leaf shows **early blight** symptoms with *concentric rings* on older foliage.
+Lesions expand under warm, humid conditions and spread by rain splash.
+
+### Key observations
+- Brown lesions with yellow halos
+- Defoliation starting from the lower canopy
+- Stem cankers on a few plants
+
+"""
+
+SAMPLE_REPORT = "".join(
+    SECTION.format(title=title) * 4
+    for title in [
+        "Plant Health Assessment",
+        "Diagnosis Details",
+        "Causes and Contributing Factors",
+        "Treatment Recommendations",
+        "Preventive Measures",
+        "Additional Notes",
+    ]
+)
+
+
+async def render_parallel(n, language):
+    parser = MarkdownBlockParser()
+    blocks = parser.feed(SAMPLE_REPORT) + parser.close()
+    return await asyncio.gather(*(render_pdf(blocks, language) for _ in range(n)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=16, help="number of reports")
+    parser.add_argument("--language", default="en")
+    args = parser.parse_args()
+
+    render_report(SAMPLE_REPORT, args.language)  # warm styles/fonts in this process
+    start = time.perf_counter()
+    for _ in range(args.n):
+        render_report(SAMPLE_REPORT, args.language)
+    serial = time.perf_counter() - start
+
+    # Spawn and warm the pool outside the timed region
+    pool = get_pool()
+    for future in [pool.submit(render_report, SAMPLE_REPORT, args.language) for _ in range(PDF_RENDER_WORKERS)]:
+        future.result()
+    start = time.perf_counter()
+    pdfs = asyncio.run(render_parallel(args.n, args.language))
+    parallel = time.perf_counter() - start
+    shutdown_pool()
+
+    print(f"reports: {args.n}  size: {len(pdfs[0]) / 1024:.1f} KiB  workers: {PDF_RENDER_WORKERS}")
+    print(f"serial:   {serial:.3f}s  ({serial / args.n * 1000:.1f} ms/report)")
+    print(f"parallel: {parallel:.3f}s  ({parallel / args.n * 1000:.1f} ms/report, {serial / parallel:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Test-time augmentation: accuracy and latency per number of views on the test split.
+
+For each K, every test image is expanded into its first K TTA views (see
+app.utils.TTA_VIEWS) and scored the way /predict/ does it: all views of a
+request batch in one forward pass with logits averaged. The same views are
+also timed as K separate forwards to show what batching saves.
+
+Usage: python -m benchmarks.bench_tta [--checkpoint model/final_model.pth] [--views 1 2 4 8] [--limit 500]
+"""
+import argparse
+import os
+import time
+
+import torch
+from PIL import Image
+
+from app.config import MODEL_PATH
+from app.utils import tta_views, TTA_VIEWS
+from src.datasets.plant_disease import get_class_to_idx
+from src.evaluate import load_checkpoint_model, label_mapping
+
+ROOT_DIR = "Plantdisease"
+
+
+def test_samples(limit):
+    """(image path, label) pairs from the test split, spread evenly across classes."""
+    root = os.path.join(ROOT_DIR, "test")
+    samples = []
+    for class_name, label in get_class_to_idx(root).items():
+        class_dir = os.path.join(root, class_name)
+        samples.extend((os.path.join(class_dir, f), label) for f in sorted(os.listdir(class_dir)))
+    step = max(1, len(samples) // limit) if limit else 1
+    return samples[::step][:limit or None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--checkpoint", default=MODEL_PATH)
+    parser.add_argument("--views", type=int, nargs="+", default=[1, 2, 4, len(TTA_VIEWS)])
+    parser.add_argument("--batch-size", type=int, default=8, help="images per request")
+    parser.add_argument("--limit", type=int, default=500, help="test images to use (0 = all)")
+    args = parser.parse_args()
+
+    samples = test_samples(args.limit)
+    model, classes = load_checkpoint_model(args.checkpoint)
+    mapping = label_mapping(get_class_to_idx(os.path.join(ROOT_DIR, "test")), classes, model.fc.out_features)
+
+    images = [Image.open(path).convert("RGB") for path, _ in samples]
+    labels = torch.tensor([label for _, label in samples])
+    if mapping is not None:
+        labels = mapping[labels]  # Folder labels -> the checkpoint's output order
+    print(f"{len(samples)} test images, {args.batch_size} per request, {torch.get_num_threads()} threads\n")
+
+    print(f"{'views':>5}  {'accuracy':>9}  {'batched ms/img':>15}  {'separate ms/img':>16}")
+    baseline = None
+    for k in args.views:
+        correct = 0
+        batched = separate = 0.0
+        with torch.no_grad():
+            for start in range(0, len(images), args.batch_size):
+                batch = torch.cat([tta_views(image, k) for image in images[start:start + args.batch_size]])
+
+                t0 = time.perf_counter()
+                logits = model(batch)
+                scores = logits.view(-1, k, logits.shape[1]).mean(dim=1)
+                batched += time.perf_counter() - t0
+
+                # Same work as K (or per-image) separate forwards
+                t0 = time.perf_counter()
+                for view in batch.split(1):
+                    model(view)
+                separate += time.perf_counter() - t0
+
+                correct += (scores.argmax(dim=1) == labels[start:start + args.batch_size]).sum().item()
+
+        accuracy = correct / len(images) * 100
+        baseline = baseline if baseline is not None else accuracy
+        print(f"{k:>5}  {accuracy:8.2f}%  {batched / len(images) * 1000:15.1f}  {separate / len(images) * 1000:16.1f}"
+              f"  ({accuracy - baseline:+.2f} pts)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Compare model load time and peak memory: torch checkpoint vs flat weight files.
+
+Each variant loads in a fresh subprocess so peak RSS is measured in
+isolation. Without --checkpoint, a randomly initialised ResNet50 training
+checkpoint (with Adam optimizer state, as save_checkpoint writes) is used.
+With --output the table is also written as JSON, together with the torch
+version and core count, so results from different machines can be compared.
+
+Usage: python -m benchmarks.bench_weight_load [--checkpoint checkpoints/checkpoint-epoch-20.pth] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import torch
+
+from src.Models.resnet import ResNet50
+from src.weights import export_checkpoint, load_flat_weights
+
+NUM_CLASSES = 38
+
+
+def child(kind, path):
+    """Load one variant into a fresh model and print timings as JSON."""
+    model = ResNet50(num_classes=NUM_CLASSES)
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if kind == "torch":
+        checkpoint = torch.load(path, map_location="cpu")
+        model.load_state_dict(checkpoint.get("model_state_dict", checkpoint))
+    else:
+        state_dict, metadata = load_flat_weights(path, verify=kind.endswith("verify"))
+        model.load_state_dict(state_dict, assign=metadata.get("dtype") == "float32")
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux
+    print(json.dumps({"seconds": elapsed, "peak_delta_mib": (peak_rss - baseline_rss) / 1024}))
+
+
+def make_training_checkpoint(path):
+    model = ResNet50(num_classes=NUM_CLASSES)
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.0001)
+    model(torch.randn(2, 3, 64, 64)).sum().backward()
+    optimizer.step()  # populate exp_avg / exp_avg_sq
+    torch.save({"epoch": 0, "model_state_dict": model.state_dict(),
+                "optimizer_state_dict": optimizer.state_dict()}, path)
+
+
+def run(kind, path, repeat):
+    results = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_weight_load", "--child", kind, path],
+                             check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    best = min(results, key=lambda r: r["seconds"])
+    size = os.path.getsize(path) / 2**20
+    print(f"{kind:<14} {size:8.1f} MiB  {best['seconds'] * 1000:9.1f} ms  peak +{best['peak_delta_mib']:7.1f} MiB")
+    return {"variant": kind, "size_mib": size, "load_ms": best["seconds"] * 1000,
+            "peak_delta_mib": best["peak_delta_mib"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--checkpoint")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--child", nargs=2, metavar=("KIND", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint = args.checkpoint or os.path.join(tmp, "checkpoint.pth")
+        if not args.checkpoint:
+            make_training_checkpoint(checkpoint)
+        fp32 = os.path.join(tmp, "model-fp32.weights")
+        fp16 = os.path.join(tmp, "model-fp16.weights")
+        export_checkpoint(checkpoint, fp32)
+        export_checkpoint(checkpoint, fp16, dtype=torch.float16)
+
+        print(f"{'variant':<14} {'size':>12}  {'load':>12}  peak memory")
+        results = [
+            run("torch", checkpoint, args.repeat),
+            run("flat", fp32, args.repeat),
+            run("flat-verify", fp32, args.repeat),
+            run("flat-fp16", fp16, args.repeat),
+        ]
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "checkpoint": args.checkpoint or "random ResNet50 training checkpoint",
+                "torch": torch.__version__,
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+                "repeat": args.repeat,
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
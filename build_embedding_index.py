@@ -0,0 +1,84 @@
+"""
+Build or extend the similar-case embedding index used by /analyze/.
+
+    python build_embedding_index.py                  # embed new training images only
+    python build_embedding_index.py --ivf-lists 256  # also (re)cluster for IVF search
+    python build_embedding_index.py --rebuild        # start over (e.g. after retraining)
+
+Runs the served ResNet50 up to avgpool over the training split and appends
+L2-normalised 512-d embeddings to EMBEDDING_INDEX_DIR. Images already in
+the index are skipped, so re-running after adding images only embeds the
+new ones. The index records the checkpoint version it was built with, and
+the API ignores it once a different model is served. Labels are stored as
+the checkpoint's output indices (matched to the class folders by name), so
+the API names them through the served model's class list.
+"""
+import argparse
+import os
+import shutil
+
+import torch
+from torch.utils.data import DataLoader, Subset
+
+from app.config import MODEL_PATH, DATASET_PATH, EMBEDDING_INDEX_DIR
+from app.models.model_loader import checkpoint_version
+from app.logging_config import setup_logging
+from src.datasets.plant_disease import PlantDataset, get_eval_transforms
+from src.embedding_index import EmbeddingIndex
+from src.evaluate import load_checkpoint_model, label_mapping
+
+device = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+BATCH_SIZE = 128
+NUM_WORKER = 4
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the similar-case embedding index")
+    parser.add_argument("--checkpoint", default=MODEL_PATH)
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--output", default=EMBEDDING_INDEX_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="discard the existing index first")
+    parser.add_argument("--ivf-lists", type=int, default=0, help="cluster into this many inverted lists (0 = exact only)")
+    parser.add_argument("--chunk", type=int, default=4096, help="images embedded between index appends")
+    args = parser.parse_args()
+    setup_logging()
+
+    version = checkpoint_version(args.checkpoint)
+    if args.rebuild and os.path.isdir(args.output):
+        shutil.rmtree(args.output)
+    index = EmbeddingIndex(args.output)
+    if len(index) and index.model_version != version:
+        raise SystemExit(f"Index was built with model {index.model_version}, checkpoint is {version}; use --rebuild")
+
+    dataset = PlantDataset(args.dataset, transform=get_eval_transforms())
+    known = set(index.paths) if len(index) else set()
+    new = [i for i, path in enumerate(dataset.images) if path not in known]
+    print(f"{len(index)} images indexed, {len(new)} new")
+
+    model, classes = load_checkpoint_model(args.checkpoint, device)
+    mapping = label_mapping(dataset.class_to_idx, classes, model.fc.out_features)
+    labels = torch.tensor(dataset.labels)
+    if mapping is not None:
+        labels = mapping[labels]  # add_classes.py checkpoints don't use the folder order
+
+    # Append in chunks so an interrupted run keeps most of its work
+    for start in range(0, len(new), args.chunk):
+        chunk = new[start:start + args.chunk]
+        loader = DataLoader(Subset(dataset, chunk), batch_size=BATCH_SIZE, shuffle=False, num_workers=NUM_WORKER)
+        embeddings = []
+        with torch.no_grad():
+            for X, _ in loader:
+                embeddings.append(model.features(X.to(device)).float().cpu())
+        index.add(torch.cat(embeddings).numpy(), labels[chunk].numpy(),
+                  [dataset.images[i] for i in chunk], model_version=version)
+        print(f"Indexed {min(start + args.chunk, len(new))}/{len(new)}")
+
+    if args.ivf_lists:
+        print(f"Clustering {len(index)} vectors into {args.ivf_lists} inverted lists")
+        index.build_ivf(args.ivf_lists)
+    print(f"Index at {args.output}: {len(index)} images, model {index.model_version}")
+
+
+if __name__ == "__main__":
+    main()
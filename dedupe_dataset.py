@@ -0,0 +1,97 @@
+"""
+Find near-duplicate images in the dataset with the same dHash + BK-tree
+lookup the API uses for repeated uploads.
+
+    python dedupe_dataset.py                                   # report duplicates in Plantdisease/train
+    python dedupe_dataset.py --against Plantdisease/test Plantdisease/valid   # also report leakage
+    python dedupe_dataset.py --move-to Plantdisease_duplicates  # move all but the first copy out
+
+Duplicates whose copies carry different labels are reported separately:
+they are label conflicts, not just redundancy. Nothing is moved unless
+--move-to is given, and the first copy (in sorted order) is always kept.
+"""
+import argparse
+import os
+import shutil
+from multiprocessing import Pool
+
+from src.perceptual_hash import BKTree, dhash_file
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def list_images(root):
+    """(path, class name) for every image under root/<class>/, in sorted order."""
+    images = []
+    for class_name in sorted(os.listdir(root)):
+        class_dir = os.path.join(root, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        for image_file in sorted(os.listdir(class_dir)):
+            if image_file.lower().endswith(IMAGE_EXTENSIONS):
+                images.append((os.path.join(class_dir, image_file), class_name))
+    return images
+
+
+def _hash(path):
+    try:
+        return dhash_file(path)
+    except Exception:
+        return None
+
+
+def hash_images(images, workers):
+    with Pool(workers) as pool:
+        return pool.map(_hash, [path for path, _ in images], chunksize=64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate detection for the plant disease dataset")
+    parser.add_argument("--root", default="Plantdisease/train")
+    parser.add_argument("--against", nargs="*", default=[], help="other splits to check for leakage from --root")
+    parser.add_argument("--max-distance", type=int, default=6, help="Hamming distance (of 64 bits) counted as duplicate")
+    parser.add_argument("--move-to", help="move duplicates here (keeping the class sub-folder)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    images = list_images(args.root)
+    print(f"Hashing {len(images)} images from {args.root}")
+    hashes = hash_images(images, args.workers)
+
+    tree = BKTree()
+    duplicates, conflicts = [], []
+    for (path, label), image_hash in zip(images, hashes):
+        if image_hash is None:
+            print(f"Could not decode {path}")
+            continue
+        matches = tree.search(image_hash, args.max_distance)
+        if matches:
+            distance, _, (original, original_label) = matches[0]
+            (duplicates if label == original_label else conflicts).append((path, original, distance))
+        else:
+            tree.add(image_hash, (path, label))
+
+    print(f"\n{len(duplicates)} near-duplicates within a class, {len(conflicts)} across classes (label conflicts)")
+    for path, original, distance in conflicts:
+        print(f"  CONFLICT d={distance}: {path} ~ {original}")
+
+    for split in args.against:
+        split_images = list_images(split)
+        leaked = 0
+        for (path, _), image_hash in zip(split_images, hash_images(split_images, args.workers)):
+            if image_hash is not None and tree.search(image_hash, args.max_distance):
+                leaked += 1
+        print(f"{split}: {leaked}/{len(split_images)} images have a near-duplicate in {args.root}")
+
+    if args.move_to:
+        for path, _, _ in duplicates + conflicts:
+            target = os.path.join(args.move_to, os.path.relpath(path, args.root))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(path, target)
+        print(f"Moved {len(duplicates) + len(conflicts)} images to {args.move_to}")
+    elif duplicates or conflicts:
+        print("Dry run; pass --move-to DIR to move the duplicates out of the training set")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Distil the ResNet50 checkpoint into a smaller, faster student.
+
+    python distill_model.py --layers 2 2 2 2 --widths 48 96 192 384
+
+The teacher runs once over the training images (deterministic
+preprocessing) and its logits are cached in a memory-mapped file, so every
+epoch only pays for the student. Compare the result with
+``python -m benchmarks.bench_distill --student model/student.pth``.
+"""
+import argparse
+import os
+
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+
+from app.config import MODEL_PATH
+from app.logging_config import setup_logging
+from src.datasets.plant_disease import PlantDataset, get_image_transforms, get_eval_transforms
+from src.evaluate import load_checkpoint_model, label_mapping, remap_labels
+from src.distill import IndexedDataset, DistillationLoss, DistillTrain, cache_teacher_logits
+from src.Models.resnet import ResNet
+
+device = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+# Data Loader parameters
+ROOT_DIR = "Plantdisease"
+BATCH_SIZE = 128
+NUM_WORKER = 4
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Knowledge distillation from the ResNet50 checkpoint")
+    parser.add_argument("--teacher", default=MODEL_PATH)
+    parser.add_argument("--output", default="model/student.pth")
+    parser.add_argument("--logit-cache", default="checkpoints/teacher_logits.f16")
+    parser.add_argument("--layers", type=int, nargs=4, default=[2, 2, 2, 2])
+    parser.add_argument("--widths", type=int, nargs=4, default=[48, 96, 192, 384])
+    parser.add_argument("--temperature", type=float, default=4.0)
+    parser.add_argument("--alpha", type=float, default=0.7, help="weight of the soft-target loss")
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--lr", type=float, default=0.001)
+    args = parser.parse_args()
+    setup_logging()
+
+    # Same image order for caching and training, so logit row i is image i
+    train_data = PlantDataset(ROOT_DIR + "/train", transform=get_image_transforms())
+    cache_data = PlantDataset(ROOT_DIR + "/train", transform=get_eval_transforms())
+    valid_data = PlantDataset(ROOT_DIR + "/valid", transform=get_eval_transforms())
+
+    # The student copies the teacher's outputs, so it gets the teacher's classes and order
+    teacher, classes = load_checkpoint_model(args.teacher, device)
+    num_classes = teacher.fc.out_features
+    mapping = label_mapping(train_data.class_to_idx, classes, num_classes)
+
+    os.makedirs(os.path.dirname(args.logit_cache) or ".", exist_ok=True)
+    teacher_logits = cache_teacher_logits(teacher, cache_data, args.logit_cache, args.teacher,
+                                          batch_size=BATCH_SIZE, num_workers=NUM_WORKER, device=device)
+    del teacher  # Not needed past this point
+    if device == 'cuda':
+        torch.cuda.empty_cache()
+
+    train_loader = remap_labels(DataLoader(IndexedDataset(train_data), batch_size=BATCH_SIZE, shuffle=True,
+                                           num_workers=NUM_WORKER), mapping)
+    valid_loader = remap_labels(DataLoader(valid_data, batch_size=BATCH_SIZE, shuffle=False,
+                                           num_workers=NUM_WORKER), mapping)
+
+    student = ResNet(num_classes, layers=args.layers, widths=args.widths).to(device)
+    trainer = DistillTrain(
+        teacher_logits=teacher_logits,
+        distill_loss=DistillationLoss(args.temperature, args.alpha),
+        model=student,
+        train_loader=train_loader,
+        test_loader=valid_loader,
+        loss_fn=nn.CrossEntropyLoss(),
+        optimizer=torch.optim.Adam(params=student.parameters(), lr=args.lr),
+        device=device,
+    )
+    trainer.train(args.epochs)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    student_checkpoint = {
+        'model_state_dict': student.state_dict(),
+        'layers': student.layers,
+        'widths': student.widths,
+    }
+    if classes:
+        student_checkpoint['classes'] = classes
+    torch.save(student_checkpoint, args.output)
+    print(f"Student model saved at {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Evaluate one or more checkpoints over a dataset split in one report.
+
+    python evaluate_model.py --split test
+    python evaluate_model.py --checkpoint model/final_model.pth model/student.pth model/pruned-0.50.pth
+    python evaluate_model.py --variants torch onnx onnx-int8 --output eval_report.json
+
+Preprocessing is deterministic (resize only) and batches are large. Each
+(checkpoint, variant) row reports accuracy, top-k accuracy, macro F1,
+expected calibration error and throughput. Per-class precision/recall/F1
+and the confusion matrix go to --output.
+
+Variants:
+    torch      the checkpoint as loaded (fp32)
+    onnx       exported with torch.onnx and run with onnxruntime (CPU)
+    onnx-int8  the ONNX export with onnxruntime dynamic int8 quantisation
+
+The ONNX variants need ``pip install onnx onnxruntime`` and are skipped with
+a message otherwise.
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import torch
+from torch.utils.data import DataLoader
+
+from app.config import MODEL_PATH
+from app.logging_config import setup_logging
+from src.datasets.plant_disease import PlantDataset, get_eval_transforms
+from src.evaluate import evaluate, load_checkpoint_model, label_mapping, remap_labels
+
+device = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+ROOT_DIR = "Plantdisease"
+NUM_WORKER = 4
+
+
+def onnx_predict(model, workdir, quantize=False):
+    """Export ``model`` to ONNX and return a batch -> logits function backed by onnxruntime."""
+    import onnxruntime
+
+    path = os.path.join(workdir, "model.onnx")
+    if not os.path.exists(path):
+        torch.onnx.export(model.cpu(), torch.zeros(1, 3, 224, 224), path, input_names=["input"],
+                          output_names=["logits"], dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}})
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        quantized = os.path.join(workdir, "model-int8.onnx")
+        quantize_dynamic(path, quantized, weight_type=QuantType.QInt8)
+        path = quantized
+
+    session = onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+
+    def predict(X):
+        return torch.from_numpy(session.run(None, {"input": X.cpu().numpy()})[0])
+    return predict
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched evaluation with per-class metrics")
+    parser.add_argument("--checkpoint", nargs="+", default=[MODEL_PATH])
+    parser.add_argument("--split", default="test", choices=["train", "test", "valid"])
+    parser.add_argument("--variants", nargs="+", default=["torch"], choices=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--topk", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--bins", type=int, default=15, help="confidence bins for ECE")
+    parser.add_argument("--output", help="write the full report (per-class metrics, confusion matrices) as JSON")
+    args = parser.parse_args()
+    setup_logging()
+
+    dataset = PlantDataset(os.path.join(ROOT_DIR, args.split), transform=get_eval_transforms())
+    folder_names = [name for name, _ in sorted(dataset.class_to_idx.items(), key=lambda item: item[1])]
+    folder_loader = DataLoader(dataset, batch_size=args.batch_size, shuffle=False, num_workers=NUM_WORKER,
+                               pin_memory=device == 'cuda')
+
+    reports = []
+    for checkpoint in args.checkpoint:
+        model, classes = load_checkpoint_model(checkpoint, device)
+        # Score in the model's class order (add_classes.py checkpoints append new classes)
+        class_names = classes or folder_names
+        loader = remap_labels(folder_loader, label_mapping(dataset.class_to_idx, classes, model.fc.out_features))
+        with tempfile.TemporaryDirectory() as workdir:
+            for variant in args.variants:
+                if variant == "torch":
+                    predict, run_device = model, device
+                else:
+                    try:
+                        predict = onnx_predict(model, workdir, quantize=variant == "onnx-int8")
+                    except ImportError as e:
+                        print(f"Skipping {variant} for {checkpoint}: {e}")
+                        continue
+                    run_device = "cpu"
+                print(f"Evaluating {checkpoint} [{variant}] on {args.split} ({len(dataset)} images)")
+                report = evaluate(predict, loader, len(class_names), device=run_device, topk=args.topk,
+                                  num_bins=args.bins, class_names=class_names)
+                report.update({"checkpoint": checkpoint, "variant": variant, "device": run_device, "split": args.split})
+                reports.append(report)
+                model.to(device)  # ONNX export moves it to the CPU
+
+    print(f"\n{'checkpoint':<32} {'variant':<10} {'acc':>7} "
+          + " ".join(f"{'top' + str(k):>7}" for k in args.topk)
+          + f" {'macroF1':>8} {'ECE':>7} {'img/s':>8}")
+    for r in reports:
+        topk = " ".join(f"{r['topk_accuracy'].get(f'top{k}', float('nan')) * 100:7.2f}" for k in args.topk)
+        print(f"{os.path.basename(r['checkpoint']):<32} {r['variant']:<10} {r['accuracy'] * 100:7.2f} {topk}"
+              f" {r['macro_f1']:8.4f} {r['ece']:7.4f} {r['model_images_per_sec']:8.1f}")
+
+    if reports:
+        worst = sorted(reports[0]["per_class"].items(), key=lambda item: item[1]["f1"])[:5]
+        print(f"\nLowest-F1 classes ({os.path.basename(reports[0]['checkpoint'])} [{reports[0]['variant']}]):")
+        for name, m in worst:
+            print(f"  {name:<50} P {m['precision']:.3f}  R {m['recall']:.3f}  F1 {m['f1']:.3f}  n={m['support']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+        print(f"\nFull report saved at {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Export a training checkpoint to the flat, memory-mappable weight format.
+
+Optimizer state and other training-only entries are stripped. The tensor
+data is optionally stored as fp16/bf16, and its SHA-256 is recorded in the
+header and checked again after writing.
+
+Usage: python export_weights.py checkpoints/checkpoint-epoch-20.pth model/final_model.weights [--dtype float16]
+"""
+import argparse
+import os
+
+from src.weights import STORAGE_DTYPES, export_checkpoint, load_flat_weights
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a checkpoint to a flat weight file")
+    parser.add_argument("checkpoint", help="torch checkpoint (.pth), with or without optimizer state")
+    parser.add_argument("output", help="flat weight file to write")
+    parser.add_argument("--dtype", choices=sorted(STORAGE_DTYPES), default="float32",
+                        help="storage dtype for floating-point weights")
+    args = parser.parse_args()
+
+    dtype = STORAGE_DTYPES[args.dtype]
+    checksum = export_checkpoint(args.checkpoint, args.output, dtype=None if args.dtype == "float32" else dtype)
+    load_flat_weights(args.output, verify=True)
+
+    source_mb = os.path.getsize(args.checkpoint) / 2**20
+    output_mb = os.path.getsize(args.output) / 2**20
+    print(f"Exported {args.checkpoint} ({source_mb:.1f} MiB) -> {args.output} ({output_mb:.1f} MiB, {args.dtype})")
+    print(f"sha256: {checksum}")
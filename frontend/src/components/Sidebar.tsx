@@ -191,6 +191,7 @@ const SideChatBot: React.FC = () => {
     const [isUploading, setIsUploading] = useState(false);
     const [chatEnabled, setChatEnabled] = useState(false);
     const [diagnosisContext, setDiagnosisContext] = useState(""); // Still store context in English for backend query base
+    const [sessionId, setSessionId] = useState<string | null>(null); // Server-side chat session for follow-ups and PDFs
     const [isGeneratingPDF, setIsGeneratingPDF] = useState(false);
     const scrollAreaRef = useRef<HTMLDivElement>(null);
     const fileInputRef = useRef<HTMLInputElement>(null);
@@ -299,6 +300,7 @@ const SideChatBot: React.FC = () => {
             // and the user's question (potentially in local language) and generates
             // the *response* in the selected language.
             setDiagnosisContext(data.gemini_response); // Storing the generated text as context
+            setSessionId(null); // A new diagnosis starts a new chat session
 
             setChatEnabled(true);
 
@@ -343,23 +345,21 @@ const SideChatBot: React.FC = () => {
         setIsStreaming(true);
 
         try {
-            // Send the user's question and the last bot response (as context) to the backend
-            // along with the preferred response language.
-            const res = await fetch(`${API_BASE_URL}/generate-stream`, {
+            // The backend keeps the conversation: follow-ups only send the session id and
+            // the new question. The first question (or one after the session expired)
+            // starts a session seeded with the last bot response as context.
+            const send = (session: string | null) => fetch(`${API_BASE_URL}/generate-stream`, {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
-                // Send the last generated bot response (as context), the user's question, and the language
-                body: JSON.stringify({
-                    // This combined input will be sent to the backend endpoint
-                    // The backend will then add the language instruction to this input before sending to Gemini
-                    // We're passing the *last bot response* as context here. If the backend
-                    // relied strictly on the *original diagnosis context* (which was English),
-                    // you'd pass that instead. Using the last response *might* help Gemini
-                    // stay in the current conversation's language context better.
-                    input: `Previous diagnosis/response context: "${currentContext}". User asks: "${question}"`,
-                    language: currentLang // *** Send the language code ***
-                })
+                body: JSON.stringify(session
+                    ? { session_id: session, input: question, language: currentLang }
+                    : { context: currentContext, input: question, language: currentLang })
             });
+            let res = await send(sessionId);
+            if (res.status === 404 && sessionId) {
+                res = await send(null);
+            }
+            setSessionId(res.headers.get("X-Session-Id") || null);
 
             if (!res.ok) {
                 // If the initial request fails before streaming starts
@@ -431,15 +431,19 @@ const SideChatBot: React.FC = () => {
         try {
             setIsGeneratingPDF(true);
 
-            const res = await fetch(`${API_BASE_URL}/generate-pdf/`, {
+            // With a chat session the backend already has the (compacted) conversation;
+            // fall back to sending the transcript if the session has expired
+            const request = (session: string | null) => fetch(`${API_BASE_URL}/generate-pdf/`, {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
-                // Corrected body: Wrap messages in an object and add language
-                body: JSON.stringify({
-                    messages: messages, // <-- Send the array under the 'messages' key
-                    language: currentLang // <-- Send the language under the 'language' key
-                })
+                body: JSON.stringify(session
+                    ? { session_id: session, language: currentLang }
+                    : { messages: messages, language: currentLang })
             });
+            let res = await request(sessionId);
+            if (res.status === 404 && sessionId) {
+                res = await request(null);
+            }
 
             if (!res.ok) {
                 let errorMessage = `PDF generation failed with status: ${res.status}`;
@@ -492,6 +496,7 @@ const SideChatBot: React.FC = () => {
     const handleRestart = () => {
         setChatEnabled(false);
         setDiagnosisContext("");
+        setSessionId(null);
         setMessages([
             { from: "bot", text: t.initialMessage } // Use translated initial message
         ]);
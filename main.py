@@ -5,6 +5,7 @@ from PIL import Image
 import torch
 import io
 import logging
+from app.logging_config import setup_logging
 from src.datasets.plant_disease import get_image_transforms, PlantDataset
 from src.Models.resnet import ResNet50
 from typing import List
@@ -26,8 +27,7 @@ app.add_middleware(
     allow_headers=["*"], 
 )
 
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+setup_logging()
 logger = logging.getLogger(__name__)
 
 def load_model():
@@ -160,10 +160,10 @@ async def predict_images(files: List[UploadFile] = File(...)):
             # Append result to predictions list
             predictions.append(result)
             
-            logger.info(f"Processed file: {file.filename}, result: {result['class_name']}")
+            logger.info("Processed file: %s, result: %s", file.filename, result['class_name'])
         
         except Exception as e:
-            logger.error(f"Error processing file {file.filename}: {e}")
+            logger.error("Error processing file %s: %s", file.filename, e)
             predictions.append({
                 'class_index': None,
                 'class_name': f"Error processing file {file.filename}: {e}"
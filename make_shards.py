@@ -0,0 +1,34 @@
+"""
+Pack the dataset into tar shards for sequential reads on network storage.
+
+    python make_shards.py --root Plantdisease --output Plantdisease_shards
+    # then train with ROOT_DIR = "Plantdisease_shards": dataloaders() detects the shards
+
+Every split directory under --root (train, test, valid) becomes a shard
+directory of the same name holding ~--shard-mb MB tar files and an index.json.
+"""
+import argparse
+import os
+
+from src.datasets.shards import write_shards
+from app.logging_config import setup_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert class-folder splits into tar shards")
+    parser.add_argument("--root", default="Plantdisease")
+    parser.add_argument("--output", default="Plantdisease_shards")
+    parser.add_argument("--splits", nargs="+", default=["train", "test", "valid"])
+    parser.add_argument("--shard-mb", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    setup_logging()
+
+    for split in args.splits:
+        index = write_shards(os.path.join(args.root, split), os.path.join(args.output, split),
+                             shard_bytes=args.shard_mb * 1024 * 1024, seed=args.seed)
+        print(f"{split}: {index['samples']} samples in {len(index['shards'])} shards")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Pre-compute visualization datasets for every class in the label set so that
+dashboard loads are served from the cache without any Gemini call.
+
+Usage: python prewarm_visualizations.py [--root Plantdisease/train]
+"""
+import argparse
+import asyncio
+import os
+
+from app.config import DATASET_PATH, VIZ_PREWARM_CONCURRENCY, VIZ_PROMPT_VERSION
+from app.router.data_viz import VIZ_TYPES, get_dataset, viz_cache
+
+
+async def prewarm(class_names, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {"cached": 0, "generated": 0, "failed": 0}
+
+    async def warm(disease, viz_type):
+        if viz_cache.get(disease, viz_type, VIZ_PROMPT_VERSION) is not None:
+            counts["cached"] += 1
+            return
+        async with semaphore:
+            try:
+                await get_dataset(disease, viz_type)
+                counts["generated"] += 1
+                print(f"Generated {viz_type} for {disease}")
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"Failed {viz_type} for {disease}: {e}")
+
+    await asyncio.gather(*(warm(d, t) for d in class_names for t in VIZ_TYPES))
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-warm the visualization dataset cache")
+    parser.add_argument("--root", default=DATASET_PATH, help="dataset split whose class folders form the label set")
+    parser.add_argument("--concurrency", type=int, default=VIZ_PREWARM_CONCURRENCY)
+    args = parser.parse_args()
+
+    class_names = sorted(d for d in os.listdir(args.root) if os.path.isdir(os.path.join(args.root, d)))
+    print(f"Pre-warming {len(class_names)} classes x {len(VIZ_TYPES)} visualization types")
+    counts = asyncio.run(prewarm(class_names, args.concurrency))
+    print(f"Done: {counts}")
@@ -0,0 +1,126 @@
+"""
+Structured channel pruning of the ResNet50 checkpoint.
+
+    python prune_model.py --sparsity 0.25 0.5 0.75 --epochs 3
+
+For each sparsity level the inner channels of every ResidualBlock are
+ranked by BatchNorm gamma and physically removed. The smaller dense model
+is fine-tuned briefly with Train and saved as
+model/pruned-<sparsity>.pth (ModelManager can load it through MODEL_PATH).
+The script then prints a table of MACs, parameters, CPU latency and test
+accuracy, with the unpruned model as the baseline row.
+"""
+import argparse
+import copy
+import os
+import statistics
+import time
+
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+
+from app.config import MODEL_PATH
+from app.logging_config import setup_logging
+from src.datasets.plant_disease import dataloaders, PlantDataset, get_eval_transforms
+from src.evaluate import load_checkpoint_model, label_mapping, remap_labels
+from src.prune import prune_model, count_flops
+from src.train import Train
+
+device = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+# Data Loader parameters
+ROOT_DIR = "Plantdisease"
+BATCH_SIZE = 128
+NUM_WORKER = 4
+
+
+def cpu_latency_ms(model, repeat=20):
+    """Median single-image CPU latency."""
+    model = copy.deepcopy(model).cpu().eval()
+    x = torch.randn(1, 3, 224, 224)
+    with torch.no_grad():
+        for _ in range(3):
+            model(x)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            model(x)
+            times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def test_accuracy(model, loader):
+    model.eval()
+    correct = total = 0
+    with torch.no_grad():
+        for X, y in loader:
+            correct += (model(X.to(device)).argmax(dim=1).cpu() == y).sum().item()
+            total += len(y)
+    return correct / total * 100
+
+
+def measure(model, test_loader):
+    return {
+        "mmacs": count_flops(model) / 1e6,
+        "params_m": sum(p.numel() for p in model.parameters()) / 1e6,
+        "latency_ms": cpu_latency_ms(model),
+        "accuracy": test_accuracy(model, test_loader),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Structured channel pruning with fine-tuning")
+    parser.add_argument("--checkpoint", default=MODEL_PATH)
+    parser.add_argument("--sparsity", type=float, nargs="+", default=[0.25, 0.5, 0.75])
+    parser.add_argument("--epochs", type=int, default=3, help="fine-tuning epochs per sparsity level")
+    parser.add_argument("--lr", type=float, default=0.0001)
+    parser.add_argument("--output-dir", default="model")
+    args = parser.parse_args()
+    setup_logging()
+
+    train_loader, _, valid_loader, _ = dataloaders(ROOT_DIR, BATCH_SIZE, NUM_WORKER)
+    test_data = PlantDataset(ROOT_DIR + "/test", transform=get_eval_transforms())
+    test_loader = DataLoader(test_data, batch_size=BATCH_SIZE, shuffle=False, num_workers=NUM_WORKER)
+
+    base, classes = load_checkpoint_model(args.checkpoint, device)
+    # Fine-tune and score against the checkpoint's own class order
+    mapping = label_mapping(test_data.class_to_idx, classes, base.fc.out_features)
+    train_loader, valid_loader, test_loader = (remap_labels(loader, mapping)
+                                               for loader in (train_loader, valid_loader, test_loader))
+
+    results = [("baseline", measure(base, test_loader))]
+    for sparsity in args.sparsity:
+        print(f"\nPruning {sparsity:.0%} of block channels")
+        model = copy.deepcopy(base)
+        widths = prune_model(model, sparsity)
+
+        trainer = Train(
+            model=model,
+            train_loader=train_loader,
+            test_loader=valid_loader,
+            loss_fn=nn.CrossEntropyLoss(),
+            optimizer=torch.optim.Adam(params=model.parameters(), lr=args.lr),
+            device=device,
+        )
+        trainer.train(args.epochs)
+
+        path = os.path.join(args.output_dir, f"pruned-{sparsity:.2f}.pth")
+        pruned = {
+            'model_state_dict': model.state_dict(),
+            'block_widths': widths,
+            'sparsity': sparsity,
+        }
+        if classes:
+            pruned['classes'] = classes
+        torch.save(pruned, path)
+        print(f"Pruned model saved at {path}")
+        results.append((f"{sparsity:.0%}", measure(model, test_loader)))
+
+    print(f"\n{'sparsity':<9} {'MMACs':>9} {'params M':>9} {'CPU ms':>8} {'test acc':>9}")
+    for name, r in results:
+        print(f"{name:<9} {r['mmacs']:9.0f} {r['params_m']:9.2f} {r['latency_ms']:8.1f} {r['accuracy']:8.2f}%")
+
+
+if __name__ == "__main__":
+    main()
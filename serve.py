@@ -0,0 +1,39 @@
+"""
+Multi-worker API launcher with shared model weights.
+
+The checkpoint is loaded once here and exported to a flat weight file in
+shared memory (/dev/shm when available). Every uvicorn worker maps that file
+read-only, so the weights occupy physical memory once no matter how many
+workers run. When the checkpoint changes, the workers' hot reload exports
+it again the same way (the first worker writes it, the others reuse it).
+Torch threads are split across the workers.
+
+Usage: python serve.py --workers 4 [--host 0.0.0.0] [--port 8000]
+"""
+import argparse
+import os
+
+import uvicorn
+
+from app.config import MODEL_PATH
+from app.models.model_loader import export_shared_weights, shared_weights_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the API with weights shared across workers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--checkpoint", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    shared_dir = shared_weights_dir()
+    weights_path = export_shared_weights(args.checkpoint, shared_dir)
+    print(f"Serving {args.workers} workers from shared weights {weights_path}")
+
+    # Inherited by the worker processes uvicorn spawns; they re-export to
+    # the same directory when the checkpoint changes (hot reload)
+    os.environ["PLANT_MODEL_PATH"] = args.checkpoint
+    os.environ["PLANT_SHARED_WEIGHTS_DIR"] = shared_dir
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
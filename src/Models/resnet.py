@@ -27,21 +27,23 @@ class ResidualBlock(nn.Module):
         out = self.relu(out)
         return out
 
-# Define the ResNet-50 model
-class ResNet50(nn.Module):
-    def __init__(self, num_classes):
-        super(ResNet50, self).__init__()
-        self.in_channels = 64
-        self.conv1 = nn.Conv2d(3, 64, kernel_size=7, stride=2, padding=3, bias=False)
-        self.bn1 = nn.BatchNorm2d(64)
+# Generic ResNet built from ResidualBlocks; widths/depths are configurable
+class ResNet(nn.Module):
+    def __init__(self, num_classes, layers=(3, 4, 6, 3), widths=(64, 128, 256, 512)):
+        super(ResNet, self).__init__()
+        self.layers = tuple(layers)
+        self.widths = tuple(widths)
+        self.in_channels = widths[0]
+        self.conv1 = nn.Conv2d(3, widths[0], kernel_size=7, stride=2, padding=3, bias=False)
+        self.bn1 = nn.BatchNorm2d(widths[0])
         self.relu = nn.ReLU(inplace=True)
         self.maxpool = nn.MaxPool2d(kernel_size=3, stride=2, padding=1)
-        self.layer1 = self.make_layer(ResidualBlock, 64, 3)
-        self.layer2 = self.make_layer(ResidualBlock, 128, 4, stride=2)
-        self.layer3 = self.make_layer(ResidualBlock, 256, 6, stride=2)
-        self.layer4 = self.make_layer(ResidualBlock, 512, 3, stride=2)
+        self.layer1 = self.make_layer(ResidualBlock, widths[0], layers[0])
+        self.layer2 = self.make_layer(ResidualBlock, widths[1], layers[1], stride=2)
+        self.layer3 = self.make_layer(ResidualBlock, widths[2], layers[2], stride=2)
+        self.layer4 = self.make_layer(ResidualBlock, widths[3], layers[3], stride=2)
         self.avgpool = nn.AdaptiveAvgPool2d((1, 1))
-        self.fc = nn.Linear(512, num_classes)
+        self.fc = nn.Linear(widths[3], num_classes)
 
     def make_layer(self, block, out_channels, num_blocks, stride=1):
         downsample = None
@@ -57,7 +59,8 @@ class ResNet50(nn.Module):
             layers.append(block(out_channels, out_channels))
         return nn.Sequential(*layers)
 
-    def forward(self, x):
+    def features(self, x):
+        """Pooled backbone features (the input of ``fc``), shape (N, widths[3])."""
         x = self.conv1(x)
         x = self.bn1(x)
         x = self.relu(x)
@@ -69,6 +72,19 @@ class ResNet50(nn.Module):
         x = self.layer4(x)
 
         x = self.avgpool(x)
-        x = torch.flatten(x, 1)
-        x = self.fc(x)
-        return x
\ No newline at end of file
+        return torch.flatten(x, 1)
+
+    def forward(self, x):
+        return self.fc(self.features(x))
+
+
+# Define the ResNet-50 model
+class ResNet50(ResNet):
+    def __init__(self, num_classes):
+        super(ResNet50, self).__init__(num_classes)
+
+
+# Narrow, shallow variant: fast first stage of the inference cascade
+class ResNetLite(ResNet):
+    def __init__(self, num_classes, layers=(1, 1, 1, 1), widths=(32, 64, 128, 256)):
+        super(ResNetLite, self).__init__(num_classes, layers, widths)
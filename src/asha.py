@@ -0,0 +1,53 @@
+import math
+
+
+class ASHA:
+    """
+    Asynchronous successive halving (Li et al., "A System for Massively
+    Parallel Hyperparameter Tuning").
+
+    Rung k trains a trial up to ``min_epochs * eta**k`` epochs. Whenever a
+    worker is free, ``next_job`` promotes the best not-yet-promoted trial of
+    the highest rung where it ranks in the top 1/eta, or otherwise starts a
+    new trial at rung 0. No rung ever waits for a full cohort, so workers
+    never sit idle behind a straggler.
+
+    Args:
+        num_trials (int): Configurations to start in total.
+        min_epochs (int): Epochs of the lowest rung.
+        max_epochs (int): Epochs of the top rung (trials stop there).
+        eta (int): Reduction factor between rungs.
+    """
+
+    def __init__(self, num_trials, min_epochs=1, max_epochs=20, eta=3):
+        self.num_trials = num_trials
+        self.eta = eta
+        num_rungs = int(math.floor(math.log(max_epochs / min_epochs, eta))) + 1
+        self.rung_epochs = [min(max_epochs, min_epochs * eta ** k) for k in range(num_rungs)]
+        if self.rung_epochs[-1] < max_epochs:
+            self.rung_epochs.append(max_epochs)
+        self.results = [dict() for _ in self.rung_epochs]  # rung -> {trial: accuracy}
+        self.promoted = [set() for _ in self.rung_epochs]
+        self.started = 0
+
+    def next_job(self):
+        """(trial id, rung) to run next, or None if nothing can start right now."""
+        for rung in reversed(range(len(self.rung_epochs) - 1)):
+            results = self.results[rung]
+            top_n = len(results) // self.eta
+            ranked = sorted(results, key=results.get, reverse=True)[:top_n]
+            for trial in ranked:
+                if trial not in self.promoted[rung]:
+                    self.promoted[rung].add(trial)
+                    return trial, rung + 1
+        if self.started < self.num_trials:
+            self.started += 1
+            return self.started - 1, 0
+        return None
+
+    def report(self, trial, rung, accuracy):
+        self.results[rung][trial] = accuracy
+
+    def best_rung(self, trial):
+        """Highest rung ``trial`` completed."""
+        return max(rung for rung, results in enumerate(self.results) if trial in results)
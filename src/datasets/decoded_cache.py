@@ -0,0 +1,105 @@
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+import torch
+from torch.utils.data import Dataset
+from torchvision import transforms
+
+from src.datasets.plant_disease import PlantDataset
+
+logger = logging.getLogger(__name__)
+
+
+def _decode(args):
+    path, size = args
+    with Image.open(path) as image:
+        image.draft("RGB", (size, size))  # Let libjpeg downscale while decoding
+        return np.asarray(image.convert("RGB").resize((size, size), Image.BILINEAR), dtype=np.uint8)
+
+
+def build_decoded_cache(root, path, size=224, workers=None):
+    """
+    Decode a class-folder split once into a uint8 memmap of (N, size, size, 3).
+
+    This is the deterministic first step of the training pipeline (the
+    224x224 resize), done once. Several processes training on the same cache
+    share it through the page cache instead of each decoding every JPEG
+    every epoch. Rebuilt only if the image list or size changed.
+
+    Returns:
+        str: ``path``, for DecodedDataset.
+    """
+    dataset = PlantDataset(root)  # Only the sorted image list and labels are used
+    digest = hashlib.sha256("\n".join(dataset.images).encode("utf-8")).hexdigest()
+    meta = {"count": len(dataset), "size": size, "fingerprint": digest,
+            "labels": dataset.labels, "class_to_idx": dataset.class_to_idx}
+    meta_path = f"{path}.json"
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f) == meta:
+                logger.info("Reusing decoded cache %s", path)
+                return path
+
+    logger.info("Decoding %d images from %s into %s", len(dataset), root, path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    images = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=(len(dataset), size, size, 3))
+    with ProcessPoolExecutor(workers) as pool:
+        for i, array in enumerate(pool.map(_decode, [(p, size) for p in dataset.images], chunksize=64)):
+            images[i] = array
+    images.flush()
+    del images
+    os.replace(tmp_path, path)
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    return path
+
+
+def get_tensor_transforms(train=True, size=224):
+    """
+    Augmentations matching get_image_transforms(), applied to decoded uint8 tensors.
+
+    Returns:
+        callable: (3, H, W) uint8 tensor -> (3, size, size) float tensor in [0, 1].
+    """
+    steps = []
+    if train:
+        steps += [
+            transforms.RandomHorizontalFlip(p=0.5),
+            transforms.RandomVerticalFlip(p=0.5),
+            transforms.RandomResizedCrop(size=size, scale=(0.8, 1.0), antialias=True),
+        ]
+    steps.append(transforms.ConvertImageDtype(torch.float32))
+    return transforms.Compose(steps)
+
+
+class DecodedDataset(Dataset):
+    """
+    Dataset over a cache written by build_decoded_cache.
+
+    The array is memory-mapped read-only; each item is one row copied out of
+    the page cache, so there is no file open or JPEG decode per sample.
+    """
+
+    def __init__(self, path, transform=None):
+        with open(f"{path}.json") as f:
+            meta = json.load(f)
+        self.path = path
+        self.labels = meta["labels"]
+        self.class_to_idx = meta["class_to_idx"]
+        self.transform = transform if transform is not None else get_tensor_transforms(train=True)
+        self._images = None  # Opened lazily so the dataset pickles cheaply into workers
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        if self._images is None:
+            self._images = np.load(self.path, mmap_mode="r")
+        image = torch.from_numpy(np.array(self._images[idx])).permute(2, 0, 1)
+        return self.transform(image), self.labels[idx]
@@ -6,36 +6,63 @@ from torch.utils.data import Dataset
 from torchvision import transforms
 from torch.utils.data import DataLoader
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,  # Set to DEBUG for more verbose output
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]  # Log to console
-)
-
-def get_image_transforms():
+from src.datasets.shards import ShardDataset, is_shard_dir
+
+# Handlers and levels are configured by the application (app/logging_config.setup_logging)
+logger = logging.getLogger(__name__)
+
+def get_image_transforms(size=224):
     """
     Get the transformation pipeline for image preprocessing.
 
+    Args:
+        size (int): Output resolution; lower values are used by the early
+            phases of progressive resizing.
+
     Returns:
         transforms.Compose: Composed transformation pipeline.
     """
-    logging.info("Creating image transformation pipeline")
+    logger.info("Creating image transformation pipeline at %dx%d", size, size)
     transform = transforms.Compose([
-        transforms.Resize((224, 224)),  # Resize to a fixed size
+        transforms.Resize((size, size)),  # Resize to a fixed size
         transforms.RandomHorizontalFlip(p=0.5),  # Randomly flip horizontally
         transforms.RandomVerticalFlip(p=0.5),  # Randomly flip vertically
-        transforms.RandomResizedCrop(size=224, scale=(0.8, 1.0)),  # Randomly crop and resize
+        transforms.RandomResizedCrop(size=size, scale=(0.8, 1.0)),  # Randomly crop and resize
         transforms.ToTensor(),  # Convert to tensor
     ])
     return transform
 
 
+def get_class_to_idx(root):
+    """
+    Build the class-to-index mapping from the class folders under ``root``,
+    using the same ordering as PlantDataset but without listing any images.
+
+    Returns:
+        dict: Class name -> index.
+    """
+    return {label_dir: i for i, label_dir in enumerate(sorted(os.listdir(root)))}
+
+
+def get_eval_transforms():
+    """
+    Get the deterministic transformation pipeline used for evaluation and
+    calibration (no random flips or crops).
+
+    Returns:
+        transforms.Compose: Composed transformation pipeline.
+    """
+    return transforms.Compose([
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+    ])
+
+
 class PlantDataset(Dataset):
     def __init__(self, root, transform=None):
-        logging.info(f"Initializing dataset from {root}")
+        logger.info("Initializing dataset from %s", root)
         self.root = root
-        self.transform = get_image_transforms()
+        self.transform = transform if transform is not None else get_image_transforms()
         self.images = []
         self.labels = []
         self.class_to_idx = {}
@@ -48,10 +75,10 @@ class PlantDataset(Dataset):
                 self.images.append(os.path.join(class_dir, image_file))
                 self.labels.append(i)
         
-        logging.info(f"Loaded {len(self.images)} images from {root}")
+        logger.info("Loaded %d images from %s", len(self.images), root)
 
     def get_class_to_idx(self):
-        logging.info(f"Class to index mapping: {self.class_to_idx}")
+        logger.info("Class to index mapping: %s", self.class_to_idx)
         return self.class_to_idx
 
     def __len__(self):
@@ -59,28 +86,38 @@ class PlantDataset(Dataset):
     
     def __getitem__(self, idx):
         image_path = self.images[idx]
-        logging.debug(f"Loading image: {image_path}")
+        logger.debug("Loading image: %s", image_path)
         image = Image.open(image_path).convert("RGB")
         label = self.labels[idx]
         
         if self.transform:
-            logging.debug(f"Applying transforms to image: {image_path}")
+            logger.debug("Applying transforms to image: %s", image_path)
             image = self.transform(image)
         return image, label
 
 
+def split_loader(path, transform, shuffle, BATCH_SIZE, NUM_WORKER):
+    """
+    DataLoader over one split, stored either as class folders or as tar
+    shards from make_shards.py (detected by the shard index file).
+    """
+    if is_shard_dir(path):
+        data = ShardDataset(path, transform=transform, shuffle=shuffle)
+        # Shuffling happens inside the stream; DataLoader can't shuffle an IterableDataset
+        return DataLoader(data, batch_size=BATCH_SIZE, num_workers=NUM_WORKER), data
+    data = PlantDataset(path, transform=transform)
+    return DataLoader(data, batch_size=BATCH_SIZE, shuffle=shuffle, num_workers=NUM_WORKER), data
+
+
 def dataloaders(ROOT_DIR, BATCH_SIZE, NUM_WORKER):
-    logging.info(f"Creating dataloaders with BATCH_SIZE={BATCH_SIZE} and NUM_WORKER={NUM_WORKER}")
-    
-    train_data = PlantDataset(ROOT_DIR + "/train", transform=get_image_transforms())
-    test_data = PlantDataset(ROOT_DIR + "/test", transform=get_image_transforms())
-    valid_data = PlantDataset(ROOT_DIR + "/valid", transform=get_image_transforms())
+    logger.info("Creating dataloaders with BATCH_SIZE=%d and NUM_WORKER=%d", BATCH_SIZE, NUM_WORKER)
 
-    train_loader = DataLoader(train_data, batch_size=BATCH_SIZE, shuffle=True, num_workers=NUM_WORKER)
-    test_loader = DataLoader(test_data, batch_size=BATCH_SIZE, shuffle=False, num_workers=NUM_WORKER)
-    valid_loader = DataLoader(valid_data, batch_size=BATCH_SIZE, shuffle=True, num_workers=NUM_WORKER)
+    train_loader, train_data = split_loader(ROOT_DIR + "/train", get_image_transforms(), True, BATCH_SIZE, NUM_WORKER)
+    # Evaluation splits use deterministic preprocessing so their metrics are reproducible
+    test_loader, _ = split_loader(ROOT_DIR + "/test", get_eval_transforms(), False, BATCH_SIZE, NUM_WORKER)
+    valid_loader, _ = split_loader(ROOT_DIR + "/valid", get_eval_transforms(), False, BATCH_SIZE, NUM_WORKER)
     
     num_classes = len(train_data.class_to_idx)
-    logging.info(f"Number of classes: {num_classes}")
+    logger.info("Number of classes: %d", num_classes)
     
     return train_loader, test_loader, valid_loader, num_classes
@@ -0,0 +1,195 @@
+import io
+import json
+import logging
+import os
+import random
+import tarfile
+
+from PIL import Image
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+
+logger = logging.getLogger(__name__)
+
+SHARD_BYTES = 256 * 1024 * 1024
+INDEX_FILE = "index.json"
+
+
+def is_shard_dir(path):
+    """True if ``path`` holds tar shards written by write_shards."""
+    return os.path.exists(os.path.join(path, INDEX_FILE))
+
+
+def write_shards(root, out_dir, shard_bytes=SHARD_BYTES, seed=0):
+    """
+    Pack a class-folder split into tar shards of roughly ``shard_bytes``.
+
+    Samples are shuffled once before packing, so every shard already holds a
+    mix of classes. Each sample is two members: ``<key>.<ext>`` with the
+    original image bytes and ``<key>.cls`` with the label index. An
+    ``index.json`` next to the shards records the class mapping and the
+    sample count of every shard.
+
+    Args:
+        root (str): Split directory (root/<class>/<image>).
+        out_dir (str): Output directory for the shards.
+        shard_bytes (int): Target shard size.
+        seed (int): Seed for the packing order.
+
+    Returns:
+        dict: The written index.
+    """
+    class_to_idx = {label_dir: i for i, label_dir in enumerate(sorted(os.listdir(root)))}
+    samples = []
+    for label_dir, label in class_to_idx.items():
+        class_dir = os.path.join(root, label_dir)
+        for image_file in sorted(os.listdir(class_dir)):
+            samples.append((os.path.join(class_dir, image_file), label))
+    random.Random(seed).shuffle(samples)
+
+    os.makedirs(out_dir, exist_ok=True)
+    shards = []
+    tar, size, count = None, 0, 0
+
+    def close_shard():
+        tar.close()
+        shards[-1]["samples"] = count
+
+    for key, (path, label) in enumerate(samples):
+        if tar is None or size >= shard_bytes:
+            if tar is not None:
+                close_shard()
+            name = f"shard-{len(shards):06d}.tar"
+            tar = tarfile.open(os.path.join(out_dir, name), "w")
+            shards.append({"name": name})
+            size, count = 0, 0
+
+        ext = os.path.splitext(path)[1].lower() or ".jpg"
+        with open(path, "rb") as f:
+            data = f.read()
+        for member, payload in ((f"{key:09d}{ext}", data), (f"{key:09d}.cls", str(label).encode())):
+            info = tarfile.TarInfo(member)
+            info.size = len(payload)
+            tar.addfile(info, io.BytesIO(payload))
+        size += len(data) + 2048  # Two 512-byte headers plus padding, roughly
+        count += 1
+
+    if tar is not None:
+        close_shard()
+
+    index = {"class_to_idx": class_to_idx, "shards": shards, "samples": len(samples)}
+    with open(os.path.join(out_dir, INDEX_FILE), "w") as f:
+        json.dump(index, f, indent=2)
+    logger.info("Wrote %d samples from %s into %d shards in %s", len(samples), root, len(shards), out_dir)
+    return index
+
+
+def _world():
+    if torch.distributed.is_available() and torch.distributed.is_initialized():
+        return torch.distributed.get_rank(), torch.distributed.get_world_size()
+    return 0, 1
+
+
+class ShardDataset(IterableDataset):
+    """
+    Stream (image, label) pairs from tar shards with sequential reads only.
+
+    Shards are split across DDP ranks and DataLoader workers by striding
+    over a shard order that every rank derives from the same seed and
+    epoch, so no sample is read twice per epoch. Within a worker, shard
+    order and a ``shuffle_buffer``-sized reservoir are randomised per epoch.
+
+    Args:
+        shard_dir (str): Directory written by write_shards.
+        transform (callable, optional): Applied to each PIL image.
+        shuffle (bool): Shuffle shard order and samples (training).
+        shuffle_buffer (int): Samples held for buffered shuffling.
+        seed (int): Shared seed; keep it equal on all ranks.
+    """
+
+    def __init__(self, shard_dir, transform=None, shuffle=True, shuffle_buffer=2000, seed=0):
+        logger.info("Initializing shard dataset from %s", shard_dir)
+        with open(os.path.join(shard_dir, INDEX_FILE)) as f:
+            index = json.load(f)
+        self.shard_dir = shard_dir
+        self.transform = transform
+        self.shuffle = shuffle
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.epoch = 0
+        self.class_to_idx = index["class_to_idx"]
+        self.shards = index["shards"]
+        self.num_samples = index["samples"]
+
+    def set_epoch(self, epoch):
+        """Change the shard order for a new epoch (call on every rank, like DistributedSampler)."""
+        self.epoch = epoch
+
+    def get_class_to_idx(self):
+        return self.class_to_idx
+
+    def __len__(self):
+        # Per-rank estimate; shards are assigned whole, so ranks can differ slightly
+        return self.num_samples // _world()[1]
+
+    def _assigned_shards(self):
+        rank, world_size = _world()
+        info = get_worker_info()
+        worker_id, num_workers = (info.id, info.num_workers) if info is not None else (0, 1)
+
+        shards = list(self.shards)
+        if self.shuffle:
+            random.Random(self.seed + self.epoch).shuffle(shards)
+        consumers = world_size * num_workers
+        if len(shards) < consumers:
+            logger.warning("%d shards for %d rank x worker consumers; some will be idle", len(shards), consumers)
+        mine = shards[rank * num_workers + worker_id::consumers]
+
+        # Per-worker randomness: DataLoader reseeds workers every epoch
+        rng = random.Random(info.seed if info is not None else self.seed + self.epoch)
+        if self.shuffle:
+            rng.shuffle(mine)
+        return mine, rng
+
+    def _samples(self, shards):
+        for shard in shards:
+            with tarfile.open(os.path.join(self.shard_dir, shard["name"]), "r|") as tar:
+                key, image_bytes, label = None, None, None
+                for member in tar:
+                    if not member.isfile():
+                        continue
+                    member_key, ext = os.path.splitext(member.name)
+                    data = tar.extractfile(member).read()
+                    if member_key != key:
+                        key, image_bytes, label = member_key, None, None
+                    if ext == ".cls":
+                        label = int(data)
+                    else:
+                        image_bytes = data
+                    if image_bytes is not None and label is not None:
+                        yield image_bytes, label
+                        key = None
+
+    def __iter__(self):
+        shards, rng = self._assigned_shards()
+        buffer = []
+        for sample in self._samples(shards):
+            if not self.shuffle:
+                yield self._decode(sample)
+                continue
+            if len(buffer) < self.shuffle_buffer:
+                buffer.append(sample)
+                continue
+            i = rng.randrange(len(buffer))
+            buffer[i], sample = sample, buffer[i]
+            yield self._decode(sample)
+        rng.shuffle(buffer)
+        for sample in buffer:
+            yield self._decode(sample)
+
+    def _decode(self, sample):
+        image_bytes, label = sample
+        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        if self.transform:
+            image = self.transform(image)
+        return image, label
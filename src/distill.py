@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, Dataset
+
+from src.train import Train
+
+
+class IndexedDataset(Dataset):
+    """Wrap a dataset so every item also carries its index: (X, y, idx).
+
+    The index is what lets a shuffled, augmented training batch look up the
+    cached teacher logits of its images.
+    """
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, idx):
+        X, y = self.dataset[idx]
+        return X, y, idx
+
+
+def _fingerprint(dataset, checkpoint):
+    """Identify (image list, checkpoint) so a stale cache is never reused."""
+    digest = hashlib.sha256()
+    for path in getattr(dataset, "images", []):
+        digest.update(path.encode("utf-8"))
+    digest.update(os.path.abspath(checkpoint).encode("utf-8"))
+    digest.update(str(os.path.getmtime(checkpoint)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def cache_outputs(forward, dataset, path, checkpoint, num_outputs, batch_size=128, num_workers=4, device="cpu"):
+    """Run ``forward`` once over ``dataset`` and keep its outputs in a memory-mapped file.
+
+    Outputs are stored as float16, one row per image in dataset order, next
+    to a small JSON sidecar describing the shape and what produced them. If
+    the sidecar matches, the existing file is reused and nothing runs.
+
+    Args:
+        forward (callable): Batch -> (batch, num_outputs) tensor, e.g. a
+            teacher model or a backbone's ``features``.
+        dataset (PlantDataset): Images, in a fixed order, with deterministic
+            preprocessing.
+        path (str): Cache file.
+        checkpoint (str): Checkpoint the model was loaded from.
+        num_outputs (int): Width of each output row.
+        batch_size (int): Forward batch size.
+        num_workers (int): DataLoader workers.
+        device (str): Device to run the forward pass on.
+
+    Returns:
+        np.memmap: Read-only (num_images, num_outputs) float16 outputs.
+    """
+    meta = {
+        "shape": [len(dataset), num_outputs],
+        "dtype": "float16",
+        "fingerprint": _fingerprint(dataset, checkpoint),
+    }
+    meta_path = f"{path}.json"
+
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f) == meta:
+                print(f"Reusing cached outputs from {path}")
+                return np.memmap(path, dtype=np.float16, mode="r", shape=tuple(meta["shape"]))
+
+    print(f"Caching outputs for {len(dataset)} images at {path}")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    outputs = np.memmap(tmp_path, dtype=np.float16, mode="w+", shape=tuple(meta["shape"]))
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers)
+
+    start = 0
+    with torch.no_grad():
+        for X, _ in loader:
+            out = forward(X.to(device)).float().cpu().numpy()
+            outputs[start:start + len(out)] = out
+            start += len(out)
+    outputs.flush()
+    del outputs
+    os.replace(tmp_path, path)
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+
+    return np.memmap(path, dtype=np.float16, mode="r", shape=tuple(meta["shape"]))
+
+
+def cache_teacher_logits(teacher, dataset, path, teacher_checkpoint, batch_size=128, num_workers=4, device="cpu"):
+    """Run the teacher once over ``dataset`` and cache its logits (see cache_outputs).
+
+    ``dataset`` should use deterministic preprocessing: the student sees
+    augmented views during training, but each image gets one soft target.
+    """
+    teacher.eval()
+    return cache_outputs(teacher, dataset, path, teacher_checkpoint, teacher.fc.out_features,
+                         batch_size=batch_size, num_workers=num_workers, device=device)
+
+
+class DistillationLoss(nn.Module):
+    """Hinton-style distillation loss.
+
+    ``alpha * T^2 * KL(softmax(teacher / T) || softmax(student / T)) + (1 - alpha) * CE(student, y)``.
+    The T^2 factor keeps the soft-target gradients on the same scale as the
+    hard-label ones when the temperature changes.
+    """
+
+    def __init__(self, temperature=4.0, alpha=0.7):
+        super(DistillationLoss, self).__init__()
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def forward(self, student_logits, teacher_logits, y):
+        T = self.temperature
+        soft = F.kl_div(
+            F.log_softmax(student_logits / T, dim=1),
+            F.log_softmax(teacher_logits / T, dim=1),
+            reduction="batchmean",
+            log_target=True,
+        ) * (T * T)
+        hard = F.cross_entropy(student_logits, y)
+        return self.alpha * soft + (1 - self.alpha) * hard
+
+
+class DistillTrain(Train):
+    """Train a student against cached teacher logits.
+
+    ``train_loader`` must yield (X, y, idx) batches (see IndexedDataset);
+    evaluation is unchanged and uses ``loss_fn`` on hard labels.
+    """
+
+    def __init__(self, teacher_logits, distill_loss, **kwargs):
+        super(DistillTrain, self).__init__(**kwargs)
+        self.teacher_logits = teacher_logits
+        self.distill_loss = distill_loss
+
+    def compute_loss(self, X, y, idx):
+        # Fancy indexing copies just this batch's rows out of the mapping
+        teacher_logits = torch.from_numpy(self.teacher_logits[idx.numpy()]).float().to(self.device)
+        y_pred = self.model(X)
+        return y_pred, self.distill_loss(y_pred, teacher_logits, y)
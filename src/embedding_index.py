@@ -0,0 +1,207 @@
+import json
+import os
+
+import numpy as np
+
+# Directory layout (all arrays are raw, row-aligned and append-only):
+#   meta.json     dim, count, model_version, ivf_lists -- written last, atomically
+#   vectors.f16   (count, dim) float16, L2-normalised
+#   labels.i32    (count,) int32 output index of the model the index was built with
+#   paths.txt     one image path per line
+#   ivf.i32       (count,) int32 inverted-list id of each vector (IVF only)
+#   centroids.npy (ivf_lists, dim) float32 (IVF only)
+# Rows beyond meta["count"] (from an interrupted append) are ignored and
+# overwritten by the next append.
+
+
+def normalize(vectors):
+    """L2-normalise rows so inner product == cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _topk(scores, k):
+    """Indices of the k largest scores, best first (argpartition, then sort only k)."""
+    k = min(k, scores.shape[-1])
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+def kmeans(vectors, num_lists, iterations=10, seed=0):
+    """Spherical k-means on normalised vectors; returns (num_lists, dim) float32 centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), num_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        for j in range(num_lists):
+            members = vectors[assign == j]
+            if len(members):
+                centroids[j] = members.sum(axis=0)
+            else:
+                centroids[j] = vectors[rng.integers(len(vectors))]  # Re-seed empty lists
+        centroids = normalize(centroids)
+    return centroids
+
+
+class EmbeddingIndex:
+    """Append-only index of image embeddings with exact or IVF top-k search.
+
+    Exact search is one float32 matrix-vector product over every vector
+    followed by argpartition: the float16 file is upcast into memory once
+    on first search (about 200 MB at 100k x 512). With an IVF layout
+    (``build_ivf``), a query only scores the vectors in its ``nprobe``
+    nearest inverted lists, read straight from the float16 mapping.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.meta = {"dim": None, "count": 0, "model_version": None, "ivf_lists": 0}
+        meta_path = os.path.join(root, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+        self._vectors = None
+        self._matrix = None
+        self._labels = None
+        self._paths = None
+        self._ivf = None
+
+    def _file(self, name):
+        return os.path.join(self.root, name)
+
+    def __len__(self):
+        return self.meta["count"]
+
+    @property
+    def model_version(self):
+        return self.meta["model_version"]
+
+    @property
+    def vectors(self):
+        if self._vectors is None:
+            self._vectors = np.memmap(self._file("vectors.f16"), dtype=np.float16, mode="r",
+                                      shape=(len(self), self.meta["dim"]))
+        return self._vectors
+
+    @property
+    def labels(self):
+        if self._labels is None:
+            self._labels = np.memmap(self._file("labels.i32"), dtype=np.int32, mode="r", shape=(len(self),))
+        return self._labels
+
+    @property
+    def paths(self):
+        if self._paths is None:
+            with open(self._file("paths.txt"), encoding="utf-8") as f:
+                self._paths = f.read().splitlines()[:len(self)]
+        return self._paths
+
+    def _line_count(self):
+        if not os.path.exists(self._file("paths.txt")):
+            return 0
+        with open(self._file("paths.txt"), encoding="utf-8") as f:
+            return sum(1 for _ in f)
+
+    def _write_meta(self):
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._file("meta.json"))
+
+    def _append(self, name, array, itemsize):
+        with open(self._file(name), "ab") as f:
+            f.truncate(len(self) * itemsize)  # Drop rows of an interrupted append
+            f.write(np.ascontiguousarray(array).tobytes())
+
+    def add(self, embeddings, labels, paths, model_version=None):
+        """Append embeddings (normalised here) with their labels and image paths.
+
+        New vectors join their nearest existing IVF list; call ``build_ivf``
+        again once the collection has grown a lot.
+        """
+        embeddings = normalize(embeddings)
+        if not len(embeddings):
+            return
+        os.makedirs(self.root, exist_ok=True)
+        dim = embeddings.shape[1]
+        if self.meta["dim"] is None:
+            self.meta["dim"] = dim
+            self.meta["model_version"] = model_version
+        elif dim != self.meta["dim"]:
+            raise ValueError(f"Embedding dim {dim} does not match index dim {self.meta['dim']}")
+
+        self._append("vectors.f16", embeddings.astype(np.float16), dim * 2)
+        self._append("labels.i32", np.asarray(labels, dtype=np.int32), 4)
+        if self._line_count() != len(self):
+            existing = self.paths if len(self) else []
+            with open(self._file("paths.txt"), "w", encoding="utf-8") as f:
+                f.writelines(f"{path}\n" for path in existing)  # Drop lines of an interrupted append
+        with open(self._file("paths.txt"), "a", encoding="utf-8") as f:
+            f.writelines(f"{path}\n" for path in paths)
+        if self.meta["ivf_lists"]:
+            centroids = np.load(self._file("centroids.npy"))
+            self._append("ivf.i32", np.argmax(embeddings @ centroids.T, axis=1).astype(np.int32), 4)
+
+        self.meta["count"] += len(embeddings)
+        self._write_meta()
+        self._vectors = self._matrix = self._labels = self._paths = self._ivf = None
+
+    def build_ivf(self, num_lists, iterations=10, sample=50000, seed=0):
+        """Cluster the vectors into ``num_lists`` inverted lists (k-means on a sample)."""
+        vectors = self.vectors
+        rng = np.random.default_rng(seed)
+        sample_idx = rng.choice(len(self), min(sample, len(self)), replace=False)
+        centroids = kmeans(np.asarray(vectors[np.sort(sample_idx)], dtype=np.float32), num_lists, iterations, seed)
+
+        assign = np.empty(len(self), dtype=np.int32)
+        for start in range(0, len(self), 65536):
+            block = np.asarray(vectors[start:start + 65536], dtype=np.float32)
+            assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        np.save(self._file("centroids.npy"), centroids)
+        assign.tofile(self._file("ivf.i32"))
+        self.meta["ivf_lists"] = num_lists
+        self._write_meta()
+        self._ivf = None
+
+    def _load_ivf(self):
+        if self._ivf is None:
+            centroids = np.load(self._file("centroids.npy"))
+            assign = np.fromfile(self._file("ivf.i32"), dtype=np.int32, count=len(self))
+            order = np.argsort(assign, kind="stable")
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(centroids)))])
+            self._ivf = (centroids, order, offsets)
+        return self._ivf
+
+    def search(self, query, k=5, nprobe=None):
+        """Top-k most similar vectors to ``query``.
+
+        Args:
+            query (np.ndarray): (dim,) embedding; normalised here.
+            k (int): Number of results.
+            nprobe (int, optional): Inverted lists to scan. Ignored without an
+                IVF layout; None scans everything exactly.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (cosine similarities, row ids), best first.
+        """
+        if not len(self):
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        query = normalize(query).reshape(-1)
+
+        if nprobe and self.meta["ivf_lists"]:
+            centroids, order, offsets = self._load_ivf()
+            lists = _topk(centroids @ query, nprobe)
+            ids = np.sort(np.concatenate([order[offsets[j]:offsets[j + 1]] for j in lists]))
+            scores = np.asarray(self.vectors[ids], dtype=np.float32) @ query
+            best = _topk(scores, k)
+            return scores[best], ids[best]
+
+        if self._matrix is None:
+            self._matrix = np.asarray(self.vectors, dtype=np.float32)
+        scores = self._matrix @ query
+        best = _topk(scores, k)
+        return scores[best], best
@@ -0,0 +1,218 @@
+import time
+
+import torch
+
+from src.Models.resnet import ResNet, ResNet50
+from src.prune import resize_blocks
+from src.weights import is_flat_weights, load_flat_weights
+
+
+def load_checkpoint(path, device="cpu"):
+    """Read a .pth checkpoint or a flat weight file (export_weights.py).
+
+    Returns:
+        tuple: (state_dict, info), where info holds the checkpoint's other
+        keys (``classes``, ``block_widths``, ``layers``/``widths``, ...);
+        for a flat file that is its header metadata.
+    """
+    if is_flat_weights(path):
+        state_dict, metadata = load_flat_weights(path)
+        return {name: tensor.to(device) for name, tensor in state_dict.items()}, metadata
+    checkpoint = torch.load(path, map_location=device)
+    return checkpoint.get('model_state_dict', checkpoint), checkpoint
+
+
+def load_checkpoint_model(path, device="cpu"):
+    """Build the right model for any checkpoint this repo writes and load it.
+
+    Handles full training checkpoints and bare state dicts (ResNet50),
+    flat weight files (export_weights.py), students and cascade first stages
+    (``layers``/``widths``), and pruned models (``block_widths``). The
+    number of outputs comes from the checkpoint's ``fc`` layer.
+
+    Returns:
+        tuple: (model in eval mode, the checkpoint's class list or None).
+        Checkpoints from add_classes.py embed their classes, whose order
+        differs from the sorted class folders; see label_mapping.
+    """
+    state_dict, checkpoint = load_checkpoint(path, device)
+    num_classes = state_dict['fc.weight'].shape[0]
+    if 'layers' in checkpoint:
+        model = ResNet(num_classes, layers=checkpoint['layers'], widths=checkpoint['widths'])
+    else:
+        model = ResNet50(num_classes)
+        if 'block_widths' in checkpoint:
+            resize_blocks(model, checkpoint['block_widths'])
+    model.load_state_dict(state_dict)
+    classes = checkpoint.get('classes')
+    return model.to(device).eval(), list(classes) if classes else None
+
+
+def label_mapping(class_to_idx, classes, num_outputs):
+    """Map a dataset's folder labels to a model's output indices by class name.
+
+    Same precedence as ModelManager._load_classes: a model without an
+    embedded class list must have one output per folder, in folder order.
+
+    Args:
+        class_to_idx (dict): The dataset's class folder -> label.
+        classes (list or None): The model's classes in output order.
+        num_outputs (int): The model's number of outputs.
+
+    Returns:
+        torch.Tensor or None: Label -> output index lookup, or None when
+        the labels already are output indices.
+
+    Raises:
+        ValueError: If a folder has no matching model output.
+    """
+    if classes is None:
+        if len(class_to_idx) != num_outputs:
+            raise ValueError(f"Model has {num_outputs} outputs but no class list, and the dataset has "
+                             f"{len(class_to_idx)} class folders")
+        return None
+    missing = sorted(name for name in class_to_idx if name not in classes)
+    if missing:
+        raise ValueError(f"The model has no output for the dataset classes {missing}")
+    mapping = torch.empty(len(class_to_idx), dtype=torch.long)
+    for name, label in class_to_idx.items():
+        mapping[label] = classes.index(name)
+    if torch.equal(mapping, torch.arange(len(mapping))):
+        return None
+    return mapping
+
+
+class RemappedLoader:
+    """Iterate ``loader`` with its labels translated through a ``mapping`` lookup tensor.
+
+    Works for any loader, including streamed shards; extra batch items
+    (e.g. IndexedDataset's sample index) pass through unchanged.
+    """
+
+    def __init__(self, loader, mapping):
+        self.loader = loader
+        self.mapping = mapping
+
+    @property
+    def dataset(self):
+        return self.loader.dataset
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        for X, y, *rest in self.loader:
+            yield (X, self.mapping[y], *rest)
+
+
+def remap_labels(loader, mapping):
+    """``loader`` with labels mapped through ``mapping`` (from label_mapping), if any."""
+    return loader if mapping is None else RemappedLoader(loader, mapping)
+
+
+class Evaluator:
+    """Accumulates classification metrics batch by batch, entirely on-device.
+
+    Each update is a handful of tensor ops: one ``bincount`` over
+    ``true * C + pred`` for the confusion matrix, one ``topk`` for top-k
+    accuracy and one ``bincount`` per statistic for the calibration bins.
+    Nothing is copied to the host until ``report``.
+
+    Args:
+        num_classes (int): Number of classes.
+        topk (tuple[int]): k values for top-k accuracy.
+        num_bins (int): Confidence bins for the expected calibration error.
+        device (str): Where the accumulators live (same as the logits).
+    """
+
+    def __init__(self, num_classes, topk=(1, 5), num_bins=15, device="cpu"):
+        self.num_classes = num_classes
+        self.topk = tuple(k for k in topk if k <= num_classes)
+        self.num_bins = num_bins
+        self.confusion = torch.zeros(num_classes * num_classes, dtype=torch.long, device=device)
+        self.topk_correct = torch.zeros(len(self.topk), dtype=torch.long, device=device)
+        self.bin_count = torch.zeros(num_bins, dtype=torch.long, device=device)
+        self.bin_confidence = torch.zeros(num_bins, dtype=torch.float64, device=device)
+        self.bin_correct = torch.zeros(num_bins, dtype=torch.float64, device=device)
+        self.seen = 0
+
+    @torch.no_grad()
+    def update(self, logits, y):
+        y = y.to(logits.device)
+        probs = torch.softmax(logits.float(), dim=1)
+        confidence, pred = probs.max(dim=1)
+
+        self.confusion += torch.bincount(y * self.num_classes + pred, minlength=self.num_classes ** 2)
+
+        top = logits.topk(max(self.topk), dim=1).indices
+        hits = (top == y.unsqueeze(1)).cumsum(dim=1)
+        self.topk_correct += torch.stack([hits[:, k - 1].sum() for k in self.topk])
+
+        bins = (confidence * self.num_bins).long().clamp_(max=self.num_bins - 1)
+        self.bin_count += torch.bincount(bins, minlength=self.num_bins)
+        self.bin_confidence += torch.bincount(bins, weights=confidence.double(), minlength=self.num_bins)
+        self.bin_correct += torch.bincount(bins, weights=(pred == y).double(), minlength=self.num_bins)
+        self.seen += len(y)
+
+    def confusion_matrix(self):
+        """(true, predicted) count matrix."""
+        return self.confusion.view(self.num_classes, self.num_classes).cpu()
+
+    def report(self, class_names=None):
+        """Accuracy, top-k, ECE, macro F1 and per-class precision/recall/F1/support."""
+        cm = self.confusion_matrix().double()
+        tp = cm.diag()
+        support = cm.sum(dim=1)
+        predicted = cm.sum(dim=0)
+        precision = torch.where(predicted > 0, tp / predicted.clamp(min=1), torch.zeros_like(tp))
+        recall = torch.where(support > 0, tp / support.clamp(min=1), torch.zeros_like(tp))
+        f1 = torch.where(precision + recall > 0, 2 * precision * recall / (precision + recall).clamp(min=1e-12),
+                         torch.zeros_like(tp))
+
+        count = self.bin_count.double().cpu()
+        gap = (self.bin_confidence.cpu() - self.bin_correct.cpu()).abs()
+        ece = (gap.sum() / max(self.seen, 1)).item()
+
+        names = class_names or [str(i) for i in range(self.num_classes)]
+        return {
+            "samples": self.seen,
+            "accuracy": (tp.sum() / max(self.seen, 1)).item(),
+            "topk_accuracy": {f"top{k}": c / max(self.seen, 1) for k, c in zip(self.topk, self.topk_correct.tolist())},
+            "ece": ece,
+            "calibration_bins": [
+                {"count": int(n), "confidence": (c / n).item() if n else None, "accuracy": (a / n).item() if n else None}
+                for n, c, a in zip(count, self.bin_confidence.cpu(), self.bin_correct.cpu())
+            ],
+            "macro_f1": f1[support > 0].mean().item() if (support > 0).any() else 0.0,
+            "per_class": {
+                name: {"precision": p, "recall": r, "f1": f, "support": int(s)}
+                for name, p, r, f, s in zip(names, precision.tolist(), recall.tolist(), f1.tolist(), support.tolist())
+            },
+        }
+
+
+def evaluate(predict, loader, num_classes, device="cpu", topk=(1, 5), num_bins=15, class_names=None):
+    """Run ``predict`` (batch -> logits) over ``loader`` and return the metrics report.
+
+    Adds throughput: ``model_images_per_sec`` counts only time spent in
+    ``predict``; ``wall_images_per_sec`` includes data loading.
+    """
+    evaluator = Evaluator(num_classes, topk, num_bins, device)
+    model_time = 0.0
+    start = time.perf_counter()
+    with torch.no_grad():
+        for X, y in loader:
+            X = X.to(device, non_blocking=True)
+            t0 = time.perf_counter()
+            logits = predict(X)
+            if device == "cuda":
+                torch.cuda.synchronize()
+            model_time += time.perf_counter() - t0
+            evaluator.update(logits, y)
+    wall_time = time.perf_counter() - start
+
+    report = evaluator.report(class_names)
+    report["model_images_per_sec"] = evaluator.seen / model_time if model_time else None
+    report["wall_images_per_sec"] = evaluator.seen / wall_time if wall_time else None
+    report["confusion_matrix"] = evaluator.confusion_matrix().tolist()
+    return report
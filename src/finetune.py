@@ -0,0 +1,116 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.data import Dataset
+
+from src.train import Train
+
+
+class RemappedDataset(Dataset):
+    """Relabel a dataset's targets through ``mapping`` (folder index -> model index).
+
+    New classes are appended after the existing ones, so the model's output
+    order differs from the sorted folder order PlantDataset assigns.
+    """
+
+    def __init__(self, dataset, mapping):
+        self.dataset = dataset
+        self.mapping = mapping
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, idx):
+        X, y = self.dataset[idx]
+        return X, self.mapping[y]
+
+
+def extend_head(fc, num_classes):
+    """A Linear head for ``num_classes`` outputs that starts from ``fc``'s rows.
+
+    Existing classes keep their trained weights; rows for new classes get
+    the default initialisation.
+    """
+    head = nn.Linear(fc.in_features, num_classes).to(fc.weight.device)
+    with torch.no_grad():
+        head.weight[:fc.out_features] = fc.weight
+        head.bias[:fc.out_features] = fc.bias
+    return head
+
+
+def train_head(head, features, labels, epochs=100, lr=1e-3, weight_decay=1e-4, batch_size=1024, device="cpu"):
+    """Multinomial logistic regression of ``head`` on cached backbone features.
+
+    Features and labels live on ``device`` for the whole run, so an epoch
+    over tens of thousands of images is a few hundred small matmuls.
+
+    Args:
+        head (nn.Linear): Classifier to train in place.
+        features (torch.Tensor): (N, in_features) float features.
+        labels (torch.Tensor): (N,) class indices in head order.
+        epochs (int): Passes over the cached features.
+        lr (float): Adam learning rate.
+        weight_decay (float): L2 regularisation.
+        batch_size (int): Minibatch size.
+        device (str): Where to train.
+
+    Returns:
+        float: Training accuracy (%) after the last epoch.
+    """
+    features, labels = features.to(device), labels.to(device)
+    head.train()
+    optimizer = torch.optim.Adam(head.parameters(), lr=lr, weight_decay=weight_decay)
+    for epoch in range(1, epochs + 1):
+        order = torch.randperm(len(features), device=device)
+        total_loss = 0.0
+        for start in range(0, len(features), batch_size):
+            idx = order[start:start + batch_size]
+            loss = F.cross_entropy(head(features[idx]), labels[idx])
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(idx)
+        if epoch == 1 or epoch % 20 == 0 or epoch == epochs:
+            print(f"Head epoch {epoch}: Loss: {total_loss / len(features):.5f}")
+
+    head.eval()
+    with torch.no_grad():
+        correct = sum(
+            (head(features[start:start + batch_size]).argmax(dim=1) == labels[start:start + batch_size]).sum().item()
+            for start in range(0, len(features), batch_size)
+        )
+    return correct / len(features) * 100
+
+
+def freeze_except(model, trainable=("layer4", "fc")):
+    """Freeze every parameter outside the ``trainable`` submodules.
+
+    Returns the parameters left trainable, for the optimizer. Train with
+    FrozenBackboneTrain so the frozen BatchNorm layers stay in eval mode too.
+    """
+    params = []
+    for name, param in model.named_parameters():
+        param.requires_grad = name.split(".")[0] in trainable
+        if param.requires_grad:
+            params.append(param)
+    return params
+
+
+class FrozenBackboneTrain(Train):
+    """Train that keeps the BatchNorm layers outside ``trainable`` in eval mode.
+
+    In training mode a BatchNorm normalises with the batch's statistics and
+    updates its running ones, even when its affine parameters are frozen;
+    that would drift the frozen backbone away from what the head was
+    trained on. Use together with ``freeze_except(model, trainable)``.
+    """
+
+    def __init__(self, *args, trainable=("layer4", "fc"), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.trainable = trainable
+
+    def set_train_mode(self):
+        super().set_train_mode()
+        for name, module in self.model.named_modules():
+            if isinstance(module, nn.BatchNorm2d) and name.split(".")[0] not in self.trainable:
+                module.eval()
@@ -0,0 +1,143 @@
+import io
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+HASH_SIZE = 8  # 8x8 gradient bits -> 64-bit hash
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """Difference hash of a PIL image.
+
+    The image is reduced to (hash_size + 1) x hash_size grey pixels and each
+    bit records whether a pixel is brighter than its right neighbour. This
+    survives recompression, resizing and mild colour shifts, so re-uploads
+    of the same photo land within a few bits of each other.
+    """
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def dhash_file(fp, hash_size=HASH_SIZE):
+    """dHash of an image file or file object, decoding as little as possible.
+
+    For JPEGs, ``draft`` makes libjpeg decode at 1/2-1/8 scale straight from
+    the DCT coefficients, so a 12 MP photo costs a fraction of a full decode.
+    """
+    with Image.open(fp) as image:
+        image.draft("L", ((hash_size + 1) * 4, hash_size * 4))
+        return dhash(image, hash_size)
+
+
+def dhash_bytes(image_bytes, hash_size=HASH_SIZE):
+    return dhash_file(io.BytesIO(image_bytes), hash_size)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes with Hamming distance.
+
+    Finding everything within distance d of a query only descends into
+    children whose edge distance lies in [dist - d, dist + d], so a small
+    radius visits a small fraction of the tree.
+    """
+
+    def __init__(self):
+        self.root = None  # [hash, value, {distance: child}]
+        self.size = 0
+
+    def add(self, value_hash, value):
+        self.size += 1
+        if self.root is None:
+            self.root = [value_hash, value, {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value_hash, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value_hash, value, {}]
+                return
+            node = child
+
+    def search(self, query_hash, max_distance):
+        """All (distance, hash, value) within ``max_distance`` of ``query_hash``, nearest first."""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node_hash, value, children = stack.pop()
+            distance = hamming(query_hash, node_hash)
+            if distance <= max_distance:
+                found.append((distance, node_hash, value))
+            for edge, child in children.items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        found.sort(key=lambda item: item[0])
+        return found
+
+
+class NearDuplicateCache:
+    """Bounded LRU cache of recent results, looked up by perceptual hash.
+
+    ``get`` returns the result stored for the nearest hash within
+    ``max_distance`` under the same ``key`` (e.g. model version and request
+    options). BK-trees cannot delete, so evicted entries are dropped from the
+    LRU map and skipped during lookups, and the tree is rebuilt from the live
+    entries once it is mostly dead.
+    """
+
+    def __init__(self, max_entries=10000, max_distance=6):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # entry id -> (key, result)
+        self._hashes = {}  # entry id -> hash
+        self._tree = BKTree()
+        self._next_id = 0
+
+    def get(self, image_hash, key):
+        """(result, distance) of the nearest cached near-duplicate, or (None, None)."""
+        with self._lock:
+            for distance, _, entry_id in self._tree.search(image_hash, self.max_distance):
+                entry = self._entries.get(entry_id)
+                if entry is not None and entry[0] == key:
+                    self._entries.move_to_end(entry_id)
+                    return entry[1], distance
+        return None, None
+
+    def put(self, image_hash, key, result):
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (key, result)
+            self._hashes[entry_id] = image_hash
+            self._tree.add(image_hash, entry_id)
+            while len(self._entries) > self.max_entries:
+                old_id, _ = self._entries.popitem(last=False)
+                del self._hashes[old_id]
+            if self._tree.size > 2 * max(len(self._entries), 1):
+                self._rebuild()
+
+    def _rebuild(self):
+        self._tree = BKTree()
+        for entry_id in self._entries:
+            self._tree.add(self._hashes[entry_id], entry_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._hashes.clear()
+            self._tree = BKTree()
+
+    def __len__(self):
+        return len(self._entries)
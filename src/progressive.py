@@ -0,0 +1,68 @@
+import time
+from collections import namedtuple
+
+from torch.utils.data import DataLoader, IterableDataset
+
+from src.datasets.plant_disease import get_image_transforms
+
+# One phase of a progressive-resizing schedule
+Phase = namedtuple("Phase", ["size", "epochs", "batch_size"])
+
+
+def parse_schedule(spec, base_batch_size, final_size=224):
+    """
+    Parse ``"128:6,160:6,224:8"`` (resolution:epochs, ...) into Phases.
+
+    Batch sizes grow with the pixel count saved, ``base * (final / size)^2``,
+    so each step costs about the same memory as a full-resolution batch.
+    """
+    phases = []
+    for part in spec.split(","):
+        size, epochs = (int(v) for v in part.split(":"))
+        batch_size = int(base_batch_size * (final_size / size) ** 2)
+        phases.append(Phase(size, epochs, batch_size))
+    if phases[-1].size != final_size:
+        raise ValueError(f"The last phase must train at the serving resolution ({final_size})")
+    return phases
+
+
+def progressive_train(trainer, train_data, phases, num_workers, target_accuracy=None):
+    """
+    Train through ``phases``, rebuilding only the train DataLoader between them.
+
+    The dataset (and its file listing) is reused; each phase just swaps its
+    transform and opens a DataLoader with persistent workers, so workers
+    start once per phase rather than once per epoch (except for datasets
+    that reshuffle through set_epoch). Evaluation runs every epoch at the
+    serving resolution through ``trainer.test_loader``.
+
+    Returns:
+        dict: Per-epoch history and the wall-clock seconds until
+        ``target_accuracy`` (test accuracy, %) was first reached, if ever.
+    """
+    history = []
+    time_to_target = None
+    start = time.perf_counter()
+    epoch = 0
+    for phase in phases:
+        print(f"\nPhase: {phase.epochs} epochs at {phase.size}x{phase.size}, batch size {phase.batch_size}")
+        train_data.transform = get_image_transforms(phase.size)
+        # Persistent workers keep their copy of the dataset, so they would
+        # never see the set_epoch that Train.train_step makes every epoch
+        persistent = num_workers > 0 and not hasattr(train_data, "set_epoch")
+        trainer.train_loader = DataLoader(train_data, batch_size=phase.batch_size,
+                                          shuffle=not isinstance(train_data, IterableDataset),
+                                          num_workers=num_workers, persistent_workers=persistent)
+        for _ in range(phase.epochs):
+            epoch += 1
+            trainer.train_step(epoch)
+            _, test_acc = trainer.test_step(epoch)
+            elapsed = time.perf_counter() - start
+            history.append({"epoch": epoch, "size": phase.size, "test_accuracy": test_acc, "seconds": elapsed})
+            if time_to_target is None and target_accuracy is not None and test_acc >= target_accuracy:
+                time_to_target = elapsed
+                print(f"Reached {target_accuracy:.2f}% after {elapsed:.0f}s (epoch {epoch})")
+        del trainer.train_loader  # Shut the phase's workers down before starting new ones
+
+    trainer.writer.close()
+    return {"history": history, "time_to_target": time_to_target, "total_seconds": time.perf_counter() - start}
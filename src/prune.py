@@ -0,0 +1,126 @@
+import math
+
+import torch
+import torch.nn as nn
+
+from src.Models.resnet import ResidualBlock
+
+
+def residual_blocks(model):
+    """All ResidualBlocks of a ResNet, in forward order."""
+    return [module for module in model.modules() if isinstance(module, ResidualBlock)]
+
+
+def block_widths(model):
+    """Inner (conv1 output) channel count of every ResidualBlock."""
+    return [block.conv1.out_channels for block in residual_blocks(model)]
+
+
+def channel_importance(block):
+    """Rank a block's inner channels by the magnitude of their BatchNorm scale.
+
+    A channel whose bn1 gamma is near zero contributes almost nothing to
+    conv2, whatever conv1 computes for it.
+    """
+    return block.bn1.weight.detach().abs()
+
+
+def _slice_conv(conv, out_idx=None, in_idx=None):
+    weight = conv.weight.detach()
+    if out_idx is not None:
+        weight = weight[out_idx]
+    if in_idx is not None:
+        weight = weight[:, in_idx]
+    new = nn.Conv2d(weight.shape[1], weight.shape[0], kernel_size=conv.kernel_size,
+                    stride=conv.stride, padding=conv.padding, bias=conv.bias is not None)
+    new.weight.data.copy_(weight)
+    if conv.bias is not None:
+        new.bias.data.copy_(conv.bias.detach()[out_idx] if out_idx is not None else conv.bias.detach())
+    return new.to(conv.weight.device)
+
+
+def _slice_bn(bn, idx):
+    new = nn.BatchNorm2d(len(idx), eps=bn.eps, momentum=bn.momentum)
+    new.weight.data.copy_(bn.weight.detach()[idx])
+    new.bias.data.copy_(bn.bias.detach()[idx])
+    new.running_mean.copy_(bn.running_mean[idx])
+    new.running_var.copy_(bn.running_var[idx])
+    new.num_batches_tracked.copy_(bn.num_batches_tracked)
+    return new.to(bn.weight.device)
+
+
+def prune_block(block, keep):
+    """Physically remove inner channels of a ResidualBlock.
+
+    Only conv1's output channels (and the matching bn1 entries and conv2
+    input channels) are removed. The block's input and output widths are
+    untouched, so the residual addition and the downsample path keep their
+    shapes.
+
+    Args:
+        block (ResidualBlock): Block to prune in place.
+        keep (torch.Tensor): Indices of the inner channels to keep.
+    """
+    keep = torch.sort(keep).values
+    block.conv1 = _slice_conv(block.conv1, out_idx=keep)
+    block.bn1 = _slice_bn(block.bn1, keep)
+    block.conv2 = _slice_conv(block.conv2, in_idx=keep)
+
+
+def prune_model(model, sparsity):
+    """Remove the ``sparsity`` fraction of inner channels from every block, in place.
+
+    Each block keeps its highest-ranked channels (see channel_importance),
+    at least one.
+
+    Returns:
+        list[int]: The new block widths, needed to rebuild the model for loading.
+    """
+    for block in residual_blocks(model):
+        importance = channel_importance(block)
+        num_keep = max(1, math.ceil(len(importance) * (1 - sparsity)))
+        prune_block(block, torch.topk(importance, num_keep).indices)
+    return block_widths(model)
+
+
+def resize_blocks(model, widths):
+    """Reshape a freshly built ResNet's blocks to ``widths`` so a pruned state dict loads."""
+    blocks = residual_blocks(model)
+    if len(blocks) != len(widths):
+        raise ValueError(f"Expected {len(blocks)} block widths, got {len(widths)}")
+    for block, width in zip(blocks, widths):
+        prune_block(block, torch.arange(width))
+    return model
+
+
+def count_flops(model, input_size=(1, 3, 224, 224)):
+    """Multiply-accumulates of one forward pass through the conv and linear layers."""
+    total = 0
+
+    def conv_hook(module, inputs, output):
+        nonlocal total
+        kernel = module.kernel_size[0] * module.kernel_size[1] * module.in_channels // module.groups
+        total += output.numel() * kernel
+
+    def linear_hook(module, inputs, output):
+        nonlocal total
+        total += output.numel() * module.in_features
+
+    handles = []
+    for module in model.modules():
+        if isinstance(module, nn.Conv2d):
+            handles.append(module.register_forward_hook(conv_hook))
+        elif isinstance(module, nn.Linear):
+            handles.append(module.register_forward_hook(linear_hook))
+
+    device = next(model.parameters()).device
+    was_training = model.training
+    model.eval()
+    try:
+        with torch.no_grad():
+            model(torch.zeros(input_size, device=device))
+    finally:
+        for handle in handles:
+            handle.remove()
+        model.train(was_training)
+    return total // input_size[0]
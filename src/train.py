@@ -3,6 +3,13 @@ from torch.utils.tensorboard import SummaryWriter
 from src.helper import accuracy_fn
 from tqdm import tqdm
 
+def set_loader_epoch(loader, epoch):
+    """Tell a dataset that reshuffles per epoch (e.g. ShardDataset) which epoch starts."""
+    dataset = getattr(loader, "dataset", None)
+    if hasattr(dataset, "set_epoch"):
+        dataset.set_epoch(epoch)
+
+
 class Train(object):
     def __init__(
         self,
@@ -12,6 +19,7 @@ class Train(object):
         loss_fn: torch.nn.Module,
         optimizer: torch.optim.Optimizer,
         device: torch.device,
+        log_dir: str = None,
     ):
         self.model = model
         self.train_loader = train_loader
@@ -19,19 +27,31 @@ class Train(object):
         self.loss_fn = loss_fn
         self.optimizer = optimizer
         self.device = device
-        self.writer = SummaryWriter()  # Initialize TensorBoard writer
+        self.writer = SummaryWriter(log_dir=log_dir)  # Initialize TensorBoard writer (runs/<timestamp> by default)
+
+    def set_train_mode(self):
+        """Put the model in training mode; subclasses can keep parts of it in eval mode."""
+        self.model.train()
+
+    def compute_loss(self, X, y, *extra):
+        """Forward a training batch and return (predictions, loss).
+
+        ``extra`` holds any further items the train loader yields per batch
+        (e.g. sample indices); subclasses override this to change the loss.
+        """
+        y_pred = self.model(X)
+        return y_pred, self.loss_fn(y_pred, y)
 
     def train_step(self, epoch):
         train_loss, train_acc = 0, 0
-        self.model.train()  # Put model on training mode
+        self.set_train_mode()
+        set_loader_epoch(self.train_loader, epoch)
 
-        for batch, (X, y) in enumerate(self.train_loader):
+        for batch, (X, y, *extra) in enumerate(self.train_loader):
             X, y = X.to(self.device), y.to(self.device)
 
-            y_pred = self.model(X)
-
             # Calculate loss
-            loss = self.loss_fn(y_pred, y)
+            y_pred, loss = self.compute_loss(X, y, *extra)
             train_loss += loss.item()
             train_acc += accuracy_fn(y_true=y, y_pred=y_pred.argmax(dim=1))
             self.optimizer.zero_grad()
@@ -69,6 +89,8 @@ class Train(object):
 
             print(f'Test Epoch {epoch}: Loss: {test_loss:.5f} | Accuracy: {test_acc:.2f}')
 
+        return test_loss, test_acc
+
     def train(self, num_epochs):
         for epoch in range(1, num_epochs + 1):
             self.train_step(epoch)
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import warnings
+
+import torch
+
+# File layout:
+#   MAGIC | header length (uint64 LE) | JSON header | padding | tensor data
+# Every tensor starts on an ALIGNMENT boundary so it can be mapped in place.
+# The header carries a SHA-256 over all tensor bytes, in header order.
+MAGIC = b"PDW1"
+ALIGNMENT = 64
+
+STORAGE_DTYPES = {
+    "float32": torch.float32,
+    "float16": torch.float16,
+    "bfloat16": torch.bfloat16,
+}
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _raw_bytes(tensor):
+    """A tensor's storage as a flat uint8 NumPy view (no copy for contiguous CPU tensors)."""
+    return tensor.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy()
+
+
+def save_flat_weights(state_dict, path, metadata=None, dtype=None):
+    """Write a state dict as one flat, memory-mappable file.
+
+    Args:
+        state_dict (dict): Tensor name -> tensor.
+        path (str): Output file, written atomically.
+        metadata (dict, optional): JSON-serializable extras stored in the header.
+        dtype (torch.dtype, optional): Store floating-point tensors in this
+            dtype (e.g. torch.float16 to halve the file). Integer buffers
+            such as BatchNorm's num_batches_tracked are kept as they are.
+
+    Returns:
+        str: SHA-256 hex digest of the tensor data.
+    """
+    if dtype is not None:
+        state_dict = {
+            name: tensor.to(dtype) if tensor.is_floating_point() else tensor
+            for name, tensor in state_dict.items()
+        }
+
+    tensors = {}
+    raws = {}
+    digest = hashlib.sha256()
+    offset = 0
+    for name, tensor in state_dict.items():
+        raw = raws[name] = _raw_bytes(tensor)
+        digest.update(raw)
+        tensors[name] = {
+            "dtype": str(tensor.dtype).replace("torch.", ""),
+            "shape": list(tensor.shape),
+            "offset": offset,
+            "nbytes": raw.nbytes,
+        }
+        offset = _align(offset + raw.nbytes)
+
+    checksum = digest.hexdigest()
+    header = json.dumps({"tensors": tensors, "metadata": metadata or {}, "sha256": checksum}).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for name, raw in raws.items():
+            f.seek(data_start + tensors[name]["offset"])
+            f.write(memoryview(raw))
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+    return checksum
+
+
+def file_sha256(path):
+    """SHA-256 hex digest of a file's bytes, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_flat_weights(path):
+    """True if ``path`` is a flat weight file rather than a torch checkpoint."""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_header(path):
+    """Return (header dict, data start offset) without touching tensor data."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a flat weight file")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len))
+    return header, _align(len(MAGIC) + 8 + header_len)
+
+
+def _verify(mapping, header, data_start, path):
+    digest = hashlib.sha256()
+    view = memoryview(mapping)
+    try:
+        for info in header["tensors"].values():
+            start = data_start + info["offset"]
+            digest.update(view[start:start + info["nbytes"]])
+    finally:
+        view.release()
+    if digest.hexdigest() != header["sha256"]:
+        raise ValueError(f"Checksum mismatch for {path}: file is corrupt or truncated")
+
+
+def load_flat_weights(path, verify=False):
+    """Map a flat weight file read-only and return (state_dict, metadata).
+
+    The tensors alias the page cache, so no copy is made, and every process
+    mapping the same file shares one physical copy of the weights. Load them
+    with ``model.load_state_dict(state_dict, assign=True)`` to keep it that
+    way; the tensors are read-only and meant for inference. Half-precision
+    files need a plain ``load_state_dict`` (which upcasts into the model's
+    fp32 parameters) instead.
+
+    Args:
+        path (str): Flat weight file.
+        verify (bool): Check the SHA-256 of the tensor data first. This reads
+            every page once but still makes no copy.
+    """
+    header, data_start = read_header(path)
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if verify:
+        _verify(mapping, header, data_start, path)
+
+    state_dict = {}
+    with warnings.catch_warnings():
+        # frombuffer warns about read-only buffers; that is the point here
+        warnings.simplefilter("ignore", UserWarning)
+        for name, info in header["tensors"].items():
+            dtype = getattr(torch, info["dtype"])
+            count = info["nbytes"] // torch.empty((), dtype=dtype).element_size()
+            if count == 0:
+                state_dict[name] = torch.empty(info["shape"], dtype=dtype)
+                continue
+            tensor = torch.frombuffer(mapping, dtype=dtype, count=count, offset=data_start + info["offset"])
+            state_dict[name] = tensor.view(info["shape"])
+    return state_dict, header["metadata"]
+
+
+def export_checkpoint(checkpoint_path, output_path, dtype=None):
+    """Convert a training checkpoint into a flat weight file.
+
+    Training-only state (optimizer, epoch counters) is dropped; only the
+    model weights and what is needed to rebuild the architecture
+    (``block_widths`` of pruned models, ``layers``/``widths`` of students)
+    are written. The SHA-256 of the source checkpoint is kept
+    in the metadata, so the export reports the same model version as the
+    checkpoint it came from.
+
+    Returns:
+        str: SHA-256 hex digest of the exported tensor data.
+    """
+    checkpoint = torch.load(checkpoint_path, map_location="cpu")
+    state_dict = checkpoint.get("model_state_dict", checkpoint)
+    metadata = {
+        "source": os.path.basename(checkpoint_path),
+        "source_sha256": file_sha256(checkpoint_path),
+        "dtype": str(dtype).replace("torch.", "") if dtype is not None else "float32",
+    }
+    if "epoch" in checkpoint:
+        metadata["epoch"] = checkpoint["epoch"]
+    for key in ("classes", "block_widths", "layers", "widths"):
+        if key in checkpoint:
+            metadata[key] = checkpoint[key]
+    return save_flat_weights(state_dict, output_path, metadata=metadata, dtype=dtype)
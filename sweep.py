@@ -0,0 +1,182 @@
+"""
+Parallel hyperparameter sweep with ASHA early stopping.
+
+    python sweep.py --trials 27 --concurrency 4 --max-epochs 20
+    tensorboard --logdir sweeps/
+
+Trials run concurrently in a process pool, and each process gets an equal
+share of the CPU cores through explicit torch thread limits. Images are
+decoded once into shared uint8 memmaps (see src/datasets/decoded_cache.py),
+so the trials read pre-resized pixels instead of each decoding every JPEG.
+ASHA promotes the trials with the best validation accuracy (from
+Train.test_step) to longer training and stops the rest early.
+
+Every trial logs its curves to <sweep dir>/trial-XXX. The final table is
+printed, saved as results.json, and logged as TensorBoard hparams.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+from torch.utils.tensorboard import SummaryWriter
+
+from src.asha import ASHA
+from src.datasets.decoded_cache import build_decoded_cache, DecodedDataset, get_tensor_transforms
+from src.Models.resnet import ResNet50
+from src.train import Train
+from app.logging_config import setup_logging
+
+device = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+ROOT_DIR = "Plantdisease"
+
+# Search space
+LR_RANGE = (1e-5, 1e-2)  # Sampled log-uniformly
+BATCH_SIZES = [32, 64, 128]
+WEIGHT_DECAYS = [0.0, 1e-5, 1e-4]
+
+
+def sample_config(rng):
+    return {
+        "lr": math.exp(rng.uniform(math.log(LR_RANGE[0]), math.log(LR_RANGE[1]))),
+        "batch_size": rng.choice(BATCH_SIZES),
+        "weight_decay": rng.choice(WEIGHT_DECAYS),
+    }
+
+
+def _init_worker(threads):
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+
+def run_segment(trial_dir, config, start_epoch, end_epoch, train_cache, valid_cache, loader_workers):
+    """Train one trial from ``start_epoch`` to ``end_epoch`` (runs in a pool process).
+
+    Model and optimizer state carry over between rungs through
+    ``trial_dir/state.pth``. Returns the validation accuracy at ``end_epoch``.
+    """
+    train_data = DecodedDataset(train_cache, get_tensor_transforms(train=True))
+    valid_data = DecodedDataset(valid_cache, get_tensor_transforms(train=False))
+    model = ResNet50(len(train_data.class_to_idx)).to(device)
+    optimizer = torch.optim.Adam(model.parameters(), lr=config["lr"], weight_decay=config["weight_decay"])
+    state_path = os.path.join(trial_dir, "state.pth")
+    if start_epoch > 0:
+        state = torch.load(state_path, map_location=device)
+        model.load_state_dict(state["model_state_dict"])
+        optimizer.load_state_dict(state["optimizer_state_dict"])
+
+    trainer = Train(
+        model=model,
+        train_loader=DataLoader(train_data, batch_size=config["batch_size"], shuffle=True, num_workers=loader_workers),
+        test_loader=DataLoader(valid_data, batch_size=256, shuffle=False, num_workers=loader_workers),
+        loss_fn=nn.CrossEntropyLoss(),
+        optimizer=optimizer,
+        device=device,
+        log_dir=trial_dir,
+    )
+    test_acc = 0.0
+    for epoch in range(start_epoch + 1, end_epoch + 1):
+        trainer.train_step(epoch)
+        _, test_acc = trainer.test_step(epoch)
+    trainer.writer.close()
+
+    torch.save({
+        'epoch': end_epoch,
+        'model_state_dict': model.state_dict(),
+        'optimizer_state_dict': optimizer.state_dict(),
+    }, state_path)
+    return test_acc
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep with ASHA")
+    parser.add_argument("--trials", type=int, default=27)
+    parser.add_argument("--concurrency", type=int, default=4, help="trials training at the same time")
+    parser.add_argument("--min-epochs", type=int, default=1)
+    parser.add_argument("--max-epochs", type=int, default=20)
+    parser.add_argument("--eta", type=int, default=3, help="ASHA reduction factor")
+    parser.add_argument("--loader-workers", type=int, default=0, help="DataLoader workers per trial")
+    parser.add_argument("--output", default=os.path.join("sweeps", time.strftime("%Y%m%d-%H%M%S")))
+    parser.add_argument("--cache-dir", default="checkpoints/decoded")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    setup_logging()
+
+    train_cache = build_decoded_cache(ROOT_DIR + "/train", os.path.join(args.cache_dir, "train.npy"))
+    valid_cache = build_decoded_cache(ROOT_DIR + "/valid", os.path.join(args.cache_dir, "valid.npy"))
+
+    rng = random.Random(args.seed)
+    configs = [sample_config(rng) for _ in range(args.trials)]
+    scheduler = ASHA(args.trials, args.min_epochs, args.max_epochs, args.eta)
+    threads = max(1, (os.cpu_count() or 1) // args.concurrency)
+    print(f"{args.trials} trials, {args.concurrency} at a time with {threads} threads each, "
+          f"rungs at {scheduler.rung_epochs} epochs")
+
+    epochs_done = {}
+    seconds = {}
+    pending = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.concurrency, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(threads,)) as pool:
+        while True:
+            while len(pending) < args.concurrency:
+                job = scheduler.next_job()
+                if job is None:
+                    break
+                trial, rung = job
+                trial_dir = os.path.join(args.output, f"trial-{trial:03d}")
+                os.makedirs(trial_dir, exist_ok=True)
+                begin = epochs_done.get(trial, 0)
+                future = pool.submit(run_segment, trial_dir, configs[trial], begin,
+                                     scheduler.rung_epochs[rung], train_cache, valid_cache, args.loader_workers)
+                pending[future] = (trial, rung, time.perf_counter())
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                trial, rung, submitted = pending.pop(future)
+                accuracy = future.result()
+                scheduler.report(trial, rung, accuracy)
+                epochs_done[trial] = scheduler.rung_epochs[rung]
+                seconds[trial] = seconds.get(trial, 0.0) + time.perf_counter() - submitted
+                print(f"trial {trial:03d} rung {rung} ({epochs_done[trial]} epochs): {accuracy:.2f}% "
+                      f"[{time.perf_counter() - start:.0f}s elapsed]")
+
+    results = []
+    for trial, config in enumerate(configs):
+        if trial not in epochs_done:
+            continue
+        rung = scheduler.best_rung(trial)
+        results.append(dict(config, trial=trial, epochs=epochs_done[trial], seconds=seconds[trial],
+                            accuracy=scheduler.results[rung][trial]))
+    results.sort(key=lambda r: (r["epochs"], r["accuracy"]), reverse=True)
+
+    print(f"\n{'trial':>5} {'lr':>10} {'batch':>6} {'wd':>8} {'epochs':>7} {'val acc':>8} {'time s':>8}")
+    for r in results:
+        print(f"{r['trial']:5d} {r['lr']:10.2e} {r['batch_size']:6d} {r['weight_decay']:8.0e} "
+              f"{r['epochs']:7d} {r['accuracy']:7.2f}% {r['seconds']:8.0f}")
+
+    writer = SummaryWriter(log_dir=os.path.join(args.output, "hparams"))
+    for r in results:
+        writer.add_hparams({k: r[k] for k in ("lr", "batch_size", "weight_decay")},
+                           {"hparam/accuracy": r["accuracy"], "hparam/epochs": r["epochs"]},
+                           run_name=f"trial-{r['trial']:03d}")
+    writer.close()
+    with open(os.path.join(args.output, "results.json"), "w") as f:
+        json.dump(results, f, indent=2)
+    best = results[0]
+    best_path = os.path.join(args.output, f"trial-{best['trial']:03d}", "state.pth")
+    print(f"\nBest: trial {best['trial']} ({best['accuracy']:.2f}%), checkpoint {best_path}")
+
+
+if __name__ == "__main__":
+    main()
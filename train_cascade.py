@@ -0,0 +1,139 @@
+"""
+Train and calibrate the first stage of the inference cascade.
+
+    python train_cascade.py train      # train ResNetLite -> CASCADE_MODEL_PATH
+    python train_cascade.py calibrate  # pick the threshold -> CASCADE_CONFIG_PATH
+
+Calibration runs both models over the validation split with deterministic
+preprocessing and picks the lowest first-stage confidence threshold at which
+the cascade is still as accurate as the full ResNet50 (minus --tolerance).
+Lower thresholds mean fewer escalations.
+"""
+import argparse
+import json
+
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+
+from app.config import MODEL_PATH, CASCADE_MODEL_PATH, CASCADE_CONFIG_PATH
+from app.logging_config import setup_logging
+from src.datasets.plant_disease import dataloaders, PlantDataset, get_eval_transforms
+from src.evaluate import load_checkpoint_model, label_mapping, remap_labels
+from src.Models.resnet import ResNetLite
+from src.train import Train
+
+device = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+# Data Loader parameters
+ROOT_DIR = "Plantdisease"
+BATCH_SIZE = 128
+NUM_WORKER = 4
+
+
+def train(epochs, lr):
+    train_loader, test_loader, valid_loader, num_classes = dataloaders(ROOT_DIR, BATCH_SIZE, NUM_WORKER)
+    model = ResNetLite(num_classes).to(device)
+    trainer = Train(
+        model=model,
+        train_loader=train_loader,
+        test_loader=valid_loader,
+        loss_fn=nn.CrossEntropyLoss(),
+        optimizer=torch.optim.Adam(params=model.parameters(), lr=lr),
+        device=device,
+    )
+    trainer.train(epochs)
+    torch.save({
+        'model_state_dict': model.state_dict(),
+        'layers': model.layers,
+        'widths': model.widths,
+    }, CASCADE_MODEL_PATH)
+    print(f"First-stage model saved at {CASCADE_MODEL_PATH}")
+
+
+def collect(model, loader):
+    """Return (probabilities, labels) of ``model`` over ``loader``."""
+    model.eval()
+    probs, labels = [], []
+    with torch.no_grad():
+        for X, y in loader:
+            probs.append(torch.softmax(model(X.to(device)), dim=1).cpu())
+            labels.append(y)
+    return torch.cat(probs), torch.cat(labels)
+
+
+def pick_threshold(lite_probs, full_probs, labels, tolerance):
+    """Lowest threshold whose cascade accuracy >= full-model accuracy - tolerance.
+
+    Accepting the k most confident first-stage answers and escalating the
+    rest gives accuracy (lite correct in top-k + full correct outside top-k) / N,
+    computed for every k at once with cumulative sums.
+    """
+    confidence, lite_pred = lite_probs.max(dim=1)
+    full_correct = (full_probs.argmax(dim=1) == labels).float()
+    lite_correct = (lite_pred == labels).float()
+    n = len(labels)
+    full_accuracy = full_correct.mean().item()
+
+    order = torch.argsort(confidence, descending=True)
+    lite_cum = torch.cat([torch.zeros(1), torch.cumsum(lite_correct[order], 0)])
+    full_cum = torch.cat([torch.zeros(1), torch.cumsum(full_correct[order], 0)])
+    accuracy = (lite_cum + (full_correct.sum() - full_cum)) / n  # index k = k accepted
+
+    ok = torch.nonzero(accuracy >= full_accuracy - tolerance).flatten()
+    k = int(ok.max())
+    if k == 0:
+        threshold = 1.01  # Never trust the first stage
+    elif k == n:
+        threshold = 0.0  # Never escalate
+    else:
+        threshold = confidence[order][k - 1].item()
+
+    return {
+        "threshold": threshold,
+        "expected_accuracy": accuracy[k].item(),
+        "full_accuracy": full_accuracy,
+        "first_stage_accuracy": lite_correct.mean().item(),
+        "escalation_rate": (n - k) / n,
+        "num_samples": n,
+    }
+
+
+def calibrate(tolerance):
+    valid_data = PlantDataset(ROOT_DIR + "/valid", transform=get_eval_transforms())
+    loader = DataLoader(valid_data, batch_size=BATCH_SIZE, shuffle=False, num_workers=NUM_WORKER)
+    lite, lite_classes = load_checkpoint_model(CASCADE_MODEL_PATH, device)
+    full, full_classes = load_checkpoint_model(MODEL_PATH, device)
+    # Both stages must score the same classes in the same order (see ModelManager.predict_proba)
+    folders = sorted(valid_data.class_to_idx, key=valid_data.class_to_idx.get)
+    if lite.fc.out_features != full.fc.out_features or (lite_classes or folders) != (full_classes or folders):
+        raise SystemExit(f"{CASCADE_MODEL_PATH} and {MODEL_PATH} have different classes; "
+                         f"retrain the first stage with 'python train_cascade.py train'")
+    loader = remap_labels(loader, label_mapping(valid_data.class_to_idx, full_classes, full.fc.out_features))
+
+    lite_probs, labels = collect(lite, loader)
+    full_probs, _ = collect(full, loader)
+
+    result = pick_threshold(lite_probs, full_probs, labels, tolerance)
+    with open(CASCADE_CONFIG_PATH, "w") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+    print(f"Calibration saved at {CASCADE_CONFIG_PATH}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and calibrate the cascade first stage")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    train_parser = subparsers.add_parser("train")
+    train_parser.add_argument("--epochs", type=int, default=20)
+    train_parser.add_argument("--lr", type=float, default=0.0001)
+    calibrate_parser = subparsers.add_parser("calibrate")
+    calibrate_parser.add_argument("--tolerance", type=float, default=0.0,
+                                  help="accuracy (fraction) the cascade may lose vs. the full model")
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.command == "train":
+        train(args.epochs, args.lr)
+    else:
+        calibrate(args.tolerance)
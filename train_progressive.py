@@ -0,0 +1,90 @@
+"""
+Train ResNet50 with progressive resizing and compare it with the fixed schedule.
+
+    python train_progressive.py --schedule 128:6,160:6,224:8
+    python train_progressive.py --schedule 128:6,160:6,224:8 --compare --target-accuracy 95
+
+Early phases run at lower resolution with proportionally larger batches
+(AdaptiveAvgPool2d makes the network resolution-agnostic); the last phase
+runs at the 224x224 serving resolution. With --compare, a fresh model is
+also trained with the current fixed schedule (224 for the same number of
+epochs) and the wall-clock time to --target-accuracy of both is printed.
+"""
+import argparse
+import json
+import os
+
+import torch
+import torch.nn as nn
+
+from src.datasets.plant_disease import PlantDataset, split_loader, get_eval_transforms
+from src.datasets.shards import ShardDataset, is_shard_dir
+from src.Models.resnet import ResNet50
+from src.progressive import parse_schedule, progressive_train
+from src.train import Train
+from app.logging_config import setup_logging
+
+device = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+# Data Loader parameters
+ROOT_DIR = "Plantdisease"
+BATCH_SIZE = 128
+NUM_WORKER = 4
+
+
+def run(schedule, lr, target_accuracy, seed):
+    torch.manual_seed(seed)
+    train_dir = ROOT_DIR + "/train"
+    train_data = ShardDataset(train_dir) if is_shard_dir(train_dir) else PlantDataset(train_dir)
+    valid_loader, _ = split_loader(ROOT_DIR + "/valid", get_eval_transforms(), False, BATCH_SIZE, NUM_WORKER)
+
+    model = ResNet50(len(train_data.class_to_idx)).to(device)
+    optimizer = torch.optim.Adam(params=model.parameters(), lr=lr)
+    trainer = Train(
+        model=model,
+        train_loader=None,  # Built per phase
+        test_loader=valid_loader,
+        loss_fn=nn.CrossEntropyLoss(),
+        optimizer=optimizer,
+        device=device,
+    )
+    result = progressive_train(trainer, train_data, parse_schedule(schedule, BATCH_SIZE), NUM_WORKER, target_accuracy)
+    return model, optimizer, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Progressive-resizing training")
+    parser.add_argument("--schedule", default="128:6,160:6,224:8", help="resolution:epochs, ... (last at 224)")
+    parser.add_argument("--lr", type=float, default=0.0001)
+    parser.add_argument("--target-accuracy", type=float, default=95.0, help="validation accuracy (%%) to time")
+    parser.add_argument("--compare", action="store_true", help="also train the fixed 224 schedule")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="checkpoints/progressive_final.pth")
+    args = parser.parse_args()
+    setup_logging()
+
+    model, optimizer, progressive = run(args.schedule, args.lr, args.target_accuracy, args.seed)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    torch.save({
+        'epoch': len(progressive["history"]) - 1,
+        'model_state_dict': model.state_dict(),
+        'optimizer_state_dict': optimizer.state_dict(),
+    }, args.output)
+    print(f"Checkpoint saved at {args.output}")
+
+    results = {"progressive": progressive}
+    if args.compare:
+        total_epochs = sum(phase.epochs for phase in parse_schedule(args.schedule, BATCH_SIZE))
+        _, _, results["fixed"] = run(f"224:{total_epochs}", args.lr, args.target_accuracy, args.seed)
+
+    print(f"\n{'schedule':<12} {'final acc':>10} {'total s':>9} {'to ' + str(args.target_accuracy) + '% s':>12}")
+    for name, r in results.items():
+        to_target = f"{r['time_to_target']:.0f}" if r["time_to_target"] is not None else "not reached"
+        print(f"{name:<12} {r['history'][-1]['test_accuracy']:9.2f}% {r['total_seconds']:9.0f} {to_target:>12}")
+
+    with open(os.path.splitext(args.output)[0] + ".json", "w") as f:
+        json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,13 @@ import os
 from tqdm import tqdm
 from src.datasets.plant_disease import dataloaders
 from src.Models.resnet import ResNet50
-from src.train import Train
+from src.train import Train, set_loader_epoch
+from app.logging_config import setup_logging
 import torch
 import torch.nn as nn
 
+setup_logging()
+
 # Setting device
 device = 'cuda' if torch.cuda.is_available() else 'cpu'
 print(f"Using device: {device}")
@@ -71,6 +74,7 @@ def train_model(resume=False, checkpoint_path=None):
     # Training loop
     for epoch in range(start_epoch, EPOCHS):
         print(f"\nEpoch {epoch + 1}/{EPOCHS}")
+        set_loader_epoch(train_loader, epoch)
         
         # Add tqdm for progress bar on batches
         progress_bar = tqdm(enumerate(train_loader), total=len(train_loader), desc="Training")